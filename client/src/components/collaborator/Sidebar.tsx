@@ -53,6 +53,7 @@ const Sidebar = ({
 
   const handleLogout = () => {
     localStorage.removeItem("access_token");
+    localStorage.removeItem("refresh_token");
     localStorage.removeItem("user");
     navigate("/sign-in");
   };
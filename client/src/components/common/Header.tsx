@@ -124,6 +124,7 @@ export const Header = () => {
     try {
       if (!token) {
         window.localStorage.removeItem("access_token");
+        window.localStorage.removeItem("refresh_token");
         window.localStorage.removeItem("user");
         setUserName(null);
         setUserRole("guest");
@@ -133,25 +134,29 @@ export const Header = () => {
         return;
       }
 
+      const refreshToken = window.localStorage.getItem("refresh_token");
       const response = await fetch(`${apiUrl}/logout`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
           Authorization: token ? `Bearer ${token}` : "",
         },
+        body: JSON.stringify(refreshToken ? { refresh_token: refreshToken } : {}),
       });
 
       const data = await response
         .json()
         .catch(() => ({ is_success: response.ok }));
 
-      if (!response.ok || data?.is_success === false) {
+      // 401: the access token already expired or was revoked, so the session is over anyway
+      if ((!response.ok && response.status !== 401) || (response.ok && data?.is_success === false)) {
         const message = data?.msg || "Unable to log out. Please try again.";
         toast.error(message);
         return;
       }
 
       window.localStorage.removeItem("access_token");
+      window.localStorage.removeItem("refresh_token");
       window.localStorage.removeItem("user");
 
       setUserName(null);
@@ -7,6 +7,11 @@ import {
 } from "react";
 import type { ReactNode } from "react";
 
+import {
+  REFRESH_MARGIN_SECONDS,
+  refreshAccessToken,
+  tokenExpiresIn,
+} from "@/services/session";
 import { STORAGE_KEYS } from "@/utils/constants";
 import {
   clearStoredAuth,
@@ -60,7 +65,11 @@ function resolveRoles(user: AuthUser) {
 
 export const AuthProvider = ({ children }: { children: ReactNode }) => {
   const keys = useMemo<StorageKeyConfig>(
-    () => ({ token: STORAGE_KEYS.token, user: STORAGE_KEYS.user }),
+    () => ({
+      token: STORAGE_KEYS.token,
+      user: STORAGE_KEYS.user,
+      refreshToken: STORAGE_KEYS.refreshToken,
+    }),
     []
   );
 
@@ -86,6 +95,25 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
     };
   }, [readAuth]);
 
+  // Access tokens are short-lived: renew each one shortly before it expires,
+  // so requests made with the stored token keep working
+  useEffect(() => {
+    if (!token) return;
+    const expiresIn = tokenExpiresIn(token);
+    if (expiresIn === null) return;
+
+    const delay = Math.min(
+      Math.max(expiresIn - REFRESH_MARGIN_SECONDS, 0) * 1000,
+      2 ** 31 - 1
+    );
+    const timer = window.setTimeout(() => {
+      refreshAccessToken().catch((error) =>
+        console.warn("Failed to refresh session", error)
+      );
+    }, delay);
+    return () => window.clearTimeout(timer);
+  }, [token]);
+
   const login = useCallback(
     (nextToken: string | null, nextUser: AuthUser) => {
       persistAuth(keys, nextToken, nextUser);
@@ -1,7 +1,6 @@
 import { useCallback, useEffect, useMemo, useState } from "react";
 
-import { API_BASE_URL } from "@/utils/constants";
-import { useAuth } from "./useAuth";
+import { authorizedFetch } from "@/services/session";
 
 type UseFetchOptions<T> = {
   method?: string;
@@ -32,7 +31,6 @@ export function useFetch<T = unknown>(
   path: string,
   options: UseFetchOptions<T> = {}
 ): UseFetchState<T> {
-  const { token } = useAuth();
   const {
     method = "GET",
     body = null,
@@ -49,14 +47,11 @@ export function useFetch<T = unknown>(
 
   const baseHeaders = useMemo(() => {
     const result = new Headers(headers);
-    if (token) {
-      result.set("Authorization", `Bearer ${token}`);
-    }
     if (body && !(body instanceof FormData) && !result.has("Content-Type")) {
       result.set("Content-Type", "application/json");
     }
     return result;
-  }, [headers, token, body]);
+  }, [headers, body]);
 
   const execute = useCallback(
     async (override: RequestInit = {}) => {
@@ -78,7 +73,7 @@ export function useFetch<T = unknown>(
           headers: requestHeaders,
         };
 
-        const response = await fetch(`${API_BASE_URL}${path}`, requestInit);
+        const response = await authorizedFetch(path, requestInit);
         if (!response.ok) {
           const message = `${response.status} ${response.statusText}`;
           throw new Error(message);
@@ -15,6 +15,7 @@ import UserTable from "@/components/admin/user-table";
 import RoadIntersectionMap from "@/components/road-intersection-map";
 import { InactiveContentMapViewer } from "@/components/admin/inactive-content-map-viewer";
 import { computeSegmentLengths } from "@/lib/utils";
+import { authorizedFetch } from "@/services/session";
 
 const API_BASE_URL = import.meta.env.VITE_API_URL ?? "http://127.0.0.1:4000";
 
@@ -521,21 +522,19 @@ function resolveUserId(
 }
 
 async function requestWithAuth<T>(
-  token: string,
   path: string,
   options?: RequestInit
 ): Promise<ApiEnvelope<T>> {
   const isFormData = options?.body instanceof FormData;
   const headers = new Headers(options?.headers ?? {});
 
-  headers.set("Authorization", `Bearer ${token}`);
   if (!isFormData && !headers.has("Content-Type")) {
     headers.set("Content-Type", "application/json");
   } else if (isFormData && headers.has("Content-Type")) {
     headers.delete("Content-Type");
   }
 
-  const response = await fetch(`${API_BASE_URL}${path}`, {
+  const response = await authorizedFetch(path, {
     ...(options ?? {}),
     headers,
   });
@@ -549,7 +548,7 @@ async function requestWithAuth<T>(
 
 export default function AdminDashboard() {
   const navigate = useNavigate();
-  const [token, setToken] = useState<string | null>(null);
+  const [isSignedIn, setIsSignedIn] = useState(false);
   const [loading, setLoading] = useState(true);
   const [cities, setCities] = useState<AdminCity[]>([]);
   const [cityDetails, setCityDetails] = useState<AdminCityDetail[]>([]);
@@ -648,19 +647,16 @@ export default function AdminDashboard() {
     }
 
     setCurrentUserId(resolveUserId(storedUser, storedToken));
-    setToken(storedToken);
+    setIsSignedIn(true);
   }, [navigate]);
 
   useEffect(() => {
-    if (!token) return;
+    if (!isSignedIn) return;
 
-    async function loadDashboard(currentToken: string) {
+    async function loadDashboard() {
       try {
         setLoading(true);
-        const { data } = await requestWithAuth<DashboardResponse>(
-          currentToken,
-          "/admin/dashboard"
-        );
+        const { data } = await requestWithAuth<DashboardResponse>("/admin/dashboard");
         if (data) {
           setCities(data.cities ?? []);
           setCityDetails(data.city_details ?? []);
@@ -680,8 +676,8 @@ export default function AdminDashboard() {
       }
     }
 
-    loadDashboard(token);
-  }, [token]);
+    loadDashboard();
+  }, [isSignedIn]);
 
   const cityOptions = useMemo(
     () =>
@@ -1158,8 +1154,7 @@ export default function AdminDashboard() {
 
   async function handleCitySubmit(event: FormEvent<HTMLFormElement>) {
     event.preventDefault();
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
 
     const { coords, error } = buildPointPayload(cityForm.lon, cityForm.lat);
 
@@ -1205,7 +1200,6 @@ export default function AdminDashboard() {
     setIsCitySubmitting(true);
     try {
       const { data } = await requestWithAuth<AdminCity>(
-        authToken,
         cityId ? `/admin/cities/${cityId}` : "/admin/cities",
         {
           method: cityId ? "PUT" : "POST",
@@ -1261,14 +1255,13 @@ export default function AdminDashboard() {
   }
 
   async function handleCityDelete(cityId: string) {
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
     if (!confirmAction("Are you sure you want to delete this city?")) {
       return;
     }
 
     try {
-      await requestWithAuth<null>(authToken, `/admin/cities/${cityId}`, {
+      await requestWithAuth<null>(`/admin/cities/${cityId}`, {
         method: "DELETE",
       });
       setCities((prev) => prev.filter((city) => city.id !== cityId));
@@ -1289,8 +1282,7 @@ export default function AdminDashboard() {
 
   async function handleCityDetailSubmit(event: FormEvent<HTMLFormElement>) {
     event.preventDefault();
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
 
     if (!cityDetailForm.city_id.trim()) {
       toast.error("Please select a city.");
@@ -1332,7 +1324,6 @@ export default function AdminDashboard() {
     setIsCityDetailSubmitting(true);
     try {
       const { data } = await requestWithAuth<AdminCityDetail>(
-        authToken,
         cityDetailId
           ? `/admin/city-details/${cityDetailId}`
           : "/admin/city-details",
@@ -1390,15 +1381,13 @@ export default function AdminDashboard() {
   }
 
   async function handleCityDetailDelete(detailId: string) {
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
     if (!confirmAction("Are you sure you want to delete this city detail?")) {
       return;
     }
 
     try {
       await requestWithAuth<null>(
-        authToken,
         `/admin/city-details/${detailId}`,
         {
           method: "DELETE",
@@ -1420,8 +1409,7 @@ export default function AdminDashboard() {
 
   async function handleLocationSubmit(event: FormEvent<HTMLFormElement>) {
     event.preventDefault();
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
 
     if (!locationForm.city_id.trim()) {
       toast.error("Please select a city.");
@@ -1477,7 +1465,6 @@ export default function AdminDashboard() {
     setIsLocationSubmitting(true);
     try {
       const { data } = await requestWithAuth<AdminLocation>(
-        authToken,
         locationId ? `/admin/locations/${locationId}` : "/admin/locations",
         {
           method: locationId ? "PUT" : "POST",
@@ -1539,14 +1526,13 @@ export default function AdminDashboard() {
   }
 
   async function handleLocationDelete(locationId: string) {
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
     if (!confirmAction("Are you sure you want to delete this location?")) {
       return;
     }
 
     try {
-      await requestWithAuth<null>(authToken, `/admin/locations/${locationId}`, {
+      await requestWithAuth<null>(`/admin/locations/${locationId}`, {
         method: "DELETE",
       });
       setLocations((prev) =>
@@ -1567,8 +1553,7 @@ export default function AdminDashboard() {
 
   async function handleRoadSubmit(event: FormEvent<HTMLFormElement>) {
     event.preventDefault();
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
 
     if (!roadForm.city_id.trim()) {
       toast.error("Please select a city.");
@@ -1634,7 +1619,6 @@ export default function AdminDashboard() {
     setIsRoadSubmitting(true);
     try {
       const { data } = await requestWithAuth<AdminRoad>(
-        authToken,
         roadId ? `/admin/roads/${roadId}` : "/admin/roads",
         {
           method: roadId ? "PUT" : "POST",
@@ -1690,14 +1674,13 @@ export default function AdminDashboard() {
   }
 
   async function handleRoadDelete(roadId: string) {
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
     if (!confirmAction("Are you sure you want to delete this road?")) {
       return;
     }
 
     try {
-      await requestWithAuth<null>(authToken, `/admin/roads/${roadId}`, {
+      await requestWithAuth<null>(`/admin/roads/${roadId}`, {
         method: "DELETE",
       });
       setRoads((prev) => prev.filter((road) => road.id !== roadId));
@@ -1712,8 +1695,7 @@ export default function AdminDashboard() {
   }
 
   async function handleApproveRequest(requestId: string) {
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
 
     if (
       !confirmAction(
@@ -1726,7 +1708,6 @@ export default function AdminDashboard() {
     setApprovingRequestId(requestId);
     try {
       await requestWithAuth<AdminCollaboratorRequest>(
-        authToken,
         `/admin/collaborator-requests/${requestId}`,
         {
           method: "PUT",
@@ -1736,7 +1717,6 @@ export default function AdminDashboard() {
 
       // Reload dashboard data to refresh collaborators and requests
       const { data } = await requestWithAuth<DashboardResponse>(
-        authToken,
         "/admin/dashboard"
       );
       if (data) {
@@ -1756,8 +1736,7 @@ export default function AdminDashboard() {
   }
 
   async function handleRejectRequest(requestId: string) {
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
 
     if (
       !confirmAction(
@@ -1770,7 +1749,6 @@ export default function AdminDashboard() {
     setRejectingRequestId(requestId);
     try {
       await requestWithAuth<AdminCollaboratorRequest>(
-        authToken,
         `/admin/collaborator-requests/${requestId}`,
         {
           method: "PUT",
@@ -1797,8 +1775,7 @@ export default function AdminDashboard() {
   }
 
   async function handleRevokeCollaborator(userId: string, username: string) {
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
 
     if (
       !confirmAction(
@@ -1820,7 +1797,7 @@ export default function AdminDashboard() {
 
     setRevokingCollaboratorId(userId);
     try {
-      await requestWithAuth<null>(authToken, `/admin/collaborators/${userId}`, {
+      await requestWithAuth<null>(`/admin/collaborators/${userId}`, {
         method: "DELETE",
         headers: {
           "Content-Type": "application/json",
@@ -1835,7 +1812,6 @@ export default function AdminDashboard() {
 
       // Reload users to show updated status
       const { data } = await requestWithAuth<DashboardResponse>(
-        authToken,
         "/admin/dashboard"
       );
       if (data) {
@@ -1859,8 +1835,7 @@ export default function AdminDashboard() {
 
   // Accept inactive content (set is_active = true)
   async function handleAcceptInactiveCity(cityId: string) {
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
 
     if (!confirmAction("Are you sure you want to activate this city?")) {
       return;
@@ -1899,7 +1874,6 @@ export default function AdminDashboard() {
       }
 
       const { data } = await requestWithAuth<AdminCity>(
-        authToken,
         `/admin/cities/${cityId}`,
         {
           method: "PUT",
@@ -1922,8 +1896,7 @@ export default function AdminDashboard() {
   }
 
   async function handleAcceptInactiveCityDetail(detailId: string) {
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
 
     if (!confirmAction("Are you sure you want to activate this city detail?")) {
       return;
@@ -1953,7 +1926,6 @@ export default function AdminDashboard() {
       formData.append("is_active", "true");
 
       const { data } = await requestWithAuth<AdminCityDetail>(
-        authToken,
         `/admin/city-details/${detailId}`,
         {
           method: "PUT",
@@ -1976,8 +1948,7 @@ export default function AdminDashboard() {
   }
 
   async function handleAcceptInactiveLocation(locationId: string) {
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
 
     if (!confirmAction("Are you sure you want to activate this location?")) {
       return;
@@ -2017,7 +1988,6 @@ export default function AdminDashboard() {
       }
 
       const { data } = await requestWithAuth<AdminLocation>(
-        authToken,
         `/admin/locations/${locationId}`,
         {
           method: "PUT",
@@ -2040,8 +2010,7 @@ export default function AdminDashboard() {
   }
 
   async function handleAcceptInactiveRoad(roadId: string) {
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
 
     if (!confirmAction("Are you sure you want to activate this road?")) {
       return;
@@ -2070,7 +2039,6 @@ export default function AdminDashboard() {
       };
 
       const { data } = await requestWithAuth<AdminRoad>(
-        authToken,
         `/admin/roads/${roadId}`,
         {
           method: "PUT",
@@ -2092,7 +2060,7 @@ export default function AdminDashboard() {
     }
   }
 
-  if (!token) {
+  if (!isSignedIn) {
     return (
       <div className="flex min-h-screen items-center justify-center bg-slate-950">
         <div className="relative">
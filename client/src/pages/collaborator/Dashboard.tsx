@@ -12,8 +12,8 @@ import LocationTable from "@/components/admin/location-table";
 import RoadTable from "@/components/admin/road-table";
 import RoadIntersectionMap from "@/components/road-intersection-map";
 import { computeSegmentLengths } from "@/lib/utils";
-
-const API_BASE_URL = import.meta.env.VITE_API_URL ?? "http://127.0.0.1:4000";
+import { mergeImageUrls, uploadImagesDirect } from "@/services/uploads";
+import { authorizedFetch } from "@/services/session";
 
 const LOCATION_CATEGORIES: Record<string, string[]> = {
   public_and_civic: [
@@ -129,6 +129,14 @@ type AdminCityDetail = {
   is_active?: boolean;
 };
 
+// Light projections of everyone's content, used for dropdowns and road drawing
+type CityReference = Pick<AdminCity, "id" | "name_mm" | "name_en" | "geometry">;
+
+type IntersectionReference = Pick<
+  AdminLocation,
+  "id" | "city_id" | "name_mm" | "name_en" | "location_type" | "geometry"
+>;
+
 type PanelKey =
   | "dashboard"
   | "cities"
@@ -145,6 +153,10 @@ type DashboardResponse = {
   city_details?: AdminCityDetail[];
   locations: AdminLocation[];
   roads: AdminRoad[];
+  reference?: {
+    cities?: CityReference[];
+    intersections?: IntersectionReference[];
+  };
 };
 
 type ApiEnvelope<T> = {
@@ -414,21 +426,19 @@ function humanizeKey(value: string): string {
 }
 
 async function requestWithAuth<T>(
-  token: string,
   path: string,
   options?: RequestInit
 ): Promise<ApiEnvelope<T>> {
   const isFormData = options?.body instanceof FormData;
   const headers = new Headers(options?.headers ?? {});
 
-  headers.set("Authorization", `Bearer ${token}`);
   if (!isFormData && !headers.has("Content-Type")) {
     headers.set("Content-Type", "application/json");
   } else if (isFormData && headers.has("Content-Type")) {
     headers.delete("Content-Type");
   }
 
-  const response = await fetch(`${API_BASE_URL}${path}`, {
+  const response = await authorizedFetch(path, {
     ...(options ?? {}),
     headers,
   });
@@ -442,7 +452,7 @@ async function requestWithAuth<T>(
 
 export default function CollaboratorDashboard() {
   const navigate = useNavigate();
-  const [token, setToken] = useState<string | null>(null);
+  const [isSignedIn, setIsSignedIn] = useState(false);
   const [currentUserId, setCurrentUserId] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
 
@@ -471,6 +481,10 @@ export default function CollaboratorDashboard() {
   const [cityDetails, setCityDetails] = useState<AdminCityDetail[]>([]);
   const [locations, setLocations] = useState<AdminLocation[]>([]);
   const [roads, setRoads] = useState<AdminRoad[]>([]);
+  const [referenceCities, setReferenceCities] = useState<CityReference[]>([]);
+  const [referenceIntersections, setReferenceIntersections] = useState<
+    IntersectionReference[]
+  >([]);
   const [activePanel, setActivePanel] = useState<PanelKey>("dashboard");
 
   useEffect(() => {
@@ -512,25 +526,24 @@ export default function CollaboratorDashboard() {
       return;
     }
 
-    setToken(storedToken);
+    setIsSignedIn(true);
   }, [navigate]);
 
   useEffect(() => {
-    if (!token) return;
+    if (!isSignedIn) return;
 
-    async function loadDashboard(currentToken: string) {
+    async function loadDashboard() {
       try {
         setLoading(true);
         // Use the collaborator-specific endpoint
-        const { data } = await requestWithAuth<DashboardResponse>(
-          currentToken,
-          "/collaborator/dashboard"
-        );
+        const { data } = await requestWithAuth<DashboardResponse>("/collaborator/dashboard");
         if (data) {
           setCities(data.cities ?? []);
           setCityDetails(data.city_details ?? []);
           setLocations(data.locations ?? []);
           setRoads(data.roads ?? []);
+          setReferenceCities(data.reference?.cities ?? []);
+          setReferenceIntersections(data.reference?.intersections ?? []);
         }
       } catch (error) {
         console.error("Failed to load dashboard data", error);
@@ -542,16 +555,24 @@ export default function CollaboratorDashboard() {
       }
     }
 
-    loadDashboard(token);
-  }, [token]);
+    loadDashboard();
+  }, [isSignedIn]);
+
+  // Own cities override the reference copies so edits show up without a reload
+  const cityChoices = useMemo(() => {
+    const byId = new Map<string, CityReference>();
+    referenceCities.forEach((city) => byId.set(city.id, city));
+    cities.forEach((city) => byId.set(city.id, city));
+    return Array.from(byId.values());
+  }, [referenceCities, cities]);
 
   const cityOptions = useMemo(
     () =>
-      cities.map((city) => ({
+      cityChoices.map((city) => ({
         id: city.id,
         label: city.name_en || city.name_mm || city.id,
       })),
-    [cities]
+    [cityChoices]
   );
 
   const baseLocationTypeGroups = useMemo(
@@ -569,12 +590,12 @@ export default function CollaboratorDashboard() {
 
   const cityLabelById = useMemo(() => {
     const lookup: Record<string, string> = {};
-    cities.forEach((city) => {
+    cityChoices.forEach((city) => {
       const label = city.name_en || city.name_mm || city.id;
       lookup[city.id] = label;
     });
     return lookup;
-  }, [cities]);
+  }, [cityChoices]);
 
   // Filter data to only show collaborator's own creations
   const myCities = useMemo(() => {
@@ -779,17 +800,24 @@ export default function CollaboratorDashboard() {
     ]
   );
 
-  const intersectionLocations = useMemo(
-    () =>
-      locations.filter((location) => {
-        const type = (location.location_type ?? "").toLowerCase();
-        return type.includes("intersection");
-      }),
-    [locations]
-  );
+  const intersectionLocations = useMemo(() => {
+    const byId = new Map<string, IntersectionReference>();
+    referenceIntersections.forEach((location) =>
+      byId.set(location.id, location)
+    );
+    locations.forEach((location) => {
+      const type = (location.location_type ?? "").toLowerCase();
+      if (type.includes("intersection")) {
+        byId.set(location.id, location);
+      } else {
+        byId.delete(location.id);
+      }
+    });
+    return Array.from(byId.values());
+  }, [referenceIntersections, locations]);
 
   const intersectionLookupById = useMemo(() => {
-    const lookup: Record<string, AdminLocation> = {};
+    const lookup: Record<string, IntersectionReference> = {};
     intersectionLocations.forEach((location) => {
       lookup[location.id] = location;
     });
@@ -798,8 +826,10 @@ export default function CollaboratorDashboard() {
 
   const selectedLocationCity = useMemo(() => {
     if (!locationForm.city_id) return null;
-    return cities.find((city) => city.id === locationForm.city_id) ?? null;
-  }, [cities, locationForm.city_id]);
+    return (
+      cityChoices.find((city) => city.id === locationForm.city_id) ?? null
+    );
+  }, [cityChoices, locationForm.city_id]);
 
   const selectedCityCenter = useMemo(() => {
     if (!selectedLocationCity) return null;
@@ -827,7 +857,7 @@ export default function CollaboratorDashboard() {
     !locationForm.city_id && !hasLocationCoordinates;
 
   const cityIntersections = useMemo(() => {
-    if (!roadForm.city_id) return [] as AdminLocation[];
+    if (!roadForm.city_id) return [] as IntersectionReference[];
     return intersectionLocations.filter(
       (location) => location.city_id === roadForm.city_id
     );
@@ -835,8 +865,8 @@ export default function CollaboratorDashboard() {
 
   const selectedRoadCity = useMemo(() => {
     if (!roadForm.city_id) return null;
-    return cities.find((city) => city.id === roadForm.city_id) ?? null;
-  }, [cities, roadForm.city_id]);
+    return cityChoices.find((city) => city.id === roadForm.city_id) ?? null;
+  }, [cityChoices, roadForm.city_id]);
 
   const selectedRoadCityCenter = useMemo(() => {
     if (!selectedRoadCity) return null;
@@ -955,8 +985,7 @@ export default function CollaboratorDashboard() {
   // Form submission handlers
   async function handleCitySubmit(event: FormEvent<HTMLFormElement>) {
     event.preventDefault();
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
 
     const { coords, error } = buildPointPayload(cityForm.lon, cityForm.lat);
 
@@ -988,21 +1017,18 @@ export default function CollaboratorDashboard() {
       formData.append("geometry", "");
     }
 
-    if (cityForm.image_files.length) {
-      cityForm.image_files.forEach((file) => {
-        formData.append("image_files[]", file);
-      });
-      if (!formData.has("image_file")) {
-        formData.append("image_file", cityForm.image_files[0]);
-      }
-    }
-
     const cityId = cityForm.id;
 
     setIsCitySubmitting(true);
     try {
+      // Images go straight to storage; the API only records their URLs
+      const uploadedUrls = await uploadImagesDirect(cityForm.image_files);
+      formData.set(
+        "image_urls",
+        mergeImageUrls(cityForm.image_urls, uploadedUrls)
+      );
+
       const { data } = await requestWithAuth<AdminCity>(
-        authToken,
         cityId ? `/collaborator/cities/${cityId}` : "/collaborator/cities",
         {
           method: cityId ? "PUT" : "POST",
@@ -1030,8 +1056,7 @@ export default function CollaboratorDashboard() {
 
   async function handleLocationSubmit(event: FormEvent<HTMLFormElement>) {
     event.preventDefault();
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
 
     if (!locationForm.city_id.trim()) {
       toast.error("Please select a city.");
@@ -1073,21 +1098,18 @@ export default function CollaboratorDashboard() {
       formData.append("geometry", "");
     }
 
-    if (locationForm.image_files.length) {
-      locationForm.image_files.forEach((file) => {
-        formData.append("image_files[]", file);
-      });
-      if (!formData.has("image_file")) {
-        formData.append("image_file", locationForm.image_files[0]);
-      }
-    }
-
     const locationId = locationForm.id;
 
     setIsLocationSubmitting(true);
     try {
+      // Images go straight to storage; the API only records their URLs
+      const uploadedUrls = await uploadImagesDirect(locationForm.image_files);
+      formData.set(
+        "image_urls",
+        mergeImageUrls(locationForm.image_urls, uploadedUrls)
+      );
+
       const { data } = await requestWithAuth<AdminLocation>(
-        authToken,
         locationId
           ? `/collaborator/locations/${locationId}`
           : "/collaborator/locations",
@@ -1121,8 +1143,7 @@ export default function CollaboratorDashboard() {
 
   async function handleRoadSubmit(event: FormEvent<HTMLFormElement>) {
     event.preventDefault();
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
 
     if (!roadForm.city_id.trim()) {
       toast.error("Please select a city.");
@@ -1188,7 +1209,6 @@ export default function CollaboratorDashboard() {
     setIsRoadSubmitting(true);
     try {
       const { data } = await requestWithAuth<AdminRoad>(
-        authToken,
         roadId ? `/collaborator/roads/${roadId}` : "/collaborator/roads",
         {
           method: roadId ? "PUT" : "POST",
@@ -1215,8 +1235,7 @@ export default function CollaboratorDashboard() {
 
   async function handleCityDetailSubmit(event: FormEvent<HTMLFormElement>) {
     event.preventDefault();
-    const authToken = token;
-    if (!authToken) return;
+    if (!isSignedIn) return;
 
     if (!cityDetailForm.city_id.trim()) {
       toast.error("Please select a city.");
@@ -1244,21 +1263,18 @@ export default function CollaboratorDashboard() {
     formData.append("body_mm", cityDetailForm.body_burmese);
     formData.append("image_urls", cityDetailForm.image_urls);
 
-    if (cityDetailForm.image_files.length) {
-      cityDetailForm.image_files.forEach((file) => {
-        formData.append("image_files[]", file);
-      });
-      if (!formData.has("image_file")) {
-        formData.append("image_file", cityDetailForm.image_files[0]);
-      }
-    }
-
     const cityDetailId = cityDetailForm.id;
 
     setIsCityDetailSubmitting(true);
     try {
+      // Images go straight to storage; the API only records their URLs
+      const uploadedUrls = await uploadImagesDirect(cityDetailForm.image_files);
+      formData.set(
+        "image_urls",
+        mergeImageUrls(cityDetailForm.image_urls, uploadedUrls)
+      );
+
       const { data } = await requestWithAuth<AdminCityDetail>(
-        authToken,
         cityDetailId
           ? `/collaborator/city-details/${cityDetailId}`
           : "/collaborator/city-details",
@@ -1316,7 +1332,7 @@ export default function CollaboratorDashboard() {
   };
 
   const handleCityDelete = async (cityId: string) => {
-    if (!token) return;
+    if (!isSignedIn) return;
 
     const city = cities.find((c) => c.id === cityId);
     if (city && city.user_id !== currentUserId) {
@@ -1327,10 +1343,11 @@ export default function CollaboratorDashboard() {
     if (!confirm("Are you sure you want to delete this city?")) return;
 
     try {
-      await requestWithAuth(token, `/collaborator/cities/${cityId}`, {
+      await requestWithAuth(`/collaborator/cities/${cityId}`, {
         method: "DELETE",
       });
       setCities((prev) => prev.filter((c) => c.id !== cityId));
+      setReferenceCities((prev) => prev.filter((c) => c.id !== cityId));
       toast.success("City deleted successfully");
     } catch (error) {
       console.error("Failed to delete city", error);
@@ -1361,7 +1378,7 @@ export default function CollaboratorDashboard() {
   };
 
   const handleCityDetailDelete = async (detailId: string) => {
-    if (!token) return;
+    if (!isSignedIn) return;
 
     const detail = cityDetails.find((d) => d.id === detailId);
     if (detail && detail.user_id !== currentUserId) {
@@ -1372,7 +1389,7 @@ export default function CollaboratorDashboard() {
     if (!confirm("Are you sure you want to delete this city detail?")) return;
 
     try {
-      await requestWithAuth(token, `/collaborator/city-details/${detailId}`, {
+      await requestWithAuth(`/collaborator/city-details/${detailId}`, {
         method: "DELETE",
       });
       setCityDetails((prev) => prev.filter((d) => d.id !== detailId));
@@ -1412,7 +1429,7 @@ export default function CollaboratorDashboard() {
   };
 
   const handleLocationDelete = async (locationId: string) => {
-    if (!token) return;
+    if (!isSignedIn) return;
 
     const location = locations.find((l) => l.id === locationId);
     if (location && location.user_id !== currentUserId) {
@@ -1423,10 +1440,13 @@ export default function CollaboratorDashboard() {
     if (!confirm("Are you sure you want to delete this location?")) return;
 
     try {
-      await requestWithAuth(token, `/collaborator/locations/${locationId}`, {
+      await requestWithAuth(`/collaborator/locations/${locationId}`, {
         method: "DELETE",
       });
       setLocations((prev) => prev.filter((l) => l.id !== locationId));
+      setReferenceIntersections((prev) =>
+        prev.filter((l) => l.id !== locationId)
+      );
       toast.success("Location deleted successfully");
     } catch (error) {
       console.error("Failed to delete location", error);
@@ -1457,7 +1477,7 @@ export default function CollaboratorDashboard() {
   };
 
   const handleRoadDelete = async (roadId: string) => {
-    if (!token) return;
+    if (!isSignedIn) return;
 
     const road = roads.find((r) => r.id === roadId);
     if (road && road.user_id !== currentUserId) {
@@ -1468,7 +1488,7 @@ export default function CollaboratorDashboard() {
     if (!confirm("Are you sure you want to delete this road?")) return;
 
     try {
-      await requestWithAuth(token, `/collaborator/roads/${roadId}`, {
+      await requestWithAuth(`/collaborator/roads/${roadId}`, {
         method: "DELETE",
       });
       setRoads((prev) => prev.filter((r) => r.id !== roadId));
@@ -1481,7 +1501,7 @@ export default function CollaboratorDashboard() {
     }
   };
 
-  if (!token) {
+  if (!isSignedIn) {
     return (
       <div className="flex min-h-screen items-center justify-center bg-slate-950">
         <div className="relative">
@@ -2613,7 +2633,7 @@ export default function CollaboratorDashboard() {
                           className={SELECT_BASE_CLASS}
                         >
                           <option value="">Select a city</option>
-                          {cities.map((city) => (
+                          {cityChoices.map((city) => (
                             <option key={city.id} value={city.id}>
                               {city.name_en || city.name_mm || city.id}
                             </option>
@@ -3062,7 +3082,7 @@ export default function CollaboratorDashboard() {
                           className={SELECT_BASE_CLASS}
                         >
                           <option value="">Select a city</option>
-                          {cities.map((city) => (
+                          {cityChoices.map((city) => (
                             <option key={city.id} value={city.id}>
                               {city.name_en || city.name_mm || city.id}
                             </option>
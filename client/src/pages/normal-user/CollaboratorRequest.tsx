@@ -3,8 +3,7 @@ import { useNavigate } from "react-router-dom";
 import { toast } from "sonner";
 import { Loader2, CheckCircle, XCircle, Clock } from "lucide-react";
 import { Header } from "@/components/common/Header";
-
-const API_BASE_URL = import.meta.env.VITE_API_URL ?? "http://127.0.0.1:4000";
+import { authorizedFetch } from "@/services/session";
 
 type CollaboratorRequest = {
   id: string;
@@ -69,23 +68,18 @@ export default function CollaboratorRequest() {
       }
 
       setIsAuthenticated(true);
-      fetchExistingRequest(token);
+      fetchExistingRequest();
     } catch (error) {
       console.error("Failed to parse user data", error);
       navigate("/sign-in");
     }
   }, [navigate]);
 
-  const fetchExistingRequest = async (token: string) => {
+  const fetchExistingRequest = async () => {
     try {
       setLoading(true);
-      const response = await fetch(
-        `${API_BASE_URL}/collaborator-requests/my-request`,
-        {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        }
+      const response = await authorizedFetch(
+        "/collaborator-requests/my-request"
       );
 
       if (response.ok) {
@@ -119,8 +113,7 @@ export default function CollaboratorRequest() {
       return;
     }
 
-    const token = localStorage.getItem("access_token");
-    if (!token) {
+    if (!localStorage.getItem("access_token")) {
       toast.error("Authentication required.");
       navigate("/sign-in");
       return;
@@ -128,12 +121,9 @@ export default function CollaboratorRequest() {
 
     setSubmitting(true);
     try {
-      const response = await fetch(`${API_BASE_URL}/collaborator-requests`, {
+      const response = await authorizedFetch("/collaborator-requests", {
         method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-          Authorization: `Bearer ${token}`,
-        },
+        headers: { "Content-Type": "application/json" },
         body: JSON.stringify(formData),
       });
 
@@ -19,6 +19,7 @@ import markerIcon from "leaflet/dist/images/marker-icon.png";
 import markerShadow from "leaflet/dist/images/marker-shadow.png";
 
 import { cn } from "@/lib/utils";
+import { authorizedFetch } from "@/services/session";
 import type { LucideIcon } from "lucide-react";
 import {
   Building2,
@@ -1030,17 +1031,9 @@ function LandmarkMap() {
           target.location.id
       );
 
-      const token =
-        typeof window !== "undefined"
-          ? window.localStorage.getItem("access_token")
-          : null;
-
-      const response = await fetch(`${API_BASE_URL}/routes`, {
+      const response = await authorizedFetch("/routes", {
         method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-          Authorization: token ? `Bearer ${token}` : "",
-        },
+        headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
           start_lon: startLon,
           start_lat: startLat,
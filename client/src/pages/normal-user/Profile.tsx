@@ -12,8 +12,7 @@ import {
   UserRound,
   UserPlus,
 } from "lucide-react";
-
-const API_BASE_URL = import.meta.env.VITE_API_URL ?? "http://127.0.0.1:4000";
+import { authorizedFetch } from "@/services/session";
 
 type RouteHistoryItem = {
   id?: string;
@@ -56,11 +55,8 @@ export default function Profile() {
       }
     }
     // Fetch route history from backend
-    const token = window.localStorage.getItem("access_token");
-    if (token) {
-      fetch(`${API_BASE_URL}/routes/history`, {
-        headers: { Authorization: `Bearer ${token}` },
-      })
+    if (window.localStorage.getItem("access_token")) {
+      authorizedFetch("/routes/history")
         .then((res) => res.json())
         .then((data) => setRouteHistory(data?.data ?? []))
         .catch(() => setRouteHistory([]));
@@ -115,14 +111,10 @@ export default function Profile() {
   const handleUpdate = async (e: React.FormEvent) => {
     e.preventDefault();
     setLoading(true);
-    const token = window.localStorage.getItem("access_token");
     try {
-      const res = await fetch(`${API_BASE_URL}/user/update`, {
+      const res = await authorizedFetch("/user/update", {
         method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-          Authorization: token ? `Bearer ${token}` : "",
-        },
+        headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ ...user, password }),
       });
       const data = await res.json();
@@ -1,5 +1,6 @@
 import { API_BASE_URL, STORAGE_KEYS } from "@/utils/constants";
 import { getStoredAuth, type StorageKeyConfig } from "@/utils/helpers";
+import { refreshAccessToken } from "./session";
 
 type ApiRequestOptions = RequestInit & {
   token?: string | null;
@@ -9,6 +10,7 @@ type ApiRequestOptions = RequestInit & {
 const storageConfig: StorageKeyConfig = {
   token: STORAGE_KEYS.token,
   user: STORAGE_KEYS.user,
+  refreshToken: STORAGE_KEYS.refreshToken,
 };
 
 function resolveToken(explicitToken: string | null | undefined) {
@@ -38,11 +40,23 @@ export async function apiRequest<T>(
     requestHeaders.set("Content-Type", "application/json");
   }
 
-  const response = await fetch(`${API_BASE_URL}${path}`, {
+  let response = await fetch(`${API_BASE_URL}${path}`, {
     ...rest,
     headers: requestHeaders,
   });
 
+  // Expired or revoked access token: refresh once and retry
+  if (response.status === 401 && resolvedToken) {
+    const refreshedToken = await refreshAccessToken();
+    if (refreshedToken) {
+      requestHeaders.set("Authorization", `Bearer ${refreshedToken}`);
+      response = await fetch(`${API_BASE_URL}${path}`, {
+        ...rest,
+        headers: requestHeaders,
+      });
+    }
+  }
+
   if (!response.ok) {
     const message = await extractErrorMessage(response);
     throw new Error(message);
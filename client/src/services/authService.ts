@@ -1,5 +1,6 @@
 import type { AuthUser } from "@/context/AuthContext";
 import { api } from "./api";
+import { getRefreshToken, setRefreshToken } from "./session";
 import { STORAGE_KEYS } from "@/utils/constants";
 import {
   clearStoredAuth,
@@ -16,6 +17,7 @@ type LoginPayload = {
 type LoginResponse = {
   is_success?: boolean;
   access_token?: string;
+  refresh_token?: string;
   user?: AuthUser;
   msg?: string;
   error?: string;
@@ -24,6 +26,7 @@ type LoginResponse = {
 const storageConfig: StorageKeyConfig = {
   token: STORAGE_KEYS.token,
   user: STORAGE_KEYS.user,
+  refreshToken: STORAGE_KEYS.refreshToken,
 };
 
 export async function login(payload: LoginPayload) {
@@ -36,12 +39,18 @@ export async function login(payload: LoginPayload) {
     throw new Error(message);
   }
 
+  setRefreshToken(response.refresh_token ?? null);
   persistAuth(storageConfig, response.access_token, response.user ?? null);
   return response;
 }
 
-export function logout() {
-  clearStoredAuth(storageConfig);
+export async function logout() {
+  const refreshToken = getRefreshToken();
+  try {
+    await api.post("/logout", refreshToken ? { refresh_token: refreshToken } : {});
+  } finally {
+    clearStoredAuth(storageConfig);
+  }
 }
 
 export function getCurrentUser() {
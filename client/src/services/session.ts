@@ -0,0 +1,115 @@
+import { API_BASE_URL, STORAGE_KEYS } from "@/utils/constants";
+import {
+  clearStoredAuth,
+  getStoredAuth,
+  isBrowser,
+  persistAuth,
+  type StorageKeyConfig,
+} from "@/utils/helpers";
+
+const storageConfig: StorageKeyConfig = {
+  token: STORAGE_KEYS.token,
+  user: STORAGE_KEYS.user,
+  refreshToken: STORAGE_KEYS.refreshToken,
+};
+
+// Refresh this long before the access token expires
+export const REFRESH_MARGIN_SECONDS = 60;
+
+export function getRefreshToken() {
+  return isBrowser() ? window.localStorage.getItem(STORAGE_KEYS.refreshToken) : null;
+}
+
+export function setRefreshToken(token: string | null) {
+  if (!isBrowser()) return;
+  if (token) {
+    window.localStorage.setItem(STORAGE_KEYS.refreshToken, token);
+  } else {
+    window.localStorage.removeItem(STORAGE_KEYS.refreshToken);
+  }
+}
+
+/** Seconds until a JWT expires, or null when it cannot be read. */
+export function tokenExpiresIn(token: string) {
+  try {
+    const payload = JSON.parse(
+      atob(token.split(".")[1].replace(/-/g, "+").replace(/_/g, "/"))
+    ) as { exp?: number };
+    return typeof payload.exp === "number" ? payload.exp - Date.now() / 1000 : null;
+  } catch {
+    return null;
+  }
+}
+
+async function requestRefresh() {
+  const refreshToken = getRefreshToken();
+  if (!refreshToken) return null;
+
+  const response = await fetch(`${API_BASE_URL}/token/refresh`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ refresh_token: refreshToken }),
+  });
+
+  if (!response.ok) {
+    // Another tab may have rotated the refresh token in the meantime
+    const current = getRefreshToken();
+    if (current && current !== refreshToken) {
+      return getStoredAuth(storageConfig).token;
+    }
+    if (response.status === 401) {
+      clearStoredAuth(storageConfig);
+    }
+    return null;
+  }
+
+  const data = (await response.json()) as {
+    access_token: string;
+    refresh_token: string;
+  };
+  setRefreshToken(data.refresh_token);
+  persistAuth(storageConfig, data.access_token, getStoredAuth(storageConfig).user);
+  return data.access_token;
+}
+
+let pendingRefresh: Promise<string | null> | null = null;
+
+/**
+ * Trade the stored refresh token for a new access token. Concurrent callers
+ * share one request, since each refresh token can only be used once.
+ * Resolves to null (and signs out) when the session has ended.
+ */
+export function refreshAccessToken() {
+  if (!pendingRefresh) {
+    pendingRefresh = requestRefresh().finally(() => {
+      pendingRefresh = null;
+    });
+  }
+  return pendingRefresh;
+}
+
+/**
+ * fetch() an API path with the access token as stored right now (it rotates
+ * every few minutes, so never keep a copy). After a 401 the session is
+ * refreshed once and the request retried.
+ */
+export async function authorizedFetch(path: string, init: RequestInit = {}) {
+  const url = /^https?:\/\//.test(path) ? path : `${API_BASE_URL}${path}`;
+  const send = (token: string | null) => {
+    const headers = new Headers(init.headers);
+    if (token) {
+      headers.set("Authorization", `Bearer ${token}`);
+    } else {
+      headers.delete("Authorization");
+    }
+    return fetch(url, { ...init, headers });
+  };
+
+  const token = getStoredAuth(storageConfig).token;
+  const response = await send(token);
+  if (response.status !== 401 || !token) {
+    return response;
+  }
+  const refreshedToken = await refreshAccessToken();
+  return refreshedToken ? send(refreshedToken) : response;
+}
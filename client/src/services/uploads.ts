@@ -0,0 +1,66 @@
+import { API_BASE_URL } from "@/utils/constants";
+import { apiRequest, extractErrorMessage } from "./api";
+
+type PresignedUpload = {
+  key: string;
+  url: string;
+  exists: boolean;
+  upload: {
+    method: "PUT";
+    url: string;
+    headers: Record<string, string>;
+  } | null;
+  expires_in: number;
+};
+
+async function sha256Hex(file: File) {
+  const digest = await crypto.subtle.digest("SHA-256", await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest))
+    .map((byte) => byte.toString(16).padStart(2, "0"))
+    .join("");
+}
+
+/**
+ * Upload one image straight to storage and return its public URL.
+ * The API only signs the upload; the bytes go to the bucket (or the API's
+ * local stand-in), and images it already has are not sent again.
+ */
+export async function uploadImageDirect(file: File) {
+  const { data } = await apiRequest<{ data: PresignedUpload }>(
+    "/uploads/presign",
+    {
+      method: "POST",
+      body: JSON.stringify({
+        content_type: file.type,
+        size: file.size,
+        sha256: await sha256Hex(file),
+      }),
+    }
+  );
+
+  if (data.upload) {
+    const target = data.upload.url.startsWith("/")
+      ? `${API_BASE_URL}${data.upload.url}`
+      : data.upload.url;
+    const response = await fetch(target, {
+      method: data.upload.method,
+      headers: data.upload.headers,
+      body: file,
+    });
+    if (!response.ok) {
+      throw new Error(
+        `Failed to upload ${file.name}: ${await extractErrorMessage(response)}`
+      );
+    }
+  }
+  return data.url;
+}
+
+export function uploadImagesDirect(files: File[]) {
+  return Promise.all(files.map((file) => uploadImageDirect(file)));
+}
+
+/** Append uploaded URLs to the comma-separated image_urls form field. */
+export function mergeImageUrls(existing: string, uploaded: string[]) {
+  return [existing.trim(), ...uploaded].filter(Boolean).join(",");
+}
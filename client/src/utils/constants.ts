@@ -2,5 +2,6 @@ export const API_BASE_URL = import.meta.env.VITE_API_URL ?? "http://127.0.0.1:40
 
 export const STORAGE_KEYS = {
   token: "access_token",
+  refreshToken: "refresh_token",
   user: "user",
 } as const;
@@ -1,6 +1,7 @@
 export type StorageKeyConfig = {
   token: string;
   user: string;
+  refreshToken?: string;
 };
 
 type AuthPayload<UserShape> = {
@@ -64,5 +65,8 @@ export function clearStoredAuth(keys: StorageKeyConfig) {
   if (!isBrowser()) return;
   window.localStorage.removeItem(keys.token);
   window.localStorage.removeItem(keys.user);
+  if (keys.refreshToken) {
+    window.localStorage.removeItem(keys.refreshToken);
+  }
   window.dispatchEvent(new Event("user-auth-changed"));
 }
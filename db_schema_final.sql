@@ -260,6 +260,51 @@ CREATE TABLE IF NOT EXISTS collaborator_requests (
     updated_at TIMESTAMP NOT NULL DEFAULT NOW()
 );
 
+-- ============================================================
+-- 8. EMAIL OUTBOX TABLE
+-- ============================================================
+-- Notification emails are inserted in the transaction that triggers them
+-- and sent by the background sender in mailer.py.
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    to_email VARCHAR(255) NOT NULL,
+    subject TEXT NOT NULL,
+    body_html TEXT NOT NULL,
+    body_text TEXT,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (
+        status IN ('pending', 'sent', 'failed')
+    ),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    sent_at TIMESTAMP
+);
+
+-- ============================================================
+-- 9. SESSION TOKEN TABLES
+-- ============================================================
+-- Single-use refresh tokens (SHA-256 hashes only) and revoked access
+-- tokens, mirrored per API worker as a bloom filter (auth_tokens.py).
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4 (),
+    user_id UUID NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    family_id UUID NOT NULL,
+    token_hash CHAR(64) NOT NULL UNIQUE,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMP NOT NULL,
+    used_at TIMESTAMP,
+    revoked_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS token_revocations (
+    id BIGSERIAL PRIMARY KEY,
+    jti VARCHAR(64),
+    user_id UUID NOT NULL,
+    revoked_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMP NOT NULL
+);
+
 -- ============================================================
 -- INDEXES
 -- ============================================================
@@ -276,16 +321,16 @@ CREATE INDEX IF NOT EXISTS idx_cities_geom ON cities USING GIST (geom);
 
 CREATE INDEX IF NOT EXISTS idx_cities_name_gin ON cities USING GIN (name jsonb_path_ops);
 
-CREATE INDEX IF NOT EXISTS idx_cities_active ON cities (is_active);
+CREATE INDEX IF NOT EXISTS idx_cities_user_created ON cities (user_id, created_at DESC);
 
 -- City details indexes
-CREATE INDEX IF NOT EXISTS idx_city_details_city ON city_details (city_id);
+CREATE INDEX IF NOT EXISTS idx_city_details_city_created ON city_details (city_id, created_at DESC);
 
 CREATE INDEX IF NOT EXISTS idx_city_details_predefined_title ON city_details (predefined_title);
 
 CREATE INDEX IF NOT EXISTS idx_city_details_body_gin ON city_details USING GIN (body jsonb_path_ops);
 
-CREATE INDEX IF NOT EXISTS idx_city_details_active ON city_details (is_active);
+CREATE INDEX IF NOT EXISTS idx_city_details_user_created ON city_details (user_id, created_at DESC);
 
 -- Location indexes
 CREATE INDEX IF NOT EXISTS idx_locations_geom ON locations USING GIST (geom);
@@ -294,7 +339,13 @@ CREATE INDEX IF NOT EXISTS idx_locations_name_gin ON locations USING GIN (name j
 
 CREATE INDEX IF NOT EXISTS idx_locations_type ON locations (location_type);
 
-CREATE INDEX IF NOT EXISTS idx_locations_active ON locations (is_active);
+CREATE INDEX IF NOT EXISTS idx_locations_city ON locations (city_id);
+
+CREATE INDEX IF NOT EXISTS idx_locations_active_city ON locations (city_id) WHERE is_active;
+
+CREATE INDEX IF NOT EXISTS idx_locations_active_geom ON locations USING GIST (geom) WHERE is_active;
+
+CREATE INDEX IF NOT EXISTS idx_locations_user_created ON locations (user_id, created_at DESC);
 
 -- Road indexes
 CREATE INDEX IF NOT EXISTS idx_roads_geom ON roads USING GIST (geom);
@@ -303,7 +354,13 @@ CREATE INDEX IF NOT EXISTS idx_roads_name_gin ON roads USING GIN (name jsonb_pat
 
 CREATE INDEX IF NOT EXISTS idx_roads_type ON roads (road_type);
 
-CREATE INDEX IF NOT EXISTS idx_roads_active ON roads (is_active);
+CREATE INDEX IF NOT EXISTS idx_roads_city ON roads (city_id);
+
+CREATE INDEX IF NOT EXISTS idx_roads_active_city ON roads (city_id) WHERE is_active;
+
+CREATE INDEX IF NOT EXISTS idx_roads_active_geom ON roads USING GIST (geom) WHERE is_active;
+
+CREATE INDEX IF NOT EXISTS idx_roads_user_created ON roads (user_id, created_at DESC);
 
 -- Route indexes
 CREATE INDEX IF NOT EXISTS idx_routes_geom ON routes USING GIST (geom);
@@ -313,7 +370,7 @@ CREATE INDEX IF NOT EXISTS idx_routes_start ON routes USING GIST (start_loc);
 CREATE INDEX IF NOT EXISTS idx_routes_end ON routes USING GIST (end_loc);
 
 -- Route history indexes
-CREATE INDEX IF NOT EXISTS idx_history_user ON user_route_history (user_id);
+CREATE INDEX IF NOT EXISTS idx_history_user_accessed ON user_route_history (user_id, accessed_at DESC NULLS LAST, history_id DESC);
 
 CREATE INDEX IF NOT EXISTS idx_history_route ON user_route_history (route_id);
 
@@ -326,6 +383,37 @@ CREATE INDEX IF NOT EXISTS idx_collaborator_requests_user_id ON collaborator_req
 
 CREATE INDEX IF NOT EXISTS idx_collaborator_requests_status ON collaborator_requests (status);
 
+-- Email outbox: the sender only scans messages that are still due
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (next_attempt_at) WHERE status = 'pending';
+
+-- Session token indexes
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family ON refresh_tokens (family_id);
+
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user ON refresh_tokens (user_id) WHERE revoked_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_expires ON refresh_tokens (expires_at);
+
+CREATE INDEX IF NOT EXISTS idx_token_revocations_jti ON token_revocations (jti) WHERE jti IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_token_revocations_user ON token_revocations (user_id, revoked_at) WHERE jti IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_token_revocations_expires ON token_revocations (expires_at);
+
+-- Upload reference indexes
+-- image_urls may hold absolute (http://host/uploads/...) or relative URLs;
+-- image_url_paths() strips the origin so both match the same upload path.
+CREATE OR REPLACE FUNCTION image_url_paths(urls TEXT[]) RETURNS TEXT[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT COALESCE(array_agg(regexp_replace(url, '^[A-Za-z][A-Za-z0-9+.-]*://[^/]+', '')), '{}')
+    FROM unnest(urls) AS url
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_cities_image_paths_gin ON cities USING GIN (image_url_paths(image_urls));
+
+CREATE INDEX IF NOT EXISTS idx_city_details_image_paths_gin ON city_details USING GIN (image_url_paths(image_urls));
+
+CREATE INDEX IF NOT EXISTS idx_locations_image_paths_gin ON locations USING GIN (image_url_paths(image_urls));
+
 -- ============================================================
 -- TRIGGER FUNCTION
 -- ============================================================
@@ -396,6 +484,143 @@ CREATE TRIGGER trg_collaborator_requests_touch
   FOR EACH ROW
   EXECUTE FUNCTION touch_updated_at();
 
+-- ============================================================
+-- MATERIALIZED STATISTICS
+-- Dashboard aggregates, refreshed with REFRESH MATERIALIZED VIEW
+-- CONCURRENTLY (see server/stats.py). Each view keeps a unique
+-- index so it can be refreshed without blocking readers.
+-- ============================================================
+
+-- Per-city content statistics
+CREATE MATERIALIZED VIEW IF NOT EXISTS city_stats AS
+SELECT
+    c.id AS city_id,
+    COALESCE(l.location_count, 0) AS location_count,
+    COALESCE(l.active_location_count, 0) AS active_location_count,
+    COALESCE(l.location_count, 0) - COALESCE(l.active_location_count, 0) AS inactive_location_count,
+    COALESCE(l.location_type_counts, '{}'::jsonb) AS location_type_counts,
+    COALESCE(r.road_count, 0) AS road_count,
+    COALESCE(r.active_road_count, 0) AS active_road_count,
+    COALESCE(r.road_count, 0) - COALESCE(r.active_road_count, 0) AS inactive_road_count,
+    COALESCE(r.road_length_m, 0) AS road_length_m,
+    COALESCE(r.road_type_counts, '{}'::jsonb) AS road_type_counts,
+    NOW() AS refreshed_at
+FROM cities c
+LEFT JOIN (
+    SELECT
+        city_id,
+        SUM(type_count)::BIGINT AS location_count,
+        SUM(active_count)::BIGINT AS active_location_count,
+        jsonb_object_agg(location_type, type_count) AS location_type_counts
+    FROM (
+        SELECT
+            city_id,
+            COALESCE(location_type, 'unknown') AS location_type,
+            COUNT(*) AS type_count,
+            COUNT(*) FILTER (WHERE is_active) AS active_count
+        FROM locations
+        WHERE city_id IS NOT NULL
+        GROUP BY city_id, COALESCE(location_type, 'unknown')
+    ) by_type
+    GROUP BY city_id
+) l ON l.city_id = c.id
+LEFT JOIN (
+    SELECT
+        city_id,
+        SUM(type_count)::BIGINT AS road_count,
+        SUM(active_count)::BIGINT AS active_road_count,
+        SUM(type_length_m) AS road_length_m,
+        jsonb_object_agg(road_type, type_count) AS road_type_counts
+    FROM (
+        SELECT
+            city_id,
+            COALESCE(road_type, 'unknown') AS road_type,
+            COUNT(*) AS type_count,
+            COUNT(*) FILTER (WHERE is_active) AS active_count,
+            SUM((SELECT SUM(segment) FROM unnest(length_m) AS segment)) AS type_length_m
+        FROM roads
+        WHERE city_id IS NOT NULL
+        GROUP BY city_id, COALESCE(road_type, 'unknown')
+    ) by_type
+    GROUP BY city_id
+) r ON r.city_id = c.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_city_stats_city ON city_stats (city_id);
+
+-- Per-collaborator (and admin) content statistics
+CREATE MATERIALIZED VIEW IF NOT EXISTS collaborator_stats AS
+SELECT
+    u.id AS user_id,
+    COALESCE(c.city_count, 0) AS city_count,
+    COALESCE(d.city_detail_count, 0) AS city_detail_count,
+    COALESCE(l.location_count, 0) AS location_count,
+    COALESCE(l.active_location_count, 0) AS active_location_count,
+    COALESCE(l.location_count, 0) - COALESCE(l.active_location_count, 0) AS inactive_location_count,
+    COALESCE(l.location_type_counts, '{}'::jsonb) AS location_type_counts,
+    COALESCE(r.road_count, 0) AS road_count,
+    COALESCE(r.active_road_count, 0) AS active_road_count,
+    COALESCE(r.road_count, 0) - COALESCE(r.active_road_count, 0) AS inactive_road_count,
+    COALESCE(r.road_length_m, 0) AS road_length_m,
+    NOW() AS refreshed_at
+FROM users u
+LEFT JOIN (
+    SELECT user_id, COUNT(*) AS city_count
+    FROM cities
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id
+) c ON c.user_id = u.id
+LEFT JOIN (
+    SELECT user_id, COUNT(*) AS city_detail_count
+    FROM city_details
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id
+) d ON d.user_id = u.id
+LEFT JOIN (
+    SELECT
+        user_id,
+        SUM(type_count)::BIGINT AS location_count,
+        SUM(active_count)::BIGINT AS active_location_count,
+        jsonb_object_agg(location_type, type_count) AS location_type_counts
+    FROM (
+        SELECT
+            user_id,
+            COALESCE(location_type, 'unknown') AS location_type,
+            COUNT(*) AS type_count,
+            COUNT(*) FILTER (WHERE is_active) AS active_count
+        FROM locations
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id, COALESCE(location_type, 'unknown')
+    ) by_type
+    GROUP BY user_id
+) l ON l.user_id = u.id
+LEFT JOIN (
+    SELECT
+        user_id,
+        COUNT(*) AS road_count,
+        COUNT(*) FILTER (WHERE is_active) AS active_road_count,
+        SUM((SELECT SUM(segment) FROM unnest(length_m) AS segment)) AS road_length_m
+    FROM roads
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id
+) r ON r.user_id = u.id
+WHERE u.user_type IN ('admin', 'collaborator');
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_collaborator_stats_user ON collaborator_stats (user_id);
+
+-- Routes planned per day
+CREATE MATERIALIZED VIEW IF NOT EXISTS route_daily_stats AS
+SELECT
+    accessed_at::date AS day,
+    COUNT(*) AS route_count,
+    COUNT(DISTINCT user_id) AS user_count,
+    COALESCE(SUM(total_distance_m), 0) AS total_distance_m,
+    NOW() AS refreshed_at
+FROM user_route_history
+WHERE accessed_at IS NOT NULL
+GROUP BY accessed_at::date;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_route_daily_stats_day ON route_daily_stats (day);
+
 -- ============================================================
 -- TABLE COMMENTS
 -- ============================================================
@@ -405,6 +630,14 @@ COMMENT ON COLUMN collaborator_requests.status IS 'Request status: pending, appr
 
 COMMENT ON COLUMN collaborator_requests.admin_notes IS 'Notes from admin when approving/rejecting the request';
 
+COMMENT ON TABLE email_outbox IS 'Notification emails waiting for, or recorded after, delivery by mailer.py';
+
+COMMENT ON COLUMN email_outbox.next_attempt_at IS 'When a pending message is next due; pushed forward while a sender holds it and by retry backoff';
+
+COMMENT ON COLUMN refresh_tokens.family_id IS 'id of the first token of a login; a rotated token shares its predecessor''s family';
+
+COMMENT ON COLUMN token_revocations.jti IS 'One revoked access token; NULL revokes every token the user was issued before revoked_at';
+
 -- ============================================================
 -- VERIFICATION
 -- ============================================================
@@ -422,6 +655,9 @@ BEGIN
     RAISE NOTICE '  - routes';
     RAISE NOTICE '  - user_route_history';
     RAISE NOTICE '  - collaborator_requests';
+    RAISE NOTICE '  - email_outbox';
+    RAISE NOTICE '  - refresh_tokens';
+    RAISE NOTICE '  - token_revocations';
     RAISE NOTICE '================================================';
     RAISE NOTICE 'All tables have is_active column for moderation';
     RAISE NOTICE 'All indexes and triggers created successfully';
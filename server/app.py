@@ -1,15 +1,15 @@
-from flask import Flask, request, jsonify, send_from_directory, url_for
+from flask import Flask, Request, Response, g, request, jsonify, url_for
 from flask_cors import CORS
 from flask_jwt_extended import (
     JWTManager,
     create_access_token,
     jwt_required,
+    get_jwt,
     get_jwt_identity,
     verify_jwt_in_request,
 )
 import psycopg2
 import psycopg2.extras
-from geopy.distance import great_circle
 import os
 import uuid
 import math
@@ -18,10 +18,42 @@ from dotenv import load_dotenv
 import datetime
 from functools import wraps
 import re
-from werkzeug.utils import secure_filename
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import shutil
+import hashlib
+import mimetypes
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.utils import cached_property
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import safe_join
+from serialization import (
+    FastJSONProvider,
+    serialize_city_record,
+    serialize_city_detail_record,
+    serialize_location_record,
+    serialize_road_record,
+    serialize_user_record,
+)
+from stats import refresh_stats_views
+from geo_import import build_import_rows, import_rows, read_features
+import haversine
+import auth_tokens
+import images
+import mailer
+import notifications
+import passwords
+import route_history
+import storage
+import upload_store
+
+try:
+    import redis
+except ImportError:
+    redis = None
 
 psycopg2.extras.register_uuid()
 
@@ -40,8 +72,14 @@ def env_value(name: str, default: str | None = None) -> str | None:
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.config["JWT_SECRET_KEY"] = os.environ.get('JWT_SECRET')
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = datetime.timedelta(days=7)
+# Access tokens carry the user's role and are short-lived; sessions continue
+# through rotating refresh tokens (see auth_tokens.py)
+app.config["JWT_ACCESS_TOKEN_EXPIRES"] = datetime.timedelta(
+    minutes=int(env_value('JWT_ACCESS_TOKEN_MINUTES', '15'))
+)
+REFRESH_TOKEN_EXPIRES = datetime.timedelta(days=int(env_value('JWT_REFRESH_TOKEN_DAYS', '30')))
 
 # Initialize extensions
 origins = os.environ.get('ORIGIN', '').split(",")
@@ -49,10 +87,16 @@ origins = os.environ.get('ORIGIN', '').split(",")
 CORS(app, 
      origins=origins,
      supports_credentials=True,
-     allow_headers=["Content-Type", "Authorization", "Access-Control-Allow-Credentials"],
+     allow_headers=["Content-Type", "Authorization", "Access-Control-Allow-Credentials", "x-amz-checksum-sha256"],
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
 jwt = JWTManager(app)
 
+# Number of reverse proxies in front of the API whose X-Forwarded-For is trusted,
+# so request.remote_addr (used for rate limiting) is the client's address
+TRUSTED_PROXY_COUNT = int(env_value('TRUSTED_PROXY_COUNT', '0'))
+if TRUSTED_PROXY_COUNT:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT, x_proto=TRUSTED_PROXY_COUNT)
+
 # Database connection function
 def get_db_connection():
     host = env_value('DB_HOST')
@@ -116,24 +160,140 @@ print("Upload folder set to:", UPLOAD_FOLDER)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Where promoted uploads live: UPLOAD_FOLDER, or an S3-compatible bucket shared by every instance.
+# UPLOAD_FOLDER still stages incoming files and, for the local backend, holds derivatives.
+upload_storage = storage.from_env(UPLOAD_FOLDER, signing_key=os.environ.get('JWT_SECRET'))
+DIRECT_UPLOAD_EXPIRES = int(env_value('DIRECT_UPLOAD_EXPIRES', '900'))
+DIRECT_UPLOAD_TYPES = {'image/png': 'png', 'image/jpeg': 'jpg', 'image/gif': 'gif'}
+print("Upload storage backend:", upload_storage.name)
+
+# Resized WebP/AVIF variants of uploads, rendered in the background and cached on disk
+IMAGE_DERIVATIVE_WORKERS = int(env_value('IMAGE_DERIVATIVE_WORKERS', '2'))
+IMAGE_DERIVATIVE_WAIT = float(env_value('IMAGE_DERIVATIVE_WAIT', '10'))
+derivative_pool = images.DerivativePool(UPLOAD_FOLDER, max_workers=IMAGE_DERIVATIVE_WORKERS)
+if not images.derivatives_enabled():
+    print("Pillow is not installed; image derivatives are disabled and originals are served")
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+UPLOAD_GC_GRACE_SECONDS = int(env_value('UPLOAD_GC_GRACE_SECONDS', str(upload_store.DEFAULT_GRACE_SECONDS)))
+
+# Upload limits: each image is capped while it streams in, the whole request by Flask
+UPLOAD_MAX_FILE_BYTES = int(env_value('UPLOAD_MAX_FILE_BYTES', str(10 * 1024 * 1024)))
+UPLOAD_MAX_REQUEST_BYTES = int(env_value('UPLOAD_MAX_REQUEST_BYTES', str(64 * 1024 * 1024)))
+IMPORT_MAX_REQUEST_BYTES = int(env_value('IMPORT_MAX_REQUEST_BYTES', str(512 * 1024 * 1024)))
+UPLOAD_WORKERS = int(env_value('UPLOAD_WORKERS', '4'))
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_REQUEST_BYTES
+upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix='uploads')
+# Endpoints whose file fields are not images and use werkzeug's default spooling
+RAW_FILE_ENDPOINTS = {'admin_import_geodata'}
+
+
+class UploadRequest(Request):
+    """Streams multipart files straight into uploads/.incoming, hashing and size-capping each one."""
+
+    @cached_property
+    def incoming_files(self):
+        return []
+
+    @cached_property
+    def stored_uploads(self):
+        return []
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint in RAW_FILE_ENDPOINTS:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        incoming = upload_store.IncomingFile(app.config['UPLOAD_FOLDER'], max_bytes=UPLOAD_MAX_FILE_BYTES)
+        self.incoming_files.append(incoming)
+        return incoming
+
+
+app.request_class = UploadRequest
+
+
+@app.after_request
+def finalize_stored_uploads(response):
+    """Render derivatives for uploads of a successful request; delete new files of a failed one.
+
+    A create or update that fails after its images were stored (validation, a
+    failed INSERT, an exception) would otherwise leave the files behind.
+    """
+    stored_uploads = request.stored_uploads
+    if not stored_uploads:
+        return response
+    if response.status_code < 400:
+        if upload_storage.name == 'local':
+            for stored in stored_uploads:
+                derivative_pool.prefetch(stored.relpath)
+    else:
+        removed = upload_store.discard_new_uploads(upload_storage, stored_uploads)
+        if removed:
+            app.logger.info(f"Discarded {len(removed)} upload(s) from a failed request")
+    return response
+
+
+@app.teardown_request
+def discard_incoming_uploads(exc):
+    for incoming in request.incoming_files:
+        incoming.discard()
+
+
+def incoming_upload(file_storage):
+    """Return the IncomingFile holding an uploaded file, spooling other streams to disk first."""
+    stream = file_storage.stream
+    if isinstance(stream, upload_store.IncomingFile):
+        return stream
+    incoming = upload_store.spool_stream(app.config['UPLOAD_FOLDER'], stream, UPLOAD_MAX_FILE_BYTES)
+    request.incoming_files.append(incoming)
+    return incoming
+
+
+def store_incoming_image(incoming, filename):
+    """Validate an uploaded image by its content and hand it to content-addressed storage.
+
+    Touches no request state, so it can run on upload_executor threads.
+    """
+    incoming.flush()
+    extension = upload_store.sniff_image_extension(incoming.head())
+    if extension is None:
+        raise ValueError(f"{filename} is not a PNG, JPEG or GIF image")
+    images.verify_image(incoming.path)
+    return upload_store.promote(upload_storage, incoming, extension)
+
+
 def save_uploaded_image(file_storage):
-    """Persist an uploaded image and return its public URL."""
+    """Persist an uploaded image under its content hash and return its public URL."""
     if not file_storage or not file_storage.filename:
         return None
 
     if not allowed_file(file_storage.filename):
         raise ValueError("Unsupported file type. Allowed types: png, jpg, jpeg, gif")
 
-    safe_name = secure_filename(file_storage.filename)
-    unique_name = f"{uuid.uuid4().hex}_{safe_name}"
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_name)
-    file_storage.save(file_path)
-    return f"/uploads/{unique_name}"
+    stored = store_incoming_image(incoming_upload(file_storage), file_storage.filename)
+    request.stored_uploads.append(stored)
+    return upload_storage.public_url(stored.relpath)
+
+
+def release_uploaded_images(urls):
+    """Remove uploads a delete left unreferenced; anything missed is swept by `upload_store.py gc`."""
+    if not urls:
+        return
+    conn = None
+    try:
+        conn = get_db_connection()
+        removed = upload_store.release_image_urls(
+            conn, upload_storage, urls, grace_seconds=UPLOAD_GC_GRACE_SECONDS
+        )
+        if removed:
+            app.logger.info(f"Removed {len(removed)} unreferenced upload(s)")
+    except Exception as exc:
+        app.logger.warning(f"Upload garbage collection failed: {exc}")
+    finally:
+        if conn is not None:
+            conn.close()
 
 
 def save_uploaded_images_from_request():
@@ -146,20 +306,197 @@ def save_uploaded_images_from_request():
         fallback = request.files.get('image_file') or request.files.get('image')
         files = [fallback] if fallback else []
 
-    uploaded_urls = []
+    files = [file_storage for file_storage in files if file_storage and file_storage.filename]
     for file_storage in files:
-        if not file_storage or not file_storage.filename:
+        if not allowed_file(file_storage.filename):
+            raise ValueError("Unsupported file type. Allowed types: png, jpg, jpeg, gif")
+
+    # The bytes are already on disk and hashed; sniffing, decoding checks and the
+    # final rename run for all files at once
+    futures = [
+        upload_executor.submit(store_incoming_image, incoming_upload(file_storage), file_storage.filename)
+        for file_storage in files
+    ]
+    uploaded_urls = []
+    error = None
+    for future in futures:
+        try:
+            stored = future.result()
+        except Exception as exc:
+            error = error or exc
             continue
-        url = save_uploaded_image(file_storage)
-        if url:
-            uploaded_urls.append(url)
+        request.stored_uploads.append(stored)
+        uploaded_urls.append(upload_storage.public_url(stored.relpath))
 
+    if error is not None:
+        # Rejecting one file rejects the request, and after_request removes the others
+        raise error
     return uploaded_urls
 
 
+def resolve_image_derivative(filename):
+    """Return (path to serve, exact) for ?w=&fmt= on an upload.
+
+    exact is False when the original stands in for a derivative that could not be
+    rendered (Pillow missing, render failed or too slow), so the response must not
+    be cached for long. Raises ValueError for malformed arguments.
+    """
+    width_arg = request.args.get('w')
+    format_arg = request.args.get('fmt')
+    if not width_arg and not format_arg:
+        return filename, True
+    if images.source_format(filename) is None:
+        return filename, True
+    if not images.derivatives_enabled():
+        return filename, False
+
+    width = None
+    if width_arg:
+        try:
+            width = images.snap_width(int(width_arg))
+        except ValueError:
+            raise ValueError("w must be a positive integer")
+    fmt = images.negotiate_format(format_arg, request.headers.get('Accept'), filename)
+    if width is None and fmt == images.source_format(filename):
+        return filename, True
+
+    source_path = safe_join(app.config['UPLOAD_FOLDER'], filename)
+    if source_path is None or not os.path.isfile(source_path):
+        return filename, True
+
+    try:
+        return derivative_pool.ensure(filename, width, fmt).result(timeout=IMAGE_DERIVATIVE_WAIT), True
+    except Exception as exc:
+        app.logger.warning(f"Serving original {filename}; derivative {width}/{fmt} unavailable: {exc}")
+        return filename, False
+
+
+# How upload bytes leave the server: 'worker' streams them from gunicorn with
+# os.sendfile, 'x-accel' (nginx) and 'x-sendfile' (Apache, lighttpd) hand the
+# file to the front proxy so no Python worker is held for the transfer.
+UPLOAD_SENDFILE_MODES = ('worker', 'x-accel', 'x-sendfile')
+UPLOAD_SENDFILE_MODE = (env_value('UPLOAD_SENDFILE_MODE', 'worker') or 'worker').lower()
+if UPLOAD_SENDFILE_MODE not in UPLOAD_SENDFILE_MODES:
+    raise RuntimeError(f"UPLOAD_SENDFILE_MODE must be one of: {', '.join(UPLOAD_SENDFILE_MODES)}")
+# Internal nginx location that aliases UPLOAD_FOLDER, used in x-accel mode
+UPLOAD_ACCEL_PREFIX = env_value('UPLOAD_ACCEL_PREFIX', '/_protected_uploads/')
+# Legacy <uuid>_<name> uploads can still be replaced in place, so they get a finite lifetime
+UPLOAD_CACHE_MAX_AGE = int(env_value('UPLOAD_CACHE_MAX_AGE', '86400'))
+UPLOAD_IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+UPLOAD_FALLBACK_CACHE_CONTROL = 'public, max-age=60'
+UPLOAD_SEND_CHUNK_SIZE = 64 * 1024
+
+def upload_etag(relpath, stat):
+    """Strong ETag: the content hash for content-addressed files, else path, size and mtime."""
+    digest = upload_store.content_digest(relpath)
+    if digest is not None:
+        return digest if relpath.count('/') == 2 else f"{digest}-{os.path.basename(relpath)}"
+    fingerprint = f"{relpath}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+
+def iter_file_range(stream, length):
+    """Yield exactly length bytes from stream's current position, then close it."""
+    try:
+        remaining = length
+        while remaining > 0:
+            chunk = stream.read(min(UPLOAD_SEND_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        stream.close()
+
+def send_upload(relpath, cache_control):
+    """Serve a stored upload with validators, single byte ranges and zero-copy transfer."""
+    path = safe_join(app.config['UPLOAD_FOLDER'], relpath)
+    if path is None or not os.path.isfile(path):
+        return jsonify({"is_success": False, "msg": "File not found"}), 404
+
+    stat = os.stat(path)
+    etag = upload_etag(relpath, stat)
+    last_modified = datetime.datetime.fromtimestamp(int(stat.st_mtime), tz=datetime.timezone.utc)
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    def apply_headers(response):
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = cache_control
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
+
+    not_modified = False
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    elif request.if_modified_since:
+        not_modified = last_modified <= request.if_modified_since
+    if not_modified:
+        return apply_headers(Response(status=304))
+
+    if UPLOAD_SENDFILE_MODE == 'x-accel':
+        response = Response(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = UPLOAD_ACCEL_PREFIX + relpath
+        return apply_headers(response)
+    if UPLOAD_SENDFILE_MODE == 'x-sendfile':
+        response = Response(mimetype=mimetype)
+        response.headers['X-Sendfile'] = path
+        return apply_headers(response)
+
+    size = stat.st_size
+    start, length, status = 0, size, 200
+    byte_range = request.range
+    # If-Range with a stale validator means the client's partial copy is outdated
+    if_range = request.if_range
+    if byte_range is not None and (if_range.etag or if_range.date):
+        if if_range.etag != etag and not (if_range.date and last_modified <= if_range.date):
+            byte_range = None
+    if byte_range is not None:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            if len(byte_range.ranges) == 1:
+                response = Response(status=416)
+                response.headers['Content-Range'] = f"bytes */{size}"
+                return apply_headers(response)
+            # Multipart ranges are rare for images; answer with the whole file
+        else:
+            start, stop = bounds
+            length, status = stop - start, 206
+
+    stream = open(path, 'rb')
+    stream.seek(start)
+    # gunicorn's wsgi.file_wrapper is sent with os.sendfile from the current offset
+    # for Content-Length bytes; other servers get an exact-length generator
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    body = file_wrapper(stream, UPLOAD_SEND_CHUNK_SIZE) if file_wrapper else iter_file_range(stream, length)
+    response = Response(body, status=status, mimetype=mimetype, direct_passthrough=True)
+    response.content_length = length
+    if status == 206:
+        response.headers['Content-Range'] = f"bytes {start}-{start + length - 1}/{size}"
+    return apply_headers(response)
+
+
 @app.route('/uploads/<path:filename>')
 def serve_uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # Temp and derivative directories are internal; derivatives go through ?w=&fmt=
+    if any(segment.startswith('.') for segment in filename.split('/')):
+        return jsonify({"is_success": False, "msg": "File not found"}), 404
+
+    try:
+        relpath, exact = resolve_image_derivative(filename)
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+
+    if not exact:
+        cache_control = UPLOAD_FALLBACK_CACHE_CONTROL
+    elif upload_store.content_digest(filename) is not None:
+        cache_control = UPLOAD_IMMUTABLE_CACHE_CONTROL
+    else:
+        cache_control = f"public, max-age={UPLOAD_CACHE_MAX_AGE}"
+
+    response = send_upload(relpath, cache_control)
+    if request.args.get('fmt', '').strip().lower() == 'auto' and not isinstance(response, tuple):
+        response.vary.add('Accept')
+    return response
 
 def extract_normalized_payload():
     """Return incoming data as a normalized dict and flag for multipart payloads."""
@@ -194,7 +531,7 @@ def extract_normalized_payload():
 
 # Helper functions
 def calculate_distance(point1, point2):
-    return great_circle((point1[1], point1[0]), (point2[1], point2[0])).meters
+    return haversine.distance(point1, point2)
 
 def extract_coordinates_from_wkt(wkt_string):
     """Extract coordinates from a WKT point string"""
@@ -209,6 +546,43 @@ def extract_coordinates_from_wkt(wkt_string):
     
     return None
 
+GEOMETRY_FORMATS = ('wkt', 'geojson', 'coords', 'wkb')
+
+def geometry_select_sql(geometry_format='wkt', column='geom'):
+    """Return the SQL expression that encodes a geometry column in the requested format.
+
+    geojson returns the GeoJSON geometry object, coords only its coordinates array and
+    wkb the hex-encoded OGC binary, so clients no longer need to parse WKT text.
+    """
+    if geometry_format == 'geojson':
+        return f"ST_AsGeoJSON({column})::json"
+    if geometry_format == 'coords':
+        return f"(ST_AsGeoJSON({column})::json -> 'coordinates')"
+    if geometry_format == 'wkb':
+        return f"encode(ST_AsBinary({column}), 'hex')"
+    if geometry_format == 'wkt':
+        return f"ST_AsText({column})"
+    raise ValueError(f"geometry_format must be one of: {', '.join(GEOMETRY_FORMATS)}")
+
+def parse_geometry_format_arg(raw_value):
+    """Validate the geometry_format query argument, defaulting to WKT."""
+    if not raw_value:
+        return 'wkt'
+    geometry_format = raw_value.strip().lower()
+    if geometry_format not in GEOMETRY_FORMATS:
+        raise ValueError(f"geometry_format must be one of: {', '.join(GEOMETRY_FORMATS)}")
+    return geometry_format
+
+def decode_wkb_linestring(wkb):
+    """Decode a 2D WKB LINESTRING (as returned by ST_AsBinary) into (lon, lat) tuples."""
+    data = bytes(wkb)
+    byte_order = '<' if data[0] == 1 else '>'
+    geometry_type, point_count = struct.unpack_from(f'{byte_order}II', data, 1)
+    if geometry_type != 2:
+        raise ValueError(f"Expected a 2D WKB LineString, got geometry type {geometry_type}")
+    values = struct.unpack_from(f'{byte_order}{point_count * 2}d', data, 9)
+    return list(zip(values[0::2], values[1::2]))
+
 def safe_extract_coordinates(item, prefix):
     """Safely extract coordinates from database result"""
     lon_key = f"{prefix}_lon"
@@ -461,65 +835,274 @@ def build_linestring_wkt(coords):
 def compute_segment_lengths(coords):
     if len(coords) < 2:
         return []
-    lengths = []
-    for i in range(len(coords) - 1):
-        lengths.append(calculate_distance(coords[i], coords[i + 1]))
-    return lengths
-
-def send_email(to_email, subject, body):
-    """Send email notification to user"""
-    try:
-        smtp_server = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.environ.get('SMTP_PORT', '587'))
-        smtp_user = os.environ.get('SMTP_USER')
-        smtp_password = os.environ.get('SMTP_PASSWORD')
-        from_email = os.environ.get('FROM_EMAIL', smtp_user)
-        
-        if not smtp_user or not smtp_password:
-            app.logger.warning("SMTP credentials not configured. Email not sent.")
-            return False
-        
-        msg = MIMEMultipart()
-        msg['From'] = from_email
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        msg.attach(MIMEText(body, 'html'))
-        
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(smtp_user, smtp_password)
-        server.send_message(msg)
-        server.quit()
-        
-        app.logger.info(f"Email sent successfully to {to_email}")
-        return True
-    except Exception as exc:
-        app.logger.error(f"Failed to send email to {to_email}: {str(exc)}")
-        return False
+    return haversine.segment_lengths(coords).tolist()
 
-def admin_required(fn):
-    """Decorator to require admin privileges"""
-    @wraps(fn)
-    @jwt_required()
-    def wrapper(*args, **kwargs):
-        user_id = get_jwt_identity()
+def parse_number_list(raw_value, expected_count, label):
+    """Parse a comma separated query value into a fixed number of floats."""
+    parts = [segment.strip() for segment in str(raw_value).split(',')]
+    if len(parts) != expected_count:
+        raise ValueError(f"{label} must contain {expected_count} comma-separated numbers")
+    try:
+        values = [float(part) for part in parts]
+    except ValueError:
+        raise ValueError(f"{label} must contain only numbers")
+    if any(math.isnan(value) or math.isinf(value) for value in values):
+        raise ValueError(f"{label} must contain only finite numbers")
+    return values
+
+def parse_list_arg(raw_value):
+    """Split a comma separated query value into a list of non-empty strings."""
+    if not raw_value:
+        return []
+    return [segment.strip() for segment in raw_value.split(',') if segment.strip()]
+
+def parse_spatial_query_args(args):
+    """Parse bbox/near/radius_m/order/limit query arguments used by map endpoints."""
+    spatial = {}
+
+    bbox_raw = args.get('bbox')
+    if bbox_raw:
+        min_lon, min_lat, max_lon, max_lat = parse_number_list(bbox_raw, 4, 'bbox')
+        if min_lon > max_lon or min_lat > max_lat:
+            raise ValueError("bbox must be ordered as minlon,minlat,maxlon,maxlat")
+        spatial['bbox'] = (min_lon, min_lat, max_lon, max_lat)
+
+    near_raw = args.get('near')
+    if near_raw:
+        spatial['near'] = tuple(parse_number_list(near_raw, 2, 'near'))
+
+    radius_raw = args.get('radius_m')
+    if radius_raw:
+        if 'near' not in spatial:
+            raise ValueError("radius_m requires near=lon,lat")
+        radius_m = parse_number_list(radius_raw, 1, 'radius_m')[0]
+        if radius_m <= 0:
+            raise ValueError("radius_m must be greater than zero")
+        spatial['radius_m'] = radius_m
+
+    order = args.get('order')
+    if order:
+        if order != 'distance':
+            raise ValueError("order must be 'distance'")
+        if 'near' not in spatial:
+            raise ValueError("order=distance requires near=lon,lat")
+        spatial['order_by_distance'] = True
+
+    limit_raw = args.get('limit')
+    if limit_raw:
+        try:
+            limit = int(limit_raw)
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if limit <= 0:
+            raise ValueError("limit must be greater than zero")
+        spatial['limit'] = limit
+
+    return spatial
+
+def build_spatial_clauses(spatial, exact=False):
+    """Translate parsed spatial arguments into WHERE/ORDER BY fragments over a geography `geom`.
+
+    The bbox test uses `&&` so the GiST index answers it directly; `exact` adds
+    `ST_Intersects` for linework whose bounding box can overlap without the line itself.
+    """
+    clauses = []
+    params = []
+    order_sql = None
+    order_params = []
+
+    if 'bbox' in spatial:
+        envelope = "ST_MakeEnvelope(%s, %s, %s, %s, 4326)::geography"
+        if exact:
+            clauses.append(f"ST_Intersects(geom, {envelope})")
+        else:
+            clauses.append(f"geom && {envelope}")
+        params.extend(spatial['bbox'])
+
+    if 'radius_m' in spatial:
+        clauses.append("ST_DWithin(geom, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography, %s)")
+        params.extend([*spatial['near'], spatial['radius_m']])
+
+    if spatial.get('order_by_distance'):
+        order_sql = "geom <-> ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography"
+        order_params = list(spatial['near'])
+
+    return clauses, params, order_sql, order_params
+
+def parse_is_active_arg(raw_value):
+    """Return None when absent, otherwise a strict boolean from the query string."""
+    if raw_value is None:
+        return None
+    value = coerce_boolean(raw_value)
+    if not isinstance(value, bool):
+        raise ValueError("is_active must be true or false")
+    return value
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def parse_pagination_args(args):
+    """Return {'page', 'page_size'} when either argument is present, otherwise None."""
+    if args.get('page') is None and args.get('page_size') is None:
+        return None
+    try:
+        page = int(args.get('page') or 1)
+        page_size = int(args.get('page_size') or DEFAULT_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise ValueError("page and page_size must be integers")
+    if page < 1:
+        raise ValueError("page must be at least 1")
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+    return {"page": page, "page_size": page_size}
+
+def pagination_sql(pagination, order_sql='created_at DESC, id'):
+    """Return (total-count column, ORDER BY/LIMIT/OFFSET tail, params) for an optional page."""
+    if not pagination:
+        return "", "", []
+    offset = (pagination["page"] - 1) * pagination["page_size"]
+    return (
+        ", COUNT(*) OVER () AS total_count",
+        f" ORDER BY {order_sql} LIMIT %s OFFSET %s",
+        [pagination["page_size"], offset],
+    )
+
+def build_page_response(rows, items, pagination):
+    """Wrap one page of serialized items with its pagination metadata.
+
+    The total comes from the COUNT(*) OVER () column; it is unknown (null)
+    when the requested page lies past the last row.
+    """
+    if rows:
+        total = rows[0]["total_count"]
+    else:
+        total = 0 if pagination["page"] == 1 else None
+    return jsonify({
+        "is_success": True,
+        "data": items,
+        "pagination": {
+            "page": pagination["page"],
+            "page_size": pagination["page_size"],
+            "total": total,
+        },
+    }), 200
+
+# Notification emails go through the email_outbox table; a background thread per
+# worker sends them over one reused SMTP session (see mailer.py)
+EMAIL_OUTBOX_SENDER = (env_value('EMAIL_OUTBOX_SENDER', 'true') or 'true').lower() in ('1', 'true', 'yes', 'on')
+email_sender = mailer.OutboxSender(
+    get_db_connection,
+    mailer.SMTPSettings.from_env(),
+    app.logger,
+    batch_size=int(env_value('EMAIL_BATCH_SIZE', str(mailer.DEFAULT_BATCH_SIZE))),
+    max_attempts=int(env_value('EMAIL_MAX_ATTEMPTS', str(mailer.DEFAULT_MAX_ATTEMPTS))),
+    poll_seconds=float(env_value('EMAIL_POLL_SECONDS', str(mailer.DEFAULT_POLL_SECONDS))),
+)
+
+
+@app.before_request
+def start_email_sender():
+    # Started lazily so each gunicorn worker (forked after preload) runs its own thread
+    if EMAIL_OUTBOX_SENDER:
+        email_sender.ensure_running()
+
+
+# Signed-in route requests queue their history rows; a background thread per
+# worker inserts them in batches (see route_history.py)
+route_history_writer = route_history.RouteHistoryWriter(
+    get_db_connection,
+    app.logger,
+    spool_dir=env_value('ROUTE_HISTORY_SPOOL_DIR', route_history.SPOOL_DIR),
+    flush_ms=int(env_value('ROUTE_HISTORY_FLUSH_MS', str(route_history.DEFAULT_FLUSH_MS))),
+    batch_size=int(env_value('ROUTE_HISTORY_BATCH_SIZE', str(route_history.DEFAULT_BATCH_SIZE))),
+)
+
+
+@app.before_request
+def start_route_history_writer():
+    route_history_writer.ensure_running()
+
+
+# Compiled once at startup; a missing or invalid template stops the app from booting
+notification_templates = notifications.NotificationTemplates()
+
+
+def queue_email(cur, to_email, subject, body_html, body_text=None):
+    """Queue an email notification in the caller's transaction; it is sent after the commit"""
+    mailer.enqueue_email(cur, to_email, subject, body_html, body_text)
+    g.email_queued = True
+
+
+def queue_notification(cur, to_email, name, locale, **context):
+    """Render a notification template in the recipient's locale and queue it"""
+    rendered = notification_templates.render(name, locale, **context)
+    queue_email(cur, to_email, rendered.subject, rendered.html, rendered.text)
+
+
+@app.after_request
+def wake_email_sender(response):
+    # The handler has committed by now, so the sender can pick the message up at once
+    if EMAIL_OUTBOX_SENDER and g.pop('email_queued', False):
+        email_sender.wake()
+    return response
+
+revocation_list = auth_tokens.RevocationList(
+    get_db_connection,
+    sync_interval=float(env_value('TOKEN_REVOCATION_SYNC_SECONDS', '5')),
+)
+
+
+@jwt.token_in_blocklist_loader
+def is_token_revoked(jwt_header, jwt_payload):
+    return revocation_list.is_revoked(jwt_payload)
+
+
+def create_role_access_token(user_id, role):
+    return create_access_token(
+        identity=str(user_id),
+        additional_claims={"role": role, "issued_ms": int(time.time() * 1000)},
+    )
+
+
+def issue_tokens(cur, user_id, role):
+    """Start a session: an access token with the user's role and a new refresh token family."""
+    refresh_token, _ = auth_tokens.issue_refresh_token(cur, user_id, REFRESH_TOKEN_EXPIRES)
+    return create_role_access_token(user_id, role), refresh_token
+
+
+def revoke_user_sessions(cur, user_id, refresh_tokens=False):
+    """Revoke a user's access tokens (clients refresh into their current role),
+    and optionally their refresh tokens so they must sign in again.
+    Call revocation_list.add(user_id=...) once the transaction commits."""
+    revocation_list.revoke_user(cur, user_id, app.config["JWT_ACCESS_TOKEN_EXPIRES"])
+    if refresh_tokens:
+        auth_tokens.revoke_user_refresh_tokens(cur, user_id)
+
+
+def current_user_role():
+    """Role claim of the current access token; tokens from before roles were
+    embedded fall back to a users lookup until they expire."""
+    role = get_jwt().get('role')
+    if role is None:
         conn = get_db_connection()
         cur = conn.cursor()
         try:
-            cur.execute("SELECT user_type FROM users WHERE id = %s;", (user_id,))
+            cur.execute("SELECT user_type FROM users WHERE id = %s;", (get_jwt_identity(),))
             user = cur.fetchone()
-            if not user:
-                return jsonify({"is_success": False, "msg": "Admin access required"}), 403
-
-            user_type = user[0]
-            is_admin = isinstance(user_type, str) and user_type.lower() == "admin"
-
-            if not is_admin:
-                return jsonify({"is_success": False, "msg": "Admin access required"}), 403
+            role = user[0] if user else None
         finally:
             cur.close()
             conn.close()
+    return role.lower() if isinstance(role, str) else None
+
+
+def admin_required(fn):
+    """Decorator to require admin privileges"""
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if current_user_role() != "admin":
+            return jsonify({"is_success": False, "msg": "Admin access required"}), 403
         return fn(*args, **kwargs)
     return wrapper
 
@@ -528,32 +1111,310 @@ def collaborator_required(fn):
     @wraps(fn)
     @jwt_required()
     def wrapper(*args, **kwargs):
-        user_id = get_jwt_identity()
-        conn = get_db_connection()
-        cur = conn.cursor()
+        if current_user_role() not in ["collaborator", "admin"]:
+            return jsonify({"is_success": False, "msg": "Collaborator access required"}), 403
+        return fn(*args, **kwargs)
+    return wrapper
+
+# Caching helpers
+class LRUCache:
+    """Thread-safe in-process LRU bounded by total payload bytes, with optional per-entry TTL."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.current_bytes -= len(value)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous[0])
+            self._entries[key] = (value, expires_at)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+VERSIONED_TABLES = ('cities', 'city_details', 'locations', 'roads')
+
+def get_table_versions(*tables):
+    """Return a (max(updated_at), row count) change marker per table.
+
+    Inserts and updates move max(updated_at) via the touch_updated_at triggers and
+    deletes move the count, so the pair changes whenever the table content does.
+    updated_at is a naive TIMESTAMP written in the session time zone, so it is
+    read back as a timestamptz in that zone rather than assumed to be UTC.
+    """
+    for table in tables:
+        if table not in VERSIONED_TABLES:
+            raise ValueError(f"Unsupported table for versioning: {table}")
+
+    selects = ", ".join(
+        f"(SELECT MAX(updated_at) AT TIME ZONE current_setting('TimeZone') FROM {table}), "
+        f"(SELECT COUNT(*) FROM {table})"
+        for table in tables
+    )
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT {selects};")
+        row = cur.fetchone()
+        return {table: (row[index * 2], row[index * 2 + 1]) for index, table in enumerate(tables)}
+    finally:
+        cur.close()
+        conn.close()
+
+
+CONDITIONAL_GET_MAX_AGE = int(env_value('CONDITIONAL_GET_MAX_AGE', '0'))
+
+def conditional_get(*tables):
+    """Answer If-None-Match / If-Modified-Since from table versions before running the handler.
+
+    The strong ETag covers the request path, query string and the versions of the
+    tables the endpoint reads, so a 304 never needs to load or serialize rows.
+    The versions are kept on g for cached_response, so a request reads them once.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            versions = get_table_versions(*tables)
+            g.table_versions = versions
+            fingerprint = f"{request.full_path}|" + "|".join(
+                f"{table}:{versions[table][0]}:{versions[table][1]}" for table in tables
+            )
+            etag = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+
+            modified_times = [versions[table][0] for table in tables if versions[table][0] is not None]
+            last_modified = None
+            if modified_times:
+                last_modified = max(modified_times).astimezone(datetime.timezone.utc).replace(microsecond=0)
+
+            def apply_validators(response):
+                response.set_etag(etag)
+                if last_modified is not None:
+                    response.last_modified = last_modified
+                response.headers['Cache-Control'] = f"public, max-age={CONDITIONAL_GET_MAX_AGE}, must-revalidate"
+                return response
+
+            not_modified = False
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            elif request.if_modified_since and last_modified is not None:
+                not_modified = last_modified <= request.if_modified_since
+
+            if not_modified:
+                return apply_validators(Response(status=304))
+
+            response = app.make_response(fn(*args, **kwargs))
+            if response.status_code == 200:
+                apply_validators(response)
+            return response
+        return wrapper
+    return decorator
+
+class ResponseCache:
+    """Read-through cache of pre-serialized JSON bodies keyed by endpoint, filters and table versions.
+
+    The versions come from get_table_versions, so any write to the database,
+    from the API or from a CLI script, changes the key and old bodies are
+    never served again; they just age out. When CACHE_REDIS_URL is set, bodies
+    are shared through Redis (or any Redis-compatible server) and the
+    in-process LRU acts as a first tier.
+    """
+
+    def __init__(self, max_bytes, ttl, redis_url=None, shared_ttl=3600, prefix='mx:cache:'):
+        self.local = LRUCache(max_bytes)
+        self.ttl = ttl
+        self.shared_ttl = shared_ttl
+        self.prefix = prefix
+        self.shared = None
+        if redis_url:
+            if redis is None:
+                app.logger.warning("CACHE_REDIS_URL is set but the redis package is not installed; using the in-process cache only")
+            else:
+                self.shared = redis.Redis.from_url(redis_url, socket_timeout=0.5)
+
+    def get(self, key):
+        body = self.local.get(key)
+        if body is not None or self.shared is None:
+            return body
         try:
-            cur.execute("SELECT user_type FROM users WHERE id = %s;", (user_id,))
-            user = cur.fetchone()
-            if not user:
-                return jsonify({"is_success": False, "msg": "Collaborator access required"}), 403
+            body = self.shared.get(f"{self.prefix}{key}")
+        except Exception as exc:
+            app.logger.warning(f"Shared cache read failed: {exc}")
+            return None
+        if body is not None:
+            self.local.set(key, body, ttl=self.ttl)
+        return body
 
-            user_type = user[0]
-            is_collaborator_or_admin = isinstance(user_type, str) and user_type.lower() in ["collaborator", "admin"]
+    def set(self, key, body):
+        self.local.set(key, body, ttl=self.ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(f"{self.prefix}{key}", body, ex=self.shared_ttl)
+            except Exception as exc:
+                app.logger.warning(f"Shared cache write failed: {exc}")
+
+
+response_cache = ResponseCache(
+    max_bytes=int(env_value('RESPONSE_CACHE_MAX_BYTES', str(32 * 1024 * 1024))),
+    ttl=int(env_value('RESPONSE_CACHE_TTL', '30')),
+    redis_url=env_value('CACHE_REDIS_URL'),
+    shared_ttl=int(env_value('RESPONSE_CACHE_SHARED_TTL', '3600')),
+)
+
+class RateLimiter:
+    """Fixed-window counters keyed by scope and identity (client IP, email).
+
+    Shares counters through Redis when CACHE_REDIS_URL is set, so the limit holds
+    across workers; otherwise each worker counts on its own. A Redis outage lets
+    requests through rather than locking everyone out.
+    """
+
+    def __init__(self, redis_url=None, prefix='mx:ratelimit:'):
+        self.prefix = prefix
+        self._windows = {}
+        self._lock = threading.Lock()
+        self.shared = None
+        if redis_url and redis is not None:
+            self.shared = redis.Redis.from_url(redis_url, socket_timeout=0.5)
+
+    def _key(self, scope, identity, window):
+        bucket = int(time.time() // window)
+        return f"{self.prefix}{scope}:{identity}:{bucket}", (bucket + 1) * window - time.time()
+
+    def _count(self, key, expires_in, increment):
+        if self.shared is not None:
+            try:
+                if not increment:
+                    return int(self.shared.get(key) or 0)
+                pipeline = self.shared.pipeline()
+                pipeline.incr(key)
+                pipeline.expire(key, int(expires_in) + 1)
+                return int(pipeline.execute()[0])
+            except Exception as exc:
+                app.logger.warning(f"Shared rate limiter unavailable: {exc}")
+                return 0
+        now = time.monotonic()
+        with self._lock:
+            if len(self._windows) > 10000:
+                self._windows = {k: v for k, v in self._windows.items() if v[1] > now}
+            count, expires_at = self._windows.get(key, (0, now + expires_in))
+            if increment:
+                count += 1
+                self._windows[key] = (count, expires_at)
+            return count
+
+    def hit(self, scope, identity, limit, window):
+        """Count one attempt; return seconds until the window resets if it is over the limit, else 0."""
+        key, expires_in = self._key(scope, identity, window)
+        return math.ceil(expires_in) if self._count(key, expires_in, True) > limit else 0
+
+    def exceeded(self, scope, identity, limit, window):
+        """Like hit() without counting, for limits that only count failures."""
+        key, expires_in = self._key(scope, identity, window)
+        return math.ceil(expires_in) if self._count(key, expires_in, False) >= limit else 0
+
+    def reset(self, scope, identity, window):
+        key, _ = self._key(scope, identity, window)
+        with self._lock:
+            self._windows.pop(key, None)
+        if self.shared is not None:
+            try:
+                self.shared.delete(key)
+            except Exception as exc:
+                app.logger.warning(f"Shared rate limiter unavailable: {exc}")
+
+
+def parse_rate_limit(value):
+    """Parse "count/seconds" into (count, seconds)."""
+    count, _, seconds = value.partition('/')
+    return int(count), int(seconds or 60)
+
+
+rate_limiter = RateLimiter(redis_url=env_value('CACHE_REDIS_URL'))
+# Login and register requests per client IP, and failed logins per email
+AUTH_RATE_LIMIT_IP = parse_rate_limit(env_value('AUTH_RATE_LIMIT_IP', '20/60'))
+AUTH_RATE_LIMIT_EMAIL = parse_rate_limit(env_value('AUTH_RATE_LIMIT_EMAIL', '5/900'))
+
+
+def rate_limited_response(retry_after):
+    response = jsonify({"is_success": False, "msg": "Too many attempts, please try again later"})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+
+password_hasher = passwords.PasswordHasher(
+    algorithm=(env_value('PASSWORD_HASH_ALGORITHM', 'argon2id') or 'argon2id').lower(),
+    bcrypt_rounds=int(env_value('BCRYPT_ROUNDS', '12')),
+    argon2_time_cost=int(env_value('ARGON2_TIME_COST', '3')),
+    argon2_memory_cost=int(env_value('ARGON2_MEMORY_KIB', str(64 * 1024))),
+    workers=int(env_value('PASSWORD_HASH_WORKERS', '2')),
+    max_pending=int(env_value('PASSWORD_HASH_MAX_PENDING', '16')),
+)
+
+
+def cached_response(*tables):
+    """Serve a GET handler's 200 JSON body from response_cache until one of its tables changes."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            versions = g.get('table_versions')
+            if versions is None or not all(table in versions for table in tables):
+                versions = get_table_versions(*tables)
+            filters = sorted(request.args.items(multi=True))
+            fingerprint = f"{request.path}|{filters}|" + "|".join(
+                f"{table}:{versions[table][0]}:{versions[table][1]}" for table in tables
+            )
+            key = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+
+            body = response_cache.get(key)
+            if body is not None:
+                response = Response(body, status=200, mimetype='application/json')
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = app.make_response(fn(*args, **kwargs))
+            if response.status_code == 200 and response.mimetype == 'application/json':
+                response_cache.set(key, response.get_data())
+                response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
 
-            if not is_collaborator_or_admin:
-                return jsonify({"is_success": False, "msg": "Collaborator access required"}), 403
-        finally:
-            cur.close()
-            conn.close()
-        return fn(*args, **kwargs)
-    return wrapper
 
 ## City
-def get_all_cities():
+def get_all_cities(geometry_format='wkt', pagination=None):
+    total_sql, page_sql, page_params = pagination_sql(pagination)
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     try:
-        cur.execute("""
+        cur.execute(f"""
             SELECT 
                 id,
                 user_id,
@@ -561,20 +1422,21 @@ def get_all_cities():
                 address,
                 image_urls,
                 description,
-                ST_AsText(geom) AS geometry,
-                is_active
-            FROM cities;
-        """)
+                {geometry_select_sql(geometry_format)} AS geometry,
+                is_active{total_sql}
+            FROM cities{page_sql};
+        """, page_params)
         return cur.fetchall()
     finally:
         cur.close()
         conn.close()
 
-def get_all_cities_by_user(user_id):
+def get_all_cities_by_user(user_id, geometry_format='wkt', pagination=None):
+    total_sql, page_sql, page_params = pagination_sql(pagination)
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     try:
-        cur.execute("""
+        cur.execute(f"""
             SELECT 
                 id,
                 user_id,
@@ -582,20 +1444,20 @@ def get_all_cities_by_user(user_id):
                 address,
                 image_urls,
                 description,
-                ST_AsText(geom) AS geometry,
-                is_active
-            FROM cities WHERE user_id = %s;
-        """, (str(user_id),))
+                {geometry_select_sql(geometry_format)} AS geometry,
+                is_active{total_sql}
+            FROM cities WHERE user_id = %s{page_sql};
+        """, [str(user_id)] + page_params)
         return cur.fetchall()
     finally:
         cur.close()
         conn.close()
 
-def get_city_by_id(city_id):
+def get_city_by_id(city_id, geometry_format='wkt'):
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     try:
-        cur.execute("""
+        cur.execute(f"""
             SELECT 
                 id,
                 user_id,
@@ -603,7 +1465,7 @@ def get_city_by_id(city_id):
                 address,
                 image_urls,
                 description,
-                ST_AsText(geom) AS geometry,
+                {geometry_select_sql(geometry_format)} AS geometry,
                 is_active
             FROM cities WHERE id = %s;
         """, (str(city_id),))
@@ -613,11 +1475,22 @@ def get_city_by_id(city_id):
         conn.close()
 
 ## City Details
-def get_all_city_details():
+def get_all_city_details(city_id=None, user_id=None, pagination=None):
+    total_sql, page_sql, page_params = pagination_sql(pagination)
+    clauses = []
+    params = []
+    if city_id:
+        clauses.append("city_id = %s")
+        params.append(str(city_id))
+    if user_id:
+        clauses.append("user_id = %s")
+        params.append(str(user_id))
+    where_sql = "WHERE " + " AND ".join(clauses) if clauses else ""
+    params += page_params
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     try:
-        cur.execute("""
+        cur.execute(f"""
             SELECT 
                 id,
                 city_id,
@@ -628,9 +1501,50 @@ def get_all_city_details():
                 image_urls,
                 is_active,
                 created_at,
-                updated_at
+                updated_at{total_sql}
             FROM city_details
-            ORDER BY created_at DESC
+            {where_sql}
+            {page_sql or "ORDER BY created_at DESC"}
+        """, params)
+        return cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+def get_city_reference_list():
+    """Light id+name(+point) projection of every city for dropdowns and map centering."""
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    try:
+        cur.execute("""
+            SELECT
+                id,
+                name->>'mm' AS name_mm,
+                name->>'en' AS name_en,
+                ST_AsText(geom) AS geometry
+            FROM cities
+            ORDER BY COALESCE(name->>'en', name->>'mm');
+        """)
+        return cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+def get_intersection_reference_list():
+    """Light projection of intersection locations that roads are drawn between."""
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    try:
+        cur.execute("""
+            SELECT
+                id,
+                city_id,
+                name->>'mm' AS name_mm,
+                name->>'en' AS name_en,
+                location_type,
+                ST_AsText(geom) AS geometry
+            FROM locations
+            WHERE location_type = 'intersection';
         """)
         return cur.fetchall()
     finally:
@@ -638,11 +1552,12 @@ def get_all_city_details():
         conn.close()
 
 ## Location
-def get_all_locations():
+def get_all_locations(geometry_format='wkt', pagination=None):
+    total_sql, page_sql, page_params = pagination_sql(pagination)
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     try:
-        cur.execute(""" 
+        cur.execute(f""" 
             SELECT 
                 id,
                 city_id,
@@ -652,21 +1567,22 @@ def get_all_locations():
                 image_urls,
                 description,
                 location_type,
-                ST_AsText(geom) AS geometry,
-                is_active
-            FROM locations;
-        """)
+                {geometry_select_sql(geometry_format)} AS geometry,
+                is_active{total_sql}
+            FROM locations{page_sql};
+        """, page_params)
         return cur.fetchall()
     finally:
         cur.close()
         conn.close()
 
-def get_locations_by_user(user_id):
+def get_locations_by_user(user_id, geometry_format='wkt', pagination=None):
+    total_sql, page_sql, page_params = pagination_sql(pagination)
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     try:
         cur.execute(
-            """SELECT 
+            f"""SELECT 
                 id,
                 city_id,
                 user_id,
@@ -675,22 +1591,22 @@ def get_locations_by_user(user_id):
                 image_urls,
                 description,
                 location_type,
-                ST_AsText(geom) AS geometry,
-                is_active
-            FROM locations WHERE user_id = %s;""",
-            (str(user_id),)
+                {geometry_select_sql(geometry_format)} AS geometry,
+                is_active{total_sql}
+            FROM locations WHERE user_id = %s{page_sql};""",
+            [str(user_id)] + page_params
         )
         return cur.fetchall()
     finally:
         cur.close()
         conn.close()
 
-def get_locations_by_city(city_id):
+def get_locations_by_city(city_id, geometry_format='wkt'):
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     try:
         cur.execute(
-            """SELECT 
+            f"""SELECT 
                 id,
                 city_id,
                 user_id,
@@ -699,7 +1615,7 @@ def get_locations_by_city(city_id):
                 image_urls,
                 description,
                 location_type,
-                ST_AsText(geom) AS geometry,
+                {geometry_select_sql(geometry_format)} AS geometry,
                 is_active
             FROM locations WHERE city_id = %s;""",
             (str(city_id),)
@@ -710,11 +1626,12 @@ def get_locations_by_city(city_id):
         conn.close()
 
 ## Road
-def get_all_roads():
+def get_all_roads(geometry_format='wkt', pagination=None):
+    total_sql, page_sql, page_params = pagination_sql(pagination)
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     try:
-        cur.execute("""
+        cur.execute(f"""
             SELECT
                 id,
                 city_id,
@@ -723,20 +1640,21 @@ def get_all_roads():
                 road_type,
                 is_oneway,
                 length_m,
-                ST_AsText(geom) AS geometry,
-                is_active
-            FROM roads
-        """)
+                {geometry_select_sql(geometry_format)} AS geometry,
+                is_active{total_sql}
+            FROM roads{page_sql}
+        """, page_params)
         return cur.fetchall()
     finally:
         cur.close()
         conn.close()
 
-def get_roads_by_user(user_id):
+def get_roads_by_user(user_id, geometry_format='wkt', pagination=None):
+    total_sql, page_sql, page_params = pagination_sql(pagination)
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     try:
-        cur.execute("""
+        cur.execute(f"""
             SELECT
                 id,
                 city_id,
@@ -745,21 +1663,21 @@ def get_roads_by_user(user_id):
                 road_type,
                 is_oneway,
                 length_m,
-                ST_AsText(geom) AS geometry,
-                is_active
-            FROM roads WHERE user_id = %s;""",
-            (str(user_id),)
+                {geometry_select_sql(geometry_format)} AS geometry,
+                is_active{total_sql}
+            FROM roads WHERE user_id = %s{page_sql};""",
+            [str(user_id)] + page_params
         )
         return cur.fetchall()
     finally:
         cur.close()
         conn.close()
 
-def get_roads_by_city(city_id):
+def get_roads_by_city(city_id, geometry_format='wkt'):
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     try:
-        cur.execute("""
+        cur.execute(f"""
             SELECT
                 id,
                 city_id,
@@ -768,7 +1686,7 @@ def get_roads_by_city(city_id):
                 road_type,
                 is_oneway,
                 length_m,
-                ST_AsText(geom) AS geometry,
+                {geometry_select_sql(geometry_format)} AS geometry,
                 is_active
             FROM roads WHERE city_id = %s;""",
             (str(city_id),)
@@ -778,45 +1696,162 @@ def get_roads_by_city(city_id):
         cur.close()
         conn.close()
 
-def get_all_users():
+def build_filter_query(base_query, clauses, params, order_sql=None, order_params=None, limit=None):
+    """Append WHERE/ORDER BY/LIMIT to a SELECT and return it with its parameters."""
+    query = base_query
+    params = list(params)
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    if order_sql:
+        query += f" ORDER BY {order_sql}"
+        params.extend(order_params or [])
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+def search_locations(user_id=None, city_id=None, location_types=None, is_active=None, spatial=None, geometry_format='wkt'):
+    """Filter locations by owner, city, type, moderation flag and map viewport."""
+    clauses = []
+    params = []
+    if user_id:
+        clauses.append("user_id = %s")
+        params.append(str(user_id))
+    if city_id:
+        clauses.append("city_id = %s")
+        params.append(str(city_id))
+    if location_types:
+        clauses.append("location_type = ANY(%s)")
+        params.append(list(location_types))
+    if is_active is not None:
+        clauses.append("is_active = %s")
+        params.append(is_active)
+
+    spatial = spatial or {}
+    spatial_clauses, spatial_params, order_sql, order_params = build_spatial_clauses(spatial)
+    query, params = build_filter_query(
+        f"""
+            SELECT
+                id,
+                city_id,
+                user_id,
+                name,
+                address,
+                image_urls,
+                description,
+                location_type,
+                {geometry_select_sql(geometry_format)} AS geometry,
+                is_active
+            FROM locations
+        """,
+        clauses + spatial_clauses,
+        params + spatial_params,
+        order_sql,
+        order_params,
+        spatial.get('limit'),
+    )
+
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    try:
+        cur.execute(query, tuple(params))
+        return cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+def search_roads(user_id=None, city_id=None, road_types=None, is_active=None, spatial=None, geometry_format='wkt'):
+    """Filter roads by owner, city, type, moderation flag and map viewport."""
+    clauses = []
+    params = []
+    if user_id:
+        clauses.append("user_id = %s")
+        params.append(str(user_id))
+    if city_id:
+        clauses.append("city_id = %s")
+        params.append(str(city_id))
+    if road_types:
+        clauses.append("road_type = ANY(%s)")
+        params.append(list(road_types))
+    if is_active is not None:
+        clauses.append("is_active = %s")
+        params.append(is_active)
+
+    spatial = spatial or {}
+    spatial_clauses, spatial_params, order_sql, order_params = build_spatial_clauses(spatial, exact=True)
+    query, params = build_filter_query(
+        f"""
+            SELECT
+                id,
+                city_id,
+                user_id,
+                name,
+                road_type,
+                is_oneway,
+                length_m,
+                {geometry_select_sql(geometry_format)} AS geometry,
+                is_active
+            FROM roads
+        """,
+        clauses + spatial_clauses,
+        params + spatial_params,
+        order_sql,
+        order_params,
+        spatial.get('limit'),
+    )
+
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    try:
+        cur.execute(query, tuple(params))
+        return cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+def get_all_users(pagination=None):
+    total_sql, page_sql, page_params = pagination_sql(pagination)
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     try:
         cur.execute(
-            """
+            f"""
                 SELECT
                     id,
                     username,
                     email,
                     user_type,
                     created_at,
-                    last_login
+                    last_login{total_sql}
                 FROM users
-                ORDER BY created_at DESC;
-            """
+                {page_sql or "ORDER BY created_at DESC"};
+            """,
+            page_params,
         )
         return cur.fetchall()
     finally:
         cur.close()
         conn.close()
 
-def get_all_collaborators():
+def get_all_collaborators(pagination=None):
+    total_sql, page_sql, page_params = pagination_sql(pagination)
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     try:
         cur.execute(
-            """
+            f"""
                 SELECT
                     id,
                     username,
                     email,
                     user_type,
                     created_at,
-                    last_login
+                    last_login{total_sql}
                 FROM users
                 WHERE user_type = 'collaborator'
-                ORDER BY created_at DESC;
-            """
+                {page_sql or "ORDER BY created_at DESC"};
+            """,
+            page_params,
         )
         return cur.fetchall()
     finally:
@@ -851,78 +1886,89 @@ def get_all_collaborator_requests():
 
 # Graph class for route planning
 class RoadGraph:
+    SNAP_THRESHOLD_M = 1
+
     def __init__(self):
         self.nodes = {}
         self.edges = {}
+        self.node_list = []
+        self.node_coords = haversine.as_lonlat_array([])
         self.build_graph()
         
     def build_graph(self):
         conn = get_db_connection()
         cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
 
-        def get_or_create_node(coord, node_map, threshold=1): 
-            for existing in node_map:
-                if calculate_distance(coord, existing) < threshold:
-                    return existing
-            return coord
+        # Road vertices closer than SNAP_THRESHOLD_M share one node
+        snap_index = haversine.SnapIndex(self.SNAP_THRESHOLD_M)
+        nodes = {}
+        edges = {}
 
-        self.nodes = {}
-        self.edges = {}
-
-        cur.execute("SELECT id, ST_AsText(geom) AS wkt, length_m, is_oneway FROM roads;")
+        cur.execute("SELECT id, ST_AsBinary(geom) AS wkb, length_m, is_oneway FROM roads;")
         roads = cur.fetchall()
 
         for road in roads:
             road_id = road['id']
-            wkt = road['wkt']
-            segment_lengths = road['length_m']  
+            segment_lengths = list(road['length_m'] or [])
             is_oneway = road['is_oneway']
 
-            coords_str = wkt.replace('LINESTRING(', '').replace(')', '')
-            coords_list = [tuple(map(float, c.split())) for c in coords_str.split(',')]
+            coords_list = decode_wkb_linestring(road['wkb'])
 
             snapped_coords = []
             for coord in coords_list:
-                snapped = get_or_create_node(coord, self.nodes)
-                if snapped not in self.nodes:
-                    self.nodes[snapped] = []
+                snapped = snap_index.snap(coord)
+                if snapped not in nodes:
+                    nodes[snapped] = []
                 snapped_coords.append(snapped)
 
+            # Segments without a stored length_m are measured between the snapped nodes
+            if len(segment_lengths) < len(snapped_coords) - 1:
+                segment_lengths += compute_segment_lengths(snapped_coords)[len(segment_lengths):]
+
             for i in range(len(snapped_coords) - 1):
                 start_node = snapped_coords[i]
                 end_node = snapped_coords[i + 1]
 
-                segment_length = segment_lengths[i] if segment_lengths and i < len(segment_lengths) else calculate_distance(start_node, end_node)
+                segment_length = segment_lengths[i]
 
-                self.nodes[start_node].append(end_node)
-                self.edges[(start_node, end_node)] = {
+                nodes[start_node].append(end_node)
+                edges[(start_node, end_node)] = {
                     'id': road_id,
                     'length': segment_length,
                     'geometry': [start_node, end_node]
                 }
 
                 if not is_oneway:
-                    self.nodes[end_node].append(start_node)
-                    self.edges[(end_node, start_node)] = {
+                    nodes[end_node].append(start_node)
+                    edges[(end_node, start_node)] = {
                         'id': road_id,
                         'length': segment_length,
                         'geometry': [end_node, start_node]
                     }
 
+        # Swap in the finished graph so concurrent requests never see a partial one
+        node_list = list(nodes)
+        self.nodes = nodes
+        self.edges = edges
+        self.node_list = node_list
+        self.node_coords = haversine.as_lonlat_array(node_list)
+
         app.logger.info(f"Road graph built with {len(self.nodes)} nodes and {len(self.edges)} edges")
         cur.close()
         conn.close()
 
     def find_nearest_node(self, point):
         max_distance = 500  
-        nearest_node = None
-        min_distance = float('inf')
-        
-        for node in self.nodes.keys():
-            distance = calculate_distance(point, node)
-            if distance < min_distance:
-                min_distance = distance
-                nearest_node = node
+        node_list = self.node_list
+        node_coords = self.node_coords
+        if not node_list:
+            app.logger.warning(f"No nearby node found within {max_distance}m for point {point}")
+            return None
+
+        distances = haversine.one_to_many(point, node_coords)
+        nearest_index = int(distances.argmin())
+        nearest_node = node_list[nearest_index]
+        min_distance = float(distances[nearest_index])
                 
         if min_distance > max_distance:
             app.logger.warning(f"No nearby node found within {max_distance}m for point {point}")
@@ -1051,39 +2097,74 @@ def main():
     })
 
 @app.route('/cities', methods=['GET'])
+@conditional_get('cities')
+@cached_response('cities')
 def get_cities():
     user_id = request.args.get('user_id')
+    try:
+        geometry_format = parse_geometry_format_arg(request.args.get('geometry_format'))
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+
     if user_id:
-        cities = get_all_cities_by_user(user_id)
+        cities = get_all_cities_by_user(user_id, geometry_format=geometry_format)
     else:
-        cities = get_all_cities()
+        cities = get_all_cities(geometry_format=geometry_format)
 
     cities_list = [serialize_city_record(city) for city in cities]
     return jsonify({"is_success": True, "data": cities_list}), 200
 
 @app.route('/cities/<uuid:city_id>', methods=['GET'])
+@conditional_get('cities')
+@cached_response('cities')
 def get_city(city_id):
-    city = get_city_by_id(city_id)
+    try:
+        geometry_format = parse_geometry_format_arg(request.args.get('geometry_format'))
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+
+    city = get_city_by_id(city_id, geometry_format=geometry_format)
     if not city:
         return jsonify({"is_success": False, "msg": "City not found"}), 404
 
     return jsonify({"is_success": True, "data": serialize_city_record(city)}), 200
 
 @app.route('/locations', methods=['GET'])
+@conditional_get('locations')
+@cached_response('locations')
 def get_locations():
     user_id = request.args.get('user_id')
     city_id = request.args.get('city_id')
-    if user_id:
-        locations = get_locations_by_user(user_id)
+    try:
+        spatial = parse_spatial_query_args(request.args)
+        is_active = parse_is_active_arg(request.args.get('is_active'))
+        geometry_format = parse_geometry_format_arg(request.args.get('geometry_format'))
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+    location_types = parse_list_arg(request.args.get('location_type'))
+
+    if spatial or location_types or is_active is not None:
+        locations = search_locations(
+            user_id=user_id,
+            city_id=city_id,
+            location_types=location_types,
+            is_active=is_active,
+            spatial=spatial,
+            geometry_format=geometry_format,
+        )
+    elif user_id:
+        locations = get_locations_by_user(user_id, geometry_format=geometry_format)
     elif city_id:
-        locations = get_locations_by_city(city_id)
+        locations = get_locations_by_city(city_id, geometry_format=geometry_format)
     else:
-        locations = get_all_locations()
+        locations = get_all_locations(geometry_format=geometry_format)
 
     locations_list = [serialize_location_record(loc) for loc in locations]
     return jsonify({"is_success": True, "data": locations_list}), 200
 
 @app.route('/city-details', methods=['GET'])
+@conditional_get('city_details')
+@cached_response('city_details')
 def get_city_details():
     """Public endpoint to fetch city details by city_id and predefined_title"""
     city_id = request.args.get('city_id')
@@ -1119,108 +2200,602 @@ def get_city_details():
         conn.close()
 
 @app.route('/roads', methods=['GET'])
+@conditional_get('roads')
+@cached_response('roads')
 def get_roads():
     user_id = request.args.get('user_id')
     city_id = request.args.get('city_id')
-    if user_id:
-        roads = get_roads_by_user(user_id)
+    try:
+        spatial = parse_spatial_query_args(request.args)
+        is_active = parse_is_active_arg(request.args.get('is_active'))
+        geometry_format = parse_geometry_format_arg(request.args.get('geometry_format'))
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+    road_types = parse_list_arg(request.args.get('road_type'))
+
+    if spatial or road_types or is_active is not None:
+        roads = search_roads(
+            user_id=user_id,
+            city_id=city_id,
+            road_types=road_types,
+            is_active=is_active,
+            spatial=spatial,
+            geometry_format=geometry_format,
+        )
+    elif user_id:
+        roads = get_roads_by_user(user_id, geometry_format=geometry_format)
     elif city_id:
-        roads = get_roads_by_city(city_id)
+        roads = get_roads_by_city(city_id, geometry_format=geometry_format)
     else:
-        roads = get_all_roads()
+        roads = get_all_roads(geometry_format=geometry_format)
 
     roads_list = [serialize_road_record(road) for road in roads]
     return jsonify({"is_success": True, "data": roads_list}), 200
 
 
-def ensure_mapping(record):
-    """Return a plain dict for serialization helpers."""
-    if record is None:
-        return {}
-    if isinstance(record, dict):
-        return record
-    if hasattr(record, "keys"):
-        return {key: record[key] for key in record.keys()}
+# Bulk exports
+EXPORT_ITERSIZE = int(env_value('EXPORT_ITERSIZE', '2000'))
+
+# Each query renders one GeoJSON Feature per row as JSON text so rows stream
+# straight from the server-side cursor to the response without re-encoding.
+EXPORT_FEATURE_QUERIES = {
+    'cities': """
+        SELECT json_build_object(
+            'type', 'Feature',
+            'id', id,
+            'geometry', ST_AsGeoJSON(geom)::json,
+            'properties', json_build_object(
+                'id', id,
+                'user_id', user_id,
+                'name_mm', name->>'mm',
+                'name_en', name->>'en',
+                'address_mm', address->>'mm',
+                'address_en', address->>'en',
+                'description_mm', description->>'mm',
+                'description_en', description->>'en',
+                'image_urls', image_urls,
+                'is_active', is_active,
+                'updated_at', updated_at
+            )
+        )::text
+        FROM cities
+    """,
+    'locations': """
+        SELECT json_build_object(
+            'type', 'Feature',
+            'id', id,
+            'geometry', ST_AsGeoJSON(geom)::json,
+            'properties', json_build_object(
+                'id', id,
+                'city_id', city_id,
+                'user_id', user_id,
+                'name_mm', name->>'mm',
+                'name_en', name->>'en',
+                'address_mm', address->>'mm',
+                'address_en', address->>'en',
+                'description_mm', description->>'mm',
+                'description_en', description->>'en',
+                'image_urls', image_urls,
+                'location_type', location_type,
+                'is_active', is_active,
+                'updated_at', updated_at
+            )
+        )::text
+        FROM locations
+    """,
+    'roads': """
+        SELECT json_build_object(
+            'type', 'Feature',
+            'id', id,
+            'geometry', ST_AsGeoJSON(geom)::json,
+            'properties', json_build_object(
+                'id', id,
+                'city_id', city_id,
+                'user_id', user_id,
+                'name_mm', name->>'mm',
+                'name_en', name->>'en',
+                'road_type', road_type,
+                'is_oneway', is_oneway,
+                'length_m', length_m,
+                'is_active', is_active,
+                'updated_at', updated_at
+            )
+        )::text
+        FROM roads
+    """,
+}
+
+EXPORT_MIMETYPES = {
+    'geojson': 'application/geo+json',
+    'ndjson': 'application/x-ndjson',
+}
+
+def stream_export_rows(conn, cur, export_format):
+    """Yield the export body in chunks of EXPORT_ITERSIZE features, closing the cursor when done."""
+    try:
+        if export_format == 'geojson':
+            yield '{"type":"FeatureCollection","features":['
+        first_chunk = True
+        while True:
+            rows = cur.fetchmany(EXPORT_ITERSIZE)
+            if not rows:
+                break
+            if export_format == 'geojson':
+                chunk = ",".join(row[0] for row in rows)
+                yield chunk if first_chunk else "," + chunk
+            else:
+                yield "".join(f"{row[0]}\n" for row in rows)
+            first_chunk = False
+        if export_format == 'geojson':
+            yield ']}'
+    except Exception as exc:
+        app.logger.error(f"Export stream aborted: {exc}")
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+@app.route('/export/<dataset>.geojson', methods=['GET'], defaults={'export_format': 'geojson'})
+@app.route('/export/<dataset>.ndjson', methods=['GET'], defaults={'export_format': 'ndjson'})
+def export_dataset(dataset, export_format):
+    """Stream a whole table as a GeoJSON FeatureCollection or newline-delimited features."""
+    base_query = EXPORT_FEATURE_QUERIES.get(dataset)
+    if base_query is None:
+        return jsonify({"is_success": False, "msg": f"Unknown dataset. Must be one of: {', '.join(EXPORT_FEATURE_QUERIES)}"}), 404
+
     try:
-        return dict(record)
-    except Exception:
-        return {}
+        is_active = parse_is_active_arg(request.args.get('is_active'))
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
 
+    clauses = []
+    params = []
+    city_id = request.args.get('city_id')
+    if city_id and dataset != 'cities':
+        try:
+            city_id = str(uuid.UUID(city_id))
+        except ValueError:
+            return jsonify({"is_success": False, "msg": "city_id must be a UUID"}), 400
+        clauses.append("city_id = %s")
+        params.append(city_id)
+    if is_active is not None:
+        clauses.append("is_active = %s")
+        params.append(is_active)
+    query, params = build_filter_query(base_query, clauses, params, order_sql="id")
 
-def serialize_city_record(city):
-    city = ensure_mapping(city)
-    name_obj = city.get("name")
-    address_obj = city.get("address")
-    description_obj = city.get("description")
-    name_payload = build_name_response(name_obj)
-    address_payload = build_address_response(address_obj)
-    description_payload = build_description_response(description_obj)
-    return {
-        "id": str(city["id"]),
-        "user_id": str(city["user_id"]) if city["user_id"] is not None else None,
-        **name_payload,
-        **address_payload,
-        "image_urls": city["image_urls"],
-        **description_payload,
-        "geometry": city["geometry"],
-        "is_active": city.get("is_active")
+    conn = get_db_connection()
+    cur = conn.cursor(name=f"export_{dataset}_{uuid.uuid4().hex}")
+    cur.itersize = EXPORT_ITERSIZE
+    try:
+        cur.execute(query, tuple(params))
+    except Exception as exc:
+        cur.close()
+        conn.close()
+        app.logger.error(f"Error exporting {dataset}: {exc}")
+        return jsonify({"is_success": False, "msg": "Failed to export data", "error": str(exc)}), 500
+
+    response = Response(stream_export_rows(conn, cur, export_format), mimetype=EXPORT_MIMETYPES[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{dataset}.{export_format}"'
+    return response
+
+
+# Vector tiles
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+TILE_MAX_ZOOM = 22
+TILE_FULL_DETAIL_ZOOM = 16
+TILE_BBOX_FILTER_MIN_ZOOM = 3
+LOCATION_TILE_MIN_ZOOM = 12
+WEB_MERCATOR_WORLD_SIZE = 40075016.685578488
+TILE_CACHE_DIR = env_value('TILE_CACHE_DIR')
+tile_cache = LRUCache(int(env_value('TILE_CACHE_MAX_BYTES', str(64 * 1024 * 1024))))
+# How long a worker reuses the roads/locations version before asking the database again
+TILE_VERSION_TTL = float(env_value('TILE_VERSION_TTL', '2'))
+TILE_VERSION_DIR_RE = re.compile(r'[0-9a-f]{16}')
+tile_version = {'tag': None, 'expires_at': 0.0}
+tile_version_lock = threading.Lock()
+
+def tile_simplify_tolerance(z):
+    """Half a screen pixel at zoom z in EPSG:3857 metres; 0 keeps full detail at street level."""
+    if z >= TILE_FULL_DETAIL_ZOOM:
+        return 0.0
+    return WEB_MERCATOR_WORLD_SIZE / (256 * 2 ** z) / 2
+
+def tile_lonlat_bounds(z, x, y):
+    """Return (min_lon, min_lat, max_lon, max_lat) for a slippy-map tile."""
+    n = 2 ** z
+
+    def tile_lat(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    return (x / n * 360.0 - 180.0, tile_lat(y + 1), (x + 1) / n * 360.0 - 180.0, tile_lat(y))
+
+def build_vector_tile(z, x, y, is_active=None):
+    """Render roads and locations inside a tile as a Mapbox Vector Tile with ST_AsMVT."""
+    road_clauses = []
+    location_clauses = []
+    params = {
+        'z': z,
+        'x': x,
+        'y': y,
+        'extent': TILE_EXTENT,
+        'buffer': TILE_BUFFER,
+        'tolerance': tile_simplify_tolerance(z),
+        'include_locations': z >= LOCATION_TILE_MIN_ZOOM,
+        'is_active': is_active,
     }
 
+    if z >= TILE_BBOX_FILTER_MIN_ZOOM:
+        min_lon, min_lat, max_lon, max_lat = tile_lonlat_bounds(z, x, y)
+        params.update({'min_lon': min_lon, 'min_lat': min_lat, 'max_lon': max_lon, 'max_lat': max_lat})
+        envelope = "ST_MakeEnvelope(%(min_lon)s, %(min_lat)s, %(max_lon)s, %(max_lat)s, 4326)::geography"
+        road_clauses.append(f"r.geom && {envelope}")
+        location_clauses.append(f"l.geom && {envelope}")
 
-def serialize_location_record(location):
-    location = ensure_mapping(location)
-    name_obj = location.get("name")
-    address_obj = location.get("address")
-    description_obj = location.get("description")
-    name_payload = build_name_response(name_obj)
-    address_payload = build_address_response(address_obj)
-    description_payload = build_description_response(description_obj)
-    return {
-        "id": str(location["id"]),
-        "city_id": str(location["city_id"]) if location["city_id"] is not None else None,
-        "user_id": str(location["user_id"]) if location["user_id"] is not None else None,
-        **name_payload,
-        **address_payload,
-        "image_urls": location["image_urls"],
-        **description_payload,
-        "location_type": location["location_type"],
-        "geometry": location["geometry"],
-        "is_active": location.get("is_active")
-    }
+    if is_active is not None:
+        road_clauses.append("r.is_active = %(is_active)s")
+        location_clauses.append("l.is_active = %(is_active)s")
 
+    road_where = " AND ".join(road_clauses) or "TRUE"
+    location_where = " AND ".join(location_clauses) or "TRUE"
 
-def serialize_road_record(road):
-    road = ensure_mapping(road)
-    name_obj = road.get("name")
-    name_payload = build_name_response(name_obj)
-    return {
-        "id": str(road["id"]),
-        "city_id": str(road["city_id"]) if road["city_id"] is not None else None,
-        "user_id": str(road["user_id"]) if road["user_id"] is not None else None,
-        **name_payload,
-        "road_type": road["road_type"],
-        "is_oneway": road["is_oneway"],
-        "length_m": road["length_m"],
-        "geometry": road["geometry"],
-        "is_active": road.get("is_active")
-    }
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+                WITH bounds AS (
+                    SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom
+                ),
+                road_features AS (
+                    SELECT
+                        ST_AsMVTGeom(
+                            ST_Simplify(ST_Transform(r.geom::geometry, 3857), %(tolerance)s, true),
+                            bounds.geom,
+                            %(extent)s,
+                            %(buffer)s,
+                            true
+                        ) AS geom,
+                        r.id::text AS id,
+                        r.name->>'mm' AS name_mm,
+                        r.name->>'en' AS name_en,
+                        r.road_type AS type,
+                        r.is_oneway
+                    FROM roads r, bounds
+                    WHERE {road_where}
+                ),
+                location_features AS (
+                    SELECT
+                        ST_AsMVTGeom(
+                            ST_Transform(l.geom::geometry, 3857),
+                            bounds.geom,
+                            %(extent)s,
+                            %(buffer)s,
+                            true
+                        ) AS geom,
+                        l.id::text AS id,
+                        l.name->>'mm' AS name_mm,
+                        l.name->>'en' AS name_en,
+                        l.location_type AS type
+                    FROM locations l, bounds
+                    WHERE %(include_locations)s AND {location_where}
+                )
+                SELECT
+                    COALESCE((SELECT ST_AsMVT(road_features.*, 'roads', %(extent)s, 'geom') FROM road_features WHERE geom IS NOT NULL), ''::bytea)
+                    || COALESCE((SELECT ST_AsMVT(location_features.*, 'locations', %(extent)s, 'geom') FROM location_features WHERE geom IS NOT NULL), ''::bytea);
+            """,
+            params,
+        )
+        row = cur.fetchone()
+        return bytes(row[0]) if row and row[0] is not None else b""
+    finally:
+        cur.close()
+        conn.close()
 
+def prune_tile_cache_dirs(current_tag):
+    """Delete the on-disk tiles of every data version except the current one."""
+    try:
+        entries = os.listdir(TILE_CACHE_DIR)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if entry != current_tag and TILE_VERSION_DIR_RE.fullmatch(entry):
+            shutil.rmtree(os.path.join(TILE_CACHE_DIR, entry), ignore_errors=True)
+
+def current_tile_version_tag():
+    """Tag for the current roads and locations data, re-read at most every TILE_VERSION_TTL seconds."""
+    now = time.monotonic()
+    with tile_version_lock:
+        if now < tile_version['expires_at']:
+            return tile_version['tag']
+
+    versions = get_table_versions('roads', 'locations')
+    version_tag = hashlib.sha1(f"{versions['roads']}|{versions['locations']}".encode()).hexdigest()[:16]
+    with tile_version_lock:
+        changed = version_tag != tile_version['tag']
+        tile_version.update(tag=version_tag, expires_at=now + TILE_VERSION_TTL)
+    if changed and TILE_CACHE_DIR:
+        prune_tile_cache_dirs(version_tag)
+    return version_tag
+
+def tile_cache_path(version_tag, z, x, y, is_active):
+    suffix = "" if is_active is None else f"_{'active' if is_active else 'inactive'}"
+    return os.path.join(TILE_CACHE_DIR, version_tag, str(z), str(x), f"{y}{suffix}.mvt")
+
+@app.route('/tiles/<int:z>/<int:x>/<int:y>.mvt', methods=['GET'])
+def get_vector_tile(z, x, y):
+    """Serve roads and locations as vector tiles, cached per tile and data version."""
+    if z > TILE_MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        return jsonify({"is_success": False, "msg": "Tile coordinates out of range"}), 400
 
-def serialize_user_record(user):
-    return {
-        "id": str(user["id"]),
-        "username": user["username"],
-        "email": user["email"],
-        "user_type": user.get("user_type"),
-        "is_admin": user.get("is_admin"),
-        "created_at": user["created_at"].isoformat() if user.get("created_at") else None,
-        "last_login": user["last_login"].isoformat() if user.get("last_login") else None,
-    }
+    try:
+        is_active = parse_is_active_arg(request.args.get('is_active'))
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+
+    version_tag = current_tile_version_tag()
+    etag = f"{version_tag}-{z}-{x}-{y}-{is_active}"
+
+    if request.if_none_match and etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    cache_key = (z, x, y, is_active, version_tag)
+    tile = tile_cache.get(cache_key)
+
+    if tile is None and TILE_CACHE_DIR:
+        disk_path = tile_cache_path(version_tag, z, x, y, is_active)
+        try:
+            with open(disk_path, 'rb') as f:
+                tile = f.read()
+        except OSError:
+            pass
+
+    if tile is None:
+        tile = build_vector_tile(z, x, y, is_active)
+        if TILE_CACHE_DIR:
+            disk_path = tile_cache_path(version_tag, z, x, y, is_active)
+            tmp_path = f"{disk_path}.{uuid.uuid4().hex}.tmp"
+            try:
+                os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+                with open(tmp_path, 'wb') as f:
+                    f.write(tile)
+                os.replace(tmp_path, disk_path)
+            except OSError as exc:
+                # Another worker may be pruning this version's directory
+                app.logger.warning(f"Failed to cache tile {z}/{x}/{y} on disk: {exc}")
+
+    tile_cache.set(cache_key, tile)
+
+    response = Response(tile, status=200 if tile else 204, mimetype='application/vnd.mapbox-vector-tile')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
+
+DASHBOARD_RECENT_LIMIT = 5
+MAX_DASHBOARD_RECENT_LIMIT = 50
+
+# Counts, per-type histograms and recent-N lists for the admin dashboard,
+# gathered in a single round trip instead of loading every table.
+# Location and road figures come from city_stats (as of its last refresh,
+# reported as stats_refreshed_at) plus the few rows without a city, which
+# the view leaves out; the other tables are small enough to count live.
+ADMIN_DASHBOARD_SUMMARY_SQL = """
+    WITH
+    city_counts AS (
+        SELECT COUNT(*) AS total, COUNT(*) FILTER (WHERE is_active) AS active
+        FROM cities
+    ),
+    city_detail_counts AS (
+        SELECT COUNT(*) AS total, COUNT(*) FILTER (WHERE is_active) AS active
+        FROM city_details
+    ),
+    location_counts AS (
+        SELECT COALESCE(SUM(total), 0) AS total, COALESCE(SUM(active), 0) AS active
+        FROM (
+            SELECT location_count AS total, active_location_count AS active
+            FROM city_stats
+            UNION ALL
+            SELECT COUNT(*), COUNT(*) FILTER (WHERE is_active)
+            FROM locations
+            WHERE city_id IS NULL
+        ) counted
+    ),
+    road_counts AS (
+        SELECT
+            COALESCE(SUM(total), 0) AS total,
+            COALESCE(SUM(active), 0) AS active,
+            COALESCE(SUM(length_m), 0) AS total_length_m
+        FROM (
+            SELECT road_count AS total, active_road_count AS active, road_length_m AS length_m
+            FROM city_stats
+            UNION ALL
+            SELECT
+                COUNT(*),
+                COUNT(*) FILTER (WHERE is_active),
+                SUM((SELECT SUM(segment) FROM unnest(length_m) AS segment))
+            FROM roads
+            WHERE city_id IS NULL
+        ) counted
+    ),
+    route_counts AS (
+        SELECT COALESCE(SUM(route_count), 0) AS total
+        FROM route_daily_stats
+    ),
+    user_counts AS (
+        SELECT
+            COUNT(*) AS total,
+            COUNT(*) FILTER (WHERE user_type = 'admin') AS admins,
+            COUNT(*) FILTER (WHERE user_type = 'collaborator') AS collaborators,
+            COUNT(*) FILTER (WHERE user_type = 'normal_user') AS normal_users
+        FROM users
+    ),
+    request_counts AS (
+        SELECT COUNT(*) FILTER (WHERE status = 'pending') AS pending
+        FROM collaborator_requests
+    ),
+    location_types AS (
+        SELECT COALESCE(json_object_agg(location_type, total), '{}'::json) AS histogram
+        FROM (
+            SELECT location_type, SUM(type_count)::BIGINT AS total
+            FROM (
+                SELECT counts.key AS location_type, counts.value::BIGINT AS type_count
+                FROM city_stats, jsonb_each_text(location_type_counts) AS counts
+                UNION ALL
+                SELECT COALESCE(location_type, 'unknown'), COUNT(*)
+                FROM locations
+                WHERE city_id IS NULL
+                GROUP BY 1
+            ) by_city
+            GROUP BY 1
+        ) grouped
+    ),
+    road_types AS (
+        SELECT COALESCE(json_object_agg(road_type, total), '{}'::json) AS histogram
+        FROM (
+            SELECT road_type, SUM(type_count)::BIGINT AS total
+            FROM (
+                SELECT counts.key AS road_type, counts.value::BIGINT AS type_count
+                FROM city_stats, jsonb_each_text(road_type_counts) AS counts
+                UNION ALL
+                SELECT COALESCE(road_type, 'unknown'), COUNT(*)
+                FROM roads
+                WHERE city_id IS NULL
+                GROUP BY 1
+            ) by_city
+            GROUP BY 1
+        ) grouped
+    ),
+    stats_freshness AS (
+        SELECT MAX(refreshed_at) AS refreshed_at
+        FROM city_stats
+    ),
+    detail_titles AS (
+        SELECT COALESCE(json_object_agg(predefined_title, total), '{}'::json) AS histogram
+        FROM (
+            SELECT predefined_title, COUNT(*) AS total
+            FROM city_details
+            GROUP BY 1
+        ) grouped
+    ),
+    recent_cities AS (
+        SELECT COALESCE(json_agg(recent), '[]'::json) AS items
+        FROM (
+            SELECT id, name->>'mm' AS name_mm, name->>'en' AS name_en, is_active, created_at
+            FROM cities
+            ORDER BY created_at DESC
+            LIMIT %(recent)s
+        ) recent
+    ),
+    recent_locations AS (
+        SELECT COALESCE(json_agg(recent), '[]'::json) AS items
+        FROM (
+            SELECT id, city_id, name->>'mm' AS name_mm, name->>'en' AS name_en,
+                   location_type, is_active, created_at
+            FROM locations
+            ORDER BY created_at DESC
+            LIMIT %(recent)s
+        ) recent
+    ),
+    recent_roads AS (
+        SELECT COALESCE(json_agg(recent), '[]'::json) AS items
+        FROM (
+            SELECT id, city_id, name->>'mm' AS name_mm, name->>'en' AS name_en,
+                   road_type, is_active, created_at
+            FROM roads
+            ORDER BY created_at DESC
+            LIMIT %(recent)s
+        ) recent
+    ),
+    recent_users AS (
+        SELECT COALESCE(json_agg(recent), '[]'::json) AS items
+        FROM (
+            SELECT id, username, email, user_type, created_at, last_login
+            FROM users
+            ORDER BY created_at DESC
+            LIMIT %(recent)s
+        ) recent
+    ),
+    pending_requests AS (
+        SELECT COALESCE(json_agg(recent), '[]'::json) AS items
+        FROM (
+            SELECT cr.id, cr.user_id, u.username, u.email, cr.organization,
+                   cr.position, cr.reason, cr.status, cr.created_at
+            FROM collaborator_requests cr
+            JOIN users u ON cr.user_id = u.id
+            WHERE cr.status = 'pending'
+            ORDER BY cr.created_at DESC
+            LIMIT %(recent)s
+        ) recent
+    )
+    SELECT json_build_object(
+        'counts', json_build_object(
+            'cities', json_build_object('total', cc.total, 'active', cc.active),
+            'city_details', json_build_object('total', dc.total, 'active', dc.active),
+            'locations', json_build_object('total', lc.total, 'active', lc.active),
+            'roads', json_build_object('total', rc.total, 'active', rc.active,
+                                       'total_length_m', rc.total_length_m),
+            'users', json_build_object('total', uc.total, 'admins', uc.admins,
+                                       'collaborators', uc.collaborators,
+                                       'normal_users', uc.normal_users),
+            'collaborator_requests', json_build_object('pending', qc.pending),
+            'routes', json_build_object('total', roc.total)
+        ),
+        'histograms', json_build_object(
+            'location_types', lt.histogram,
+            'road_types', rt.histogram,
+            'city_detail_titles', dt.histogram
+        ),
+        'recent', json_build_object(
+            'cities', rcity.items,
+            'locations', rloc.items,
+            'roads', rroad.items,
+            'users', ruser.items,
+            'collaborator_requests', preq.items
+        ),
+        'stats_refreshed_at', sf.refreshed_at
+    ) AS summary
+    FROM city_counts cc, city_detail_counts dc, location_counts lc, road_counts rc,
+         route_counts roc, user_counts uc, request_counts qc, location_types lt, road_types rt,
+         detail_titles dt, recent_cities rcity, recent_locations rloc, recent_roads rroad,
+         recent_users ruser, pending_requests preq, stats_freshness sf;
+"""
+
+def get_admin_dashboard_summary(recent_limit=DASHBOARD_RECENT_LIMIT):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(ADMIN_DASHBOARD_SUMMARY_SQL, {"recent": recent_limit})
+        return cur.fetchone()[0]
+    finally:
+        cur.close()
+        conn.close()
 
 
 @app.route('/admin/dashboard', methods=['GET'])
 @admin_required
 def admin_dashboard_summary():
+    """Admin dashboard data.
+
+    ?mode=summary returns counts, histograms and the latest ?recent=N items
+    from one query, reading location and road figures from city_stats; the
+    tables are then lazy-loaded from the paginated
+    /admin/* list endpoints. The default mode still returns every table.
+    """
+    mode = (request.args.get('mode') or 'full').strip().lower()
+    if mode not in ('full', 'summary'):
+        return jsonify({"is_success": False, "msg": "mode must be 'full' or 'summary'"}), 400
+    if mode == 'summary':
+        try:
+            recent_limit = int(request.args.get('recent', DASHBOARD_RECENT_LIMIT))
+        except ValueError:
+            return jsonify({"is_success": False, "msg": "recent must be an integer"}), 400
+        if not 0 <= recent_limit <= MAX_DASHBOARD_RECENT_LIMIT:
+            return jsonify({"is_success": False, "msg": f"recent must be between 0 and {MAX_DASHBOARD_RECENT_LIMIT}"}), 400
+        return jsonify({"is_success": True, "data": get_admin_dashboard_summary(recent_limit)}), 200
+
     cities = [serialize_city_record(city) for city in get_all_cities()]
     city_details = [serialize_city_detail_record(detail) for detail in get_all_city_details()]
     locations = [serialize_location_record(loc) for loc in get_all_locations()]
@@ -1286,18 +2861,112 @@ def admin_dashboard_summary():
     }), 200
 
 
+DEFAULT_STATS_DAYS = 30
+MAX_STATS_DAYS = 366
+
+def get_dashboard_stats(days=DEFAULT_STATS_DAYS):
+    """Read the materialized per-city, per-collaborator and per-day statistics."""
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    try:
+        cur.execute("""
+            SELECT s.*, c.name->>'mm' AS name_mm, c.name->>'en' AS name_en
+            FROM city_stats s
+            JOIN cities c ON c.id = s.city_id
+            ORDER BY s.location_count DESC, s.city_id;
+        """)
+        cities = cur.fetchall()
+        cur.execute("""
+            SELECT s.*, u.username, u.user_type
+            FROM collaborator_stats s
+            JOIN users u ON u.id = s.user_id
+            ORDER BY s.location_count + s.road_count DESC, s.user_id;
+        """)
+        collaborators = cur.fetchall()
+        cur.execute("""
+            SELECT day, route_count, user_count, total_distance_m
+            FROM route_daily_stats
+            WHERE day > CURRENT_DATE - %s
+            ORDER BY day;
+        """, (days,))
+        routes_per_day = cur.fetchall()
+        return {
+            "cities": cities,
+            "collaborators": collaborators,
+            "routes_per_day": routes_per_day,
+        }
+    finally:
+        cur.close()
+        conn.close()
+
+def get_collaborator_stats(user_id):
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    try:
+        cur.execute("SELECT * FROM collaborator_stats WHERE user_id = %s;", (str(user_id),))
+        return cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+
+
+@app.route('/admin/stats', methods=['GET'])
+@admin_required
+def admin_dashboard_stats():
+    """Materialized dashboard statistics; ?days=N limits the routes-per-day series"""
+    try:
+        days = int(request.args.get('days', DEFAULT_STATS_DAYS))
+    except ValueError:
+        return jsonify({"is_success": False, "msg": "days must be an integer"}), 400
+    if not 1 <= days <= MAX_STATS_DAYS:
+        return jsonify({"is_success": False, "msg": f"days must be between 1 and {MAX_STATS_DAYS}"}), 400
+    return jsonify({"is_success": True, "data": get_dashboard_stats(days)}), 200
+
+
+@app.route('/admin/stats/refresh', methods=['POST'])
+@admin_required
+def admin_refresh_stats():
+    """Refresh the statistics views now instead of waiting for the scheduled run"""
+    conn = get_db_connection()
+    try:
+        timings = refresh_stats_views(conn)
+    except Exception as exc:
+        app.logger.error(f"Error refreshing statistics: {exc}")
+        return jsonify({"is_success": False, "msg": "Failed to refresh statistics", "error": str(exc)}), 500
+    finally:
+        conn.close()
+    return jsonify({
+        "is_success": True,
+        "data": {view: round(seconds * 1000, 1) for view, seconds in timings.items()},
+    }), 200
+
+
+@app.route('/collaborator/stats', methods=['GET'])
+@collaborator_required
+def collaborator_dashboard_stats():
+    """Materialized statistics for the caller's own content"""
+    stats = get_collaborator_stats(get_jwt_identity())
+    return jsonify({"is_success": True, "data": stats}), 200
+
+
 @app.route('/collaborator/dashboard', methods=['GET'])
 @collaborator_required
 def collaborator_dashboard_summary():
-    """Dashboard endpoint for collaborators - returns all content (for reference) and their own network data"""
-    # Return all cities and city details (for reference in dropdowns, etc.)
-    cities = [serialize_city_record(city) for city in get_all_cities()]
-    city_details = [serialize_city_detail_record(detail) for detail in get_all_city_details()]
-    
-    # But only return locations and roads that the collaborator created
+    """Dashboard endpoint for collaborators - returns their own content plus light reference data"""
     current_user_id = get_jwt_identity()
-    locations = [serialize_location_record(loc) for loc in get_all_locations()]
-    roads = [serialize_road_record(road) for road in get_all_roads()]
+    cities = [serialize_city_record(city) for city in get_all_cities_by_user(current_user_id)]
+    city_details = [serialize_city_detail_record(detail) for detail in get_all_city_details(user_id=current_user_id)]
+    locations = [serialize_location_record(loc) for loc in get_locations_by_user(current_user_id)]
+    roads = [serialize_road_record(road) for road in get_roads_by_user(current_user_id)]
+    # Counts and histograms for the caller's content, from collaborator_stats
+    stats = get_collaborator_stats(current_user_id)
+
+    # Everyone's cities and intersections, projected to id/name/point for
+    # dropdowns and road drawing
+    reference = {
+        "cities": get_city_reference_list(),
+        "intersections": get_intersection_reference_list(),
+    }
 
     return jsonify({
         "is_success": True,
@@ -1306,18 +2975,119 @@ def collaborator_dashboard_summary():
             "city_details": city_details,
             "locations": locations,
             "roads": roads,
+            "stats": stats,
+            "reference": reference,
         },
     }), 200
 
 
 # ===== Collaborator CRUD Endpoints =====
 
+@app.route('/uploads/presign', methods=['POST'])
+@collaborator_required
+def presign_upload():
+    """Hand out a URL the browser can PUT an image to directly, keyed by its SHA-256.
+
+    The returned public URL goes into image_urls on the create/update request.
+    If the content is already stored no upload is needed; otherwise the signed
+    PUT only accepts exactly the declared type, size and hash.
+    """
+    data = request.get_json(silent=True) or {}
+    content_type = str(data.get('content_type') or '').strip().lower()
+    digest = str(data.get('sha256') or '').strip().lower()
+    extension = DIRECT_UPLOAD_TYPES.get(content_type)
+    if extension is None:
+        return jsonify({"is_success": False, "msg": "content_type must be image/png, image/jpeg or image/gif"}), 400
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({"is_success": False, "msg": "size must be an integer"}), 400
+    if size <= 0 or size > UPLOAD_MAX_FILE_BYTES:
+        return jsonify({
+            "is_success": False,
+            "msg": f"Each file must be at most {upload_store.format_size(UPLOAD_MAX_FILE_BYTES)}"
+        }), 400
+    if not re.fullmatch(r'[0-9a-f]{64}', digest):
+        return jsonify({"is_success": False, "msg": "sha256 must be a hex SHA-256 digest"}), 400
+
+    key = upload_store.content_address(digest, extension)
+    try:
+        exists = upload_storage.stat(key) is not None
+        if exists:
+            # Refresh it so garbage collection keeps it until the referencing row is saved
+            upload_storage.touch(key)
+            upload = None
+        else:
+            upload = upload_storage.presign_put(
+                key, content_type, size, storage.sha256_hex_to_base64(digest), DIRECT_UPLOAD_EXPIRES
+            )
+    except Exception as exc:
+        app.logger.error(f"Error presigning upload {key}: {exc}")
+        return jsonify({"is_success": False, "msg": "Failed to prepare upload"}), 500
+
+    return jsonify({
+        "is_success": True,
+        "data": {
+            "key": key,
+            "url": upload_storage.public_url(key),
+            "exists": exists,
+            "upload": upload,
+            "expires_in": DIRECT_UPLOAD_EXPIRES,
+        }
+    }), 200
+
+
+@app.route('/uploads/direct/<path:key>', methods=['PUT'])
+def direct_upload(key):
+    """Local stand-in for a presigned storage PUT, checking what S3 would check.
+
+    Authorised by the signature from /uploads/presign rather than a JWT, like a
+    bucket URL. The body must match the signed type, length and hash.
+    """
+    if upload_storage.name != 'local':
+        return jsonify({"is_success": False, "msg": "Not found"}), 404
+    if not upload_store.CONTENT_ADDRESS_RE.match(key):
+        return jsonify({"is_success": False, "msg": "Not found"}), 404
+
+    content_type = (request.headers.get('Content-Type') or '').split(';', 1)[0].strip().lower()
+    checksum = request.headers.get('x-amz-checksum-sha256', '')
+    content_length = request.content_length
+    if content_length is None or not upload_storage.verify_put(
+        key, content_type, content_length, checksum, request.args.get('expires'), request.args.get('signature')
+    ):
+        return jsonify({"is_success": False, "msg": "Invalid or expired upload signature"}), 403
+
+    incoming = upload_store.spool_stream(app.config['UPLOAD_FOLDER'], request.stream, content_length)
+    request.incoming_files.append(incoming)
+    digest = upload_store.content_digest(key)
+    if incoming.size != content_length or incoming.sha256.hexdigest() != digest:
+        return jsonify({"is_success": False, "msg": "Uploaded bytes do not match the signed SHA-256"}), 400
+    if upload_store.sniff_image_extension(incoming.head()) != DIRECT_UPLOAD_TYPES.get(content_type):
+        return jsonify({"is_success": False, "msg": "Uploaded file does not match its Content-Type"}), 400
+    try:
+        images.verify_image(incoming.path)
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+
+    stored = upload_store.promote(upload_storage, incoming, key.rsplit('.', 1)[1])
+    request.stored_uploads.append(stored)
+    return jsonify({"is_success": True, "data": {"key": key, "url": upload_storage.public_url(key)}}), 201
+
+
 @app.route('/collaborator/cities', methods=['GET'])
 @collaborator_required
 def collaborator_list_cities():
     """Collaborators can only read cities they created"""
     current_user_id = get_jwt_identity()
-    cities = [serialize_city_record(city) for city in get_all_cities_by_user(current_user_id)]
+    try:
+        geometry_format = parse_geometry_format_arg(request.args.get('geometry_format'))
+        pagination = parse_pagination_args(request.args)
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+    rows = get_all_cities_by_user(current_user_id, geometry_format=geometry_format, pagination=pagination)
+    cities = [serialize_city_record(city) for city in rows]
+    if pagination:
+        return build_page_response(rows, cities, pagination)
     return jsonify({"is_success": True, "data": cities}), 200
 
 
@@ -1527,9 +3297,11 @@ def collaborator_delete_city(city_id):
             return jsonify({"is_success": False, "msg": "You can only delete cities you created"}), 403
         
         # Delete
+        released_urls = upload_store.owned_image_urls(cur, 'cities', city_id)
         cur.execute("DELETE FROM cities WHERE id = %s RETURNING id;", (str(city_id),))
         deleted = cur.fetchone()
         conn.commit()
+        release_uploaded_images(released_urls)
         return jsonify({"is_success": True, "msg": "City deleted"}), 200
     except psycopg2.errors.ForeignKeyViolation:
         conn.rollback()
@@ -1553,29 +3325,15 @@ def collaborator_delete_city(city_id):
 def collaborator_list_city_details():
     """Collaborators can only read city details they created"""
     current_user_id = get_jwt_identity()
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     try:
-        cur.execute("""
-            SELECT 
-                id,
-                city_id,
-                user_id,
-                predefined_title,
-                subtitle,
-                body,
-                image_urls,
-                created_at,
-                updated_at
-            FROM city_details
-            WHERE user_id = %s
-            ORDER BY created_at DESC
-        """, (str(current_user_id),))
-        city_details = [serialize_city_detail_record(detail) for detail in cur.fetchall()]
-        return jsonify({"is_success": True, "data": city_details}), 200
-    finally:
-        cur.close()
-        conn.close()
+        pagination = parse_pagination_args(request.args)
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+    rows = get_all_city_details(city_id=request.args.get('city_id'), user_id=current_user_id, pagination=pagination)
+    city_details = [serialize_city_detail_record(detail) for detail in rows]
+    if pagination:
+        return build_page_response(rows, city_details, pagination)
+    return jsonify({"is_success": True, "data": city_details}), 200
 
 
 @app.route('/collaborator/city-details', methods=['POST'])
@@ -1746,9 +3504,11 @@ def collaborator_delete_city_detail(detail_id):
             return jsonify({"is_success": False, "msg": "You can only delete city details you created"}), 403
         
         # Delete
+        released_urls = upload_store.owned_image_urls(cur, 'city_details', detail_id)
         cur.execute("DELETE FROM city_details WHERE id = %s RETURNING id;", (str(detail_id),))
         deleted = cur.fetchone()
         conn.commit()
+        release_uploaded_images(released_urls)
         return jsonify({"is_success": True, "msg": "City detail deleted"}), 200
     except Exception as exc:
         conn.rollback()
@@ -1765,7 +3525,15 @@ def collaborator_delete_city_detail(detail_id):
 def collaborator_list_locations():
     """Collaborators can only read locations they created"""
     current_user_id = get_jwt_identity()
-    locations = [serialize_location_record(loc) for loc in get_locations_by_user(current_user_id)]
+    try:
+        geometry_format = parse_geometry_format_arg(request.args.get('geometry_format'))
+        pagination = parse_pagination_args(request.args)
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+    rows = get_locations_by_user(current_user_id, geometry_format=geometry_format, pagination=pagination)
+    locations = [serialize_location_record(loc) for loc in rows]
+    if pagination:
+        return build_page_response(rows, locations, pagination)
     return jsonify({"is_success": True, "data": locations}), 200
 
 
@@ -1977,9 +3745,11 @@ def collaborator_delete_location(location_id):
             return jsonify({"is_success": False, "msg": "You can only delete locations you created"}), 403
         
         # Delete
+        released_urls = upload_store.owned_image_urls(cur, 'locations', location_id)
         cur.execute("DELETE FROM locations WHERE id = %s RETURNING id;", (str(location_id),))
         deleted = cur.fetchone()
         conn.commit()
+        release_uploaded_images(released_urls)
         return jsonify({"is_success": True, "msg": "Location deleted"}), 200
     except Exception as exc:
         conn.rollback()
@@ -1996,7 +3766,15 @@ def collaborator_delete_location(location_id):
 def collaborator_list_roads():
     """Collaborators can only read roads they created"""
     current_user_id = get_jwt_identity()
-    roads = [serialize_road_record(road) for road in get_roads_by_user(current_user_id)]
+    try:
+        geometry_format = parse_geometry_format_arg(request.args.get('geometry_format'))
+        pagination = parse_pagination_args(request.args)
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+    rows = get_roads_by_user(current_user_id, geometry_format=geometry_format, pagination=pagination)
+    roads = [serialize_road_record(road) for road in rows]
+    if pagination:
+        return build_page_response(rows, roads, pagination)
     return jsonify({"is_success": True, "data": roads}), 200
 
 
@@ -2180,7 +3958,15 @@ def collaborator_delete_road(road_id):
 @app.route('/admin/cities', methods=['GET'])
 @admin_required
 def admin_list_cities():
-    cities = [serialize_city_record(city) for city in get_all_cities()]
+    try:
+        geometry_format = parse_geometry_format_arg(request.args.get('geometry_format'))
+        pagination = parse_pagination_args(request.args)
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+    rows = get_all_cities(geometry_format=geometry_format, pagination=pagination)
+    cities = [serialize_city_record(city) for city in rows]
+    if pagination:
+        return build_page_response(rows, cities, pagination)
     return jsonify({"is_success": True, "data": cities}), 200
 
 
@@ -2359,11 +4145,13 @@ def admin_delete_city(city_id):
     conn = get_db_connection()
     cur = conn.cursor()
     try:
+        released_urls = upload_store.owned_image_urls(cur, 'cities', city_id)
         cur.execute("DELETE FROM cities WHERE id = %s RETURNING id;", (str(city_id),))
         deleted = cur.fetchone()
         if not deleted:
             return jsonify({"is_success": False, "msg": "City not found"}), 404
         conn.commit()
+        release_uploaded_images(released_urls)
         return jsonify({"is_success": True, "msg": "City deleted"}), 200
     except psycopg2.errors.ForeignKeyViolation:
         conn.rollback()
@@ -2382,59 +4170,23 @@ def admin_delete_city(city_id):
 
 
 # ===== City Details CRUD =====
-def serialize_city_detail_record(detail):
-    """Serialize city_detail record for JSON response."""
-    detail = ensure_mapping(detail)
-    subtitle_obj = detail.get("subtitle")
-    body_obj = detail.get("body")
-    
-    subtitle_payload = {}
-    body_payload = {}
-    
-    if isinstance(subtitle_obj, dict):
-        subtitle_payload = {
-            "subtitle_mm": subtitle_obj.get("mm"),
-            "subtitle_en": subtitle_obj.get("en"),
-        }
-    
-    if isinstance(body_obj, dict):
-        body_payload = {
-            "body_mm": body_obj.get("mm"),
-            "body_en": body_obj.get("en"),
-        }
-    
-    return {
-        "id": str(detail["id"]),
-        "city_id": str(detail["city_id"]) if detail["city_id"] is not None else None,
-        "user_id": str(detail["user_id"]) if detail["user_id"] is not None else None,
-        "predefined_title": detail.get("predefined_title"),
-        **subtitle_payload,
-        **body_payload,
-        "image_urls": detail["image_urls"],
-        "created_at": detail["created_at"].isoformat() if detail.get("created_at") else None,
-        "updated_at": detail["updated_at"].isoformat() if detail.get("updated_at") else None,
-    }
-
-
 @app.route('/admin/city-details', methods=['GET'])
 @admin_required
 def admin_list_city_details():
     city_id = request.args.get('city_id')
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     try:
-        if city_id:
-            cur.execute("SELECT * FROM city_details WHERE city_id = %s ORDER BY created_at DESC", (city_id,))
-        else:
-            cur.execute("SELECT * FROM city_details ORDER BY created_at DESC")
-        details = cur.fetchall()
-        return jsonify({"is_success": True, "data": [serialize_city_detail_record(d) for d in details]}), 200
+        pagination = parse_pagination_args(request.args)
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+    try:
+        details = get_all_city_details(city_id=city_id, pagination=pagination)
     except Exception as exc:
         app.logger.error(f"Error listing city details: {exc}")
         return jsonify({"is_success": False, "msg": "Failed to list city details", "error": str(exc)}), 500
-    finally:
-        cur.close()
-        conn.close()
+    items = [serialize_city_detail_record(d) for d in details]
+    if pagination:
+        return build_page_response(details, items, pagination)
+    return jsonify({"is_success": True, "data": items}), 200
 
 
 @app.route('/admin/city-details', methods=['POST'])
@@ -2628,11 +4380,13 @@ def admin_delete_city_detail(detail_id):
     conn = get_db_connection()
     cur = conn.cursor()
     try:
+        released_urls = upload_store.owned_image_urls(cur, 'city_details', detail_id)
         cur.execute("DELETE FROM city_details WHERE id = %s RETURNING id;", (str(detail_id),))
         deleted = cur.fetchone()
         if not deleted:
             return jsonify({"is_success": False, "msg": "City detail not found"}), 404
         conn.commit()
+        release_uploaded_images(released_urls)
         return jsonify({"is_success": True, "msg": "City detail deleted"}), 200
     except Exception as exc:
         conn.rollback()
@@ -2646,7 +4400,15 @@ def admin_delete_city_detail(detail_id):
 @app.route('/admin/locations', methods=['GET'])
 @admin_required
 def admin_list_locations():
-    locations = [serialize_location_record(loc) for loc in get_all_locations()]
+    try:
+        geometry_format = parse_geometry_format_arg(request.args.get('geometry_format'))
+        pagination = parse_pagination_args(request.args)
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+    rows = get_all_locations(geometry_format=geometry_format, pagination=pagination)
+    locations = [serialize_location_record(loc) for loc in rows]
+    if pagination:
+        return build_page_response(rows, locations, pagination)
     return jsonify({"is_success": True, "data": locations}), 200
 
 
@@ -2827,11 +4589,13 @@ def admin_delete_location(location_id):
     conn = get_db_connection()
     cur = conn.cursor()
     try:
+        released_urls = upload_store.owned_image_urls(cur, 'locations', location_id)
         cur.execute("DELETE FROM locations WHERE id = %s RETURNING id;", (str(location_id),))
         deleted = cur.fetchone()
         if not deleted:
             return jsonify({"is_success": False, "msg": "Location not found"}), 404
         conn.commit()
+        release_uploaded_images(released_urls)
         return jsonify({"is_success": True, "msg": "Location deleted"}), 200
     except psycopg2.errors.ForeignKeyViolation:
         conn.rollback()
@@ -2852,7 +4616,15 @@ def admin_delete_location(location_id):
 @app.route('/admin/roads', methods=['GET'])
 @admin_required
 def admin_list_roads():
-    roads = [serialize_road_record(road) for road in get_all_roads()]
+    try:
+        geometry_format = parse_geometry_format_arg(request.args.get('geometry_format'))
+        pagination = parse_pagination_args(request.args)
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+    rows = get_all_roads(geometry_format=geometry_format, pagination=pagination)
+    roads = [serialize_road_record(road) for road in rows]
+    if pagination:
+        return build_page_response(rows, roads, pagination)
     return jsonify({"is_success": True, "data": roads}), 200
 
 
@@ -3020,6 +4792,74 @@ def admin_delete_road(road_id):
         cur.close()
         conn.close()
 
+
+IMPORT_FILE_SUFFIXES = ('.geojson', '.json', '.osm', '.osm.gz', '.osm.pbf')
+
+@app.route('/admin/import', methods=['POST'])
+@admin_required
+def admin_import_geodata():
+    """Bulk import roads and locations from an uploaded GeoJSON or OSM extract.
+
+    Form fields: file (required), city_id, is_active (default false) and
+    on_conflict ('update' or 'nothing'). The rows are written with COPY in
+    one transaction and the road graph is rebuilt once afterwards.
+    """
+    request.max_content_length = IMPORT_MAX_REQUEST_BYTES
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({"is_success": False, "msg": "A GeoJSON or OSM file is required"}), 400
+    filename = upload.filename.lower()
+    suffix = next((suffix for suffix in IMPORT_FILE_SUFFIXES if filename.endswith(suffix)), None)
+    if suffix is None:
+        return jsonify({"is_success": False, "msg": f"File must end with one of: {', '.join(IMPORT_FILE_SUFFIXES)}"}), 400
+
+    on_conflict = request.form.get('on_conflict', 'update')
+    if on_conflict not in ('update', 'nothing'):
+        return jsonify({"is_success": False, "msg": "on_conflict must be 'update' or 'nothing'"}), 400
+    is_active = coerce_boolean(request.form.get('is_active', False))
+    if not isinstance(is_active, bool):
+        return jsonify({"is_success": False, "msg": "is_active must be true or false"}), 400
+    city_id = request.form.get('city_id') or None
+    if city_id:
+        try:
+            city_id = str(uuid.UUID(city_id))
+        except ValueError:
+            return jsonify({"is_success": False, "msg": "city_id must be a UUID"}), 400
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT 1 FROM cities WHERE id = %s;", (city_id,))
+            city_exists = cur.fetchone() is not None
+        finally:
+            cur.close()
+            conn.close()
+        if not city_exists:
+            return jsonify({"is_success": False, "msg": "City not found"}), 404
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, f"import{suffix}")
+        upload.save(path)
+        try:
+            features = read_features(path)
+        except Exception as exc:
+            return jsonify({"is_success": False, "msg": f"Could not read import file: {exc}"}), 400
+
+    roads, locations, skipped = build_import_rows(features, get_jwt_identity(), city_id, is_active)
+    conn = get_db_connection()
+    try:
+        summary = import_rows(conn, roads, locations, on_conflict=on_conflict)
+    except Exception as exc:
+        app.logger.error(f"Error importing geodata: {exc}")
+        return jsonify({"is_success": False, "msg": "Import failed; nothing was written", "error": str(exc)}), 500
+    finally:
+        conn.close()
+
+    if roads:
+        road_graph.build_graph()
+    summary["features"] = len(features)
+    summary["skipped"] = skipped
+    return jsonify({"is_success": True, "data": summary}), 200
+
 @app.route('/routes', methods=['POST'])
 def plan_route():
     # Route planning implementation
@@ -3133,16 +4973,20 @@ def plan_route():
             "FROM locations;"
         )
         locations = cur.fetchall()
+        location_coords = haversine.as_lonlat_array([(loc['lon'], loc['lat']) for loc in locations])
+
+        def location_distances(point):
+            if not locations:
+                return None
+            return haversine.one_to_many(point, location_coords)
 
-        def find_nearest_location(point, locations, max_dist=500):
-            min_dist = float('inf')
-            nearest = None
-            for loc in locations:
-                dist = calculate_distance(point, (loc['lon'], loc['lat']))
-                if dist < min_dist and dist <= max_dist:
-                    min_dist = dist
-                    nearest = loc
-            return nearest
+        def find_nearest_location(distances, max_dist=500):
+            if distances is None:
+                return None
+            nearest_index = int(distances.argmin())
+            if distances[nearest_index] > max_dist:
+                return None
+            return locations[nearest_index]
 
         def format_defined_location(loc, location_type="defined_location"):
             payload = {
@@ -3154,12 +4998,14 @@ def plan_route():
             }
             return payload
             
-        # Find nearest locations
-        nearest_start_location = find_nearest_location(start_point, locations)
-        nearest_end_location = find_nearest_location(end_point, locations)
+        # Find nearest locations; one vectorised pass per endpoint
+        start_distances = location_distances(start_point)
+        end_distances = location_distances(end_point)
+        nearest_start_location = find_nearest_location(start_distances)
+        nearest_end_location = find_nearest_location(end_distances)
         
-        close_start_location = find_nearest_location(start_point, locations, max_dist=50)
-        close_end_location = find_nearest_location(end_point, locations, max_dist=50)
+        close_start_location = find_nearest_location(start_distances, max_dist=50)
+        close_end_location = find_nearest_location(end_distances, max_dist=50)
         
         # Set start and end locations
         start_location = format_defined_location(close_start_location) if close_start_location else {
@@ -3288,68 +5134,38 @@ def plan_route():
     if not user_id:
         return jsonify({"is_success": True, "data": response_payload}), 200
 
-    # Save route to database for authenticated users
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    try:
-        # IMPORTANT: path_coords stores (lon, lat). Do not swap when writing WKT.
-        wkt_coords = ", ".join([f"{lon} {lat}" for lon, lat in path_coords])
-        wkt_linestring = f"LINESTRING({wkt_coords})"
-
-        cur.execute(
-            "INSERT INTO routes (user_id, start_loc, end_loc, "
-            "total_distance_m, estimated_time_s, geom) "
-            "VALUES (%s, ST_GeogFromText(%s), ST_GeogFromText(%s), "
-            "%s, %s, ST_GeogFromText(%s)) "
-            "RETURNING id;",
-            (
-                user_id,
-                f"SRID=4326;POINT({start_lon} {start_lat})",
-                f"SRID=4326;POINT({end_lon} {end_lat})",
-                total_distance,
-                estimated_time,
-                f"SRID=4326;{wkt_linestring}"
-            )
-        )
-        route_id = cur.fetchone()[0]
-
-        cur.execute(
-            "INSERT INTO user_route_history (user_id, route_id, "
-            "start_name, end_name, total_distance_m, duration_min) "
-            "VALUES (%s, %s, %s, %s, %s, %s) RETURNING history_id;",
-            (
-                user_id,
-                route_id,
-                psycopg2.extras.Json(start_name_payload) if start_name_payload is not None else None,
-                psycopg2.extras.Json(end_name_payload) if end_name_payload is not None else None,
-                total_distance,
-                estimated_time / 60
-            )
-        )
-        history_id = cur.fetchone()[0]
-
-        conn.commit()
-
-        response_payload.update({
-            "route_id": route_id,
-            "history_id": history_id,
-            "saved_to_history": True,
-        })
-
-        return jsonify({"is_success": True, "data": response_payload}), 200
+    # Ids are generated here so the response doesn't wait for the inserts;
+    # the write-behind queue saves the route and history entry
+    route_id = str(uuid.uuid4())
+    history_id = str(uuid.uuid4())
+    route_history_writer.submit(route_history.route_row(
+        route_id,
+        history_id,
+        user_id,
+        start_point,
+        end_point,
+        path_coords,
+        start_name_payload,
+        end_name_payload,
+        total_distance,
+        estimated_time,
+    ))
+
+    response_payload.update({
+        "route_id": route_id,
+        "history_id": history_id,
+        "saved_to_history": True,
+    })
 
-    except Exception as e:
-        conn.rollback()
-        app.logger.error(f"Database error: {str(e)}")
-        return jsonify({"is_success": False, "msg": "Error saving route", "error": str(e)}), 500
-    finally:
-        cur.close()
-        conn.close()
+    return jsonify({"is_success": True, "data": response_payload}), 200
 
 # === AUTHENTICATION ===
 @app.route('/register', methods=['POST'])
 def register():
+    retry_after = rate_limiter.hit('auth-ip', request.remote_addr, *AUTH_RATE_LIMIT_IP)
+    if retry_after:
+        return rate_limited_response(retry_after)
+
     data = request.get_json()
     username = data.get('username')
     email = data.get('email')
@@ -3358,14 +5174,17 @@ def register():
     if not username or not email or not password:
         return jsonify({"is_success": False ,"msg": "Missing required fields"}), 400
     
+    # Hashed before a connection is taken, so the pool isn't held during the work
+    password_hash = password_hasher.hash(password)
+
     conn = get_db_connection()
     cur = conn.cursor()
     
     try:
         cur.execute(
             "INSERT INTO users (username, email, password_hash) "
-            "VALUES (%s, %s, crypt(%s, gen_salt('bf'))) RETURNING id;",
-            (username, email, password)
+            "VALUES (%s, %s, %s) RETURNING id;",
+            (username, email, password_hash)
         )
         user_id = cur.fetchone()[0]
         conn.commit()
@@ -3381,43 +5200,147 @@ def login():
     data = request.get_json()
     email = data.get('email')
     password = data.get('password')
+
+    if not email or not password:
+        return jsonify({"is_success": False, "msg": "Invalid credentials"}), 401
+
+    email_key = email.strip().lower()
+    retry_after = (
+        rate_limiter.hit('auth-ip', request.remote_addr, *AUTH_RATE_LIMIT_IP)
+        or rate_limiter.exceeded('login-email', email_key, *AUTH_RATE_LIMIT_EMAIL)
+    )
+    if retry_after:
+        return rate_limited_response(retry_after)
     
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    
-    cur.execute(
-        "SELECT * FROM users "
-        "WHERE email = %s AND password_hash = crypt(%s, password_hash);",
-        (email, password)
-    )
-    user = cur.fetchone()
-    
-    if user:
-        cur.execute(
-            "UPDATE users SET last_login = NOW() WHERE id = %s;",
-            (user['id'],)
-        )
-        conn.commit()
-    else:
+    try:
+        cur.execute("SELECT * FROM users WHERE email = %s;", (email,))
+        user = cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+
+    # No connection is held while hashing; a busy pool surfaces as 503
+    matches, needs_rehash = password_hasher.verify(user['password_hash'] if user else None, password)
+    if not matches:
+        rate_limiter.hit('login-email', email_key, *AUTH_RATE_LIMIT_EMAIL)
         app.logger.warning(f"Login failed for user: {email}")
+        return jsonify({"is_success": False, "msg": "Invalid credentials"}), 401
+    # Legacy pgcrypto/werkzeug hash or outdated cost: upgrade it transparently
+    new_hash = password_hasher.hash(password) if needs_rehash else None
 
-    if user:
-        access_token = create_access_token(identity=str(user['id']))
-        
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        if new_hash:
+            cur.execute(
+                "UPDATE users SET last_login = NOW(), password_hash = %s WHERE id = %s;",
+                (new_hash, user['id'])
+            )
+        else:
+            cur.execute(
+                "UPDATE users SET last_login = NOW() WHERE id = %s;",
+                (user['id'],)
+            )
+        access_token, refresh_token = issue_tokens(cur, user['id'], user['user_type'])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
         cur.close()
         conn.close()
-        
-        user_dict = dict(user)
-        user_dict.pop('password_hash', None)
-        return jsonify({"is_success": True, "access_token": access_token, "user": user_dict}), 200
+    rate_limiter.reset('login-email', email_key, AUTH_RATE_LIMIT_EMAIL[1])
+
+    user_dict = dict(user)
+    user_dict.pop('password_hash', None)
+    return jsonify({
+        "is_success": True,
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "user": user_dict,
+    }), 200
+
+@app.route('/token/refresh', methods=['POST'])
+def refresh_access_token():
+    """Exchange a refresh token for a new access token and the next refresh token"""
+    data = request.get_json(silent=True) or {}
+    refresh_token = data.get('refresh_token')
+    if not isinstance(refresh_token, str) or not refresh_token:
+        return jsonify({"is_success": False, "msg": "Refresh token required"}), 400
+
+    conn = get_db_connection()
+    cur = conn.cursor()
 
-    cur.close()
-    conn.close()
-    return jsonify({"is_success": False, "msg": "Invalid credentials"}), 401
+    try:
+        rotated = auth_tokens.rotate_refresh_token(cur, refresh_token, REFRESH_TOKEN_EXPIRES)
+        if rotated is None:
+            # Commit anyway: a reused token has just had its family revoked
+            conn.commit()
+            return jsonify({"is_success": False, "msg": "Invalid or expired refresh token"}), 401
+
+        user_id, next_refresh_token = rotated
+        # The role is read here, once per refresh, instead of on every request
+        cur.execute("SELECT user_type FROM users WHERE id = %s;", (user_id,))
+        user = cur.fetchone()
+        if not user:
+            conn.rollback()
+            return jsonify({"is_success": False, "msg": "Invalid or expired refresh token"}), 401
+        access_token = create_role_access_token(user_id, user[0])
+        conn.commit()
+        return jsonify({
+            "is_success": True,
+            "access_token": access_token,
+            "refresh_token": next_refresh_token,
+        }), 200
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
 
 @app.route('/logout', methods=['POST'])
-@jwt_required()
 def logout():
+    """Revoke the presented access token and, if sent, its refresh token family
+
+    Works without a valid access token, so a client whose token has already
+    expired or been revoked can still end the refresh token's session.
+    """
+    try:
+        verify_jwt_in_request(optional=True)
+        claims = get_jwt()
+    except Exception:
+        # Expired or revoked already: there is no access token left to revoke
+        claims = {}
+    data = request.get_json(silent=True) or {}
+    refresh_token = data.get('refresh_token')
+    if not (isinstance(refresh_token, str) and refresh_token):
+        refresh_token = None
+
+    if not claims and not refresh_token:
+        return jsonify({"is_success": False, "msg": "Access token or refresh_token required"}), 401
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        if claims:
+            revocation_list.revoke_token(cur, claims['jti'], claims['sub'], claims['exp'])
+        if refresh_token:
+            auth_tokens.revoke_refresh_token(cur, refresh_token)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    if claims:
+        revocation_list.add(jti=claims['jti'])
     return jsonify({"is_success": True, "msg": "Successfully logged out"}), 200
 
 
@@ -3455,6 +5378,10 @@ def get_route_history():
         except ValueError:
             pass
 
+    # Routes planned moments ago may still be queued
+    if not route_history_writer.wait_for_user(user_id):
+        app.logger.warning(f"Route history for {user_id} is still being written")
+
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
 
@@ -3729,7 +5656,7 @@ def update_collaborator_request(request_id):
     try:
         # Get the request and user info
         cur.execute("""
-            SELECT cr.user_id, u.username, u.email 
+            SELECT cr.user_id, u.username, u.email, u.preferences
             FROM collaborator_requests cr
             JOIN users u ON cr.user_id = u.id
             WHERE cr.id = %s
@@ -3759,26 +5686,18 @@ def update_collaborator_request(request_id):
             cur.execute("""
                 UPDATE users SET user_type = 'collaborator' WHERE id = %s
             """, (str(user_id),))
+            # Outstanding tokens still say normal_user; make the client refresh into the new role
+            revoke_user_sessions(cur, user_id)
             
-            # Send approval email
-            subject = "Collaborator Request Approved"
-            body = f"""
-            <html>
-                <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                    <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                        <h2 style="color: #10b981;">Congratulations, {username}!</h2>
-                        <p>Your collaborator request has been <strong>approved</strong>.</p>
-                        <p>You now have collaborator access to the Myanmar Explorer platform.</p>
-                        <p>You can now contribute to the platform by adding and managing content.</p>
-                        {f'<div style="background-color: #f0f9ff; border-left: 4px solid #10b981; padding: 15px; margin: 20px 0;"><strong>Admin Note:</strong><br>{admin_notes}</div>' if admin_notes else ''}
-                        <p style="margin-top: 30px;">Best regards,<br>Myanmar Explorer Team</p>
-                    </div>
-                </body>
-            </html>
-            """
-            send_email(user_email, subject, body)
+            queue_notification(
+                cur, user_email, 'collaborator_approved',
+                notifications.user_locale(request_data['preferences']),
+                username=username, admin_notes=admin_notes,
+            )
 
         conn.commit()
+        if status == 'approved':
+            revocation_list.add(user_id=user_id)
 
         return jsonify({
             "is_success": True,
@@ -3810,10 +5729,32 @@ def update_collaborator_request(request_id):
 @admin_required
 def get_collaborators_list():
     """Get all collaborators (admin only)"""
-    collaborators = [serialize_user_record(user) for user in get_all_collaborators()]
+    try:
+        pagination = parse_pagination_args(request.args)
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+    rows = get_all_collaborators(pagination=pagination)
+    collaborators = [serialize_user_record(user) for user in rows]
+    if pagination:
+        return build_page_response(rows, collaborators, pagination)
     return jsonify({"is_success": True, "data": collaborators}), 200
 
 
+@app.route('/admin/users', methods=['GET'])
+@admin_required
+def admin_list_users():
+    """Get all users (admin only); pass page/page_size to lazy-load the table"""
+    try:
+        pagination = parse_pagination_args(request.args)
+    except ValueError as exc:
+        return jsonify({"is_success": False, "msg": str(exc)}), 400
+    rows = get_all_users(pagination=pagination)
+    users = [serialize_user_record(user) for user in rows]
+    if pagination:
+        return build_page_response(rows, users, pagination)
+    return jsonify({"is_success": True, "data": users}), 200
+
+
 @app.route('/admin/collaborators/<uuid:user_id>', methods=['GET'])
 @admin_required
 def get_collaborator_details(user_id):
@@ -3853,6 +5794,9 @@ def update_collaborator(user_id):
     
     if not data:
         return jsonify({"is_success": False, "msg": "Request body required"}), 400
+
+    # Hashed before a connection is taken; a busy pool answers 503 via its error handler
+    password_hash = password_hasher.hash(data['password']) if data.get('password') else None
     
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
@@ -3878,10 +5822,9 @@ def update_collaborator(user_id):
             update_fields.append("email = %s")
             params.append(data['email'])
         
-        if 'password' in data and data['password']:
-            from werkzeug.security import generate_password_hash
+        if password_hash:
             update_fields.append("password_hash = %s")
-            params.append(generate_password_hash(data['password']))
+            params.append(password_hash)
         
         if not update_fields:
             return jsonify({"is_success": False, "msg": "No fields to update"}), 400
@@ -3897,7 +5840,12 @@ def update_collaborator(user_id):
         
         cur.execute(query, params)
         updated_user = cur.fetchone()
+        password_changed = password_hash is not None
+        if password_changed:
+            revoke_user_sessions(cur, user_id, refresh_tokens=True)
         conn.commit()
+        if password_changed:
+            revocation_list.add(user_id=user_id)
         
         return jsonify({
             "is_success": True,
@@ -3926,7 +5874,7 @@ def delete_collaborator(user_id):
     try:
         # Verify the user is a collaborator and get user info
         cur.execute("""
-            SELECT id, username, email FROM users WHERE id = %s AND user_type = 'collaborator'
+            SELECT id, username, email, preferences FROM users WHERE id = %s AND user_type = 'collaborator'
         """, (str(user_id),))
         
         user = cur.fetchone()
@@ -3945,6 +5893,10 @@ def delete_collaborator(user_id):
             SET user_type = 'normal_user'
             WHERE id = %s
         """, (str(user_id),))
+
+        # Collaborator access ends now rather than when the current access
+        # token expires; the next refresh issues a normal_user token
+        revoke_user_sessions(cur, user_id)
         
         # Soft delete from collaborator_requests table by setting status to 'revoked'
         cur.execute("""
@@ -3953,26 +5905,12 @@ def delete_collaborator(user_id):
             WHERE user_id = %s AND status = 'approved'
         """, (admin_notes, str(user_id),))
         
+        queue_notification(
+            cur, user_email, 'collaborator_revoked', notifications.user_locale(user['preferences']),
+            username=username, admin_notes=admin_notes,
+        )
         conn.commit()
-        
-        # Send revocation email
-        subject = "Collaborator Access Revoked"
-        body = f"""
-        <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #ef4444;">Collaborator Access Revoked</h2>
-                    <p>Dear {username},</p>
-                    <p>Your collaborator access to the Myanmar Explorer platform has been <strong>revoked</strong>.</p>
-                    <p>Your account will be reverted to regular user status.</p>
-                    {f'<div style="background-color: #fef2f2; border-left: 4px solid #ef4444; padding: 15px; margin: 20px 0;"><strong>Reason:</strong><br>{admin_notes}</div>' if admin_notes else ''}
-                    <p>If you believe this is a mistake or have any questions, please contact the administrator.</p>
-                    <p style="margin-top: 30px;">Best regards,<br>Myanmar Explorer Team</p>
-                </div>
-            </body>
-        </html>
-        """
-        send_email(user_email, subject, body)
+        revocation_list.add(user_id=user_id)
         
         return jsonify({
             "is_success": True,
@@ -3988,6 +5926,75 @@ def delete_collaborator(user_id):
         conn.close()
 
 
+@app.route('/admin/cities/<uuid:city_id>/notify', methods=['POST'])
+@admin_required
+def notify_city_collaborators(city_id):
+    """Email every collaborator who owns the city or content in it (admin only)
+
+    Body: {"title": ..., "message": ...}, each a string or {"en": ..., "mm": ...}
+    (title_en / message_mm style keys work too). The email is rendered once per
+    locale and queued for all recipients of that locale in one INSERT.
+    """
+    data = request.get_json(silent=True) or {}
+    title = coerce_multilingual_payload(data, 'title') or normalize_json_field(data.get('title'))
+    message = coerce_multilingual_payload(data, 'message') or normalize_json_field(data.get('message'))
+    if not title or not message:
+        return jsonify({"is_success": False, "msg": "title and message are required"}), 400
+
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    try:
+        cur.execute("SELECT name FROM cities WHERE id = %s;", (str(city_id),))
+        city = cur.fetchone()
+        if not city:
+            return jsonify({"is_success": False, "msg": "City not found"}), 404
+
+        cur.execute(
+            """
+                SELECT u.email, u.preferences
+                FROM users u
+                WHERE u.user_type = 'collaborator'
+                  AND u.id IN (
+                      SELECT user_id FROM cities WHERE id = %(city_id)s
+                      UNION SELECT user_id FROM city_details WHERE city_id = %(city_id)s
+                      UNION SELECT user_id FROM locations WHERE city_id = %(city_id)s
+                      UNION SELECT user_id FROM roads WHERE city_id = %(city_id)s
+                  );
+            """,
+            {'city_id': str(city_id)},
+        )
+        recipients_by_locale = {}
+        for row in cur.fetchall():
+            locale = notifications.user_locale(row['preferences'])
+            recipients_by_locale.setdefault(locale, []).append(row['email'])
+
+        counts = {}
+        for locale, emails in recipients_by_locale.items():
+            rendered = notification_templates.render(
+                'city_announcement', locale,
+                city_name=notifications.localized_text(city['name'], locale),
+                title=notifications.localized_text(title, locale),
+                message=notifications.localized_text(message, locale),
+            )
+            counts[locale] = mailer.enqueue_emails(cur, emails, rendered.subject, rendered.html, rendered.text)
+        conn.commit()
+        if counts:
+            g.email_queued = True
+
+        return jsonify({
+            "is_success": True,
+            "data": {"recipients": sum(counts.values()), "by_locale": counts}
+        }), 202
+
+    except Exception as exc:
+        conn.rollback()
+        app.logger.error(f"Error notifying city collaborators: {str(exc)}")
+        return jsonify({"is_success": False, "msg": "Failed to notify collaborators"}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+
 # Health check
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -3998,6 +6005,21 @@ def health_check():
 def not_found_error(error):
     return jsonify({"is_success": False,"msg": "Resource not found"}), 404
 
+@app.errorhandler(413)
+def request_too_large_error(error):
+    limit = upload_store.format_size(request.max_content_length or 0)
+    return jsonify({"is_success": False, "msg": f"Request is too large; the limit is {limit}"}), 413
+
+@app.errorhandler(passwords.PasswordHasherBusy)
+def password_hasher_busy_error(error):
+    response = jsonify({"is_success": False, "msg": str(error)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(upload_store.UploadTooLarge)
+def upload_too_large_error(error):
+    return jsonify({"is_success": False, "msg": str(error)}), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     app.logger.error(f"Server error: {str(error)}")
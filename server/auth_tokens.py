@@ -0,0 +1,247 @@
+"""
+Session Tokens
+Access tokens are short-lived JWTs that carry the user's role, so
+admin_required / collaborator_required no longer look the user up on every
+request. Sessions last through refresh tokens:
+
+    refresh_tokens     opaque random tokens, stored as SHA-256 hashes. Each one
+                       is single use: /token/refresh marks it used and issues
+                       its successor in the same family. Presenting a used
+                       token again (outside a short grace for racing tabs)
+                       revokes the whole family.
+    token_revocations  access tokens that must stop working before they expire:
+                       one token (logout, by jti) or every token a user was
+                       issued before revoked_at (role change, password reset).
+                       Rows are only needed until those tokens expire.
+
+Every worker keeps the revocation list as a bloom filter, synced from the
+table every few seconds. A token that is not in the filter (nearly all of
+them) is accepted without touching the database; a filter hit is confirmed
+with one indexed query, so false positives cost a lookup, never a rejection.
+"""
+import datetime
+import hashlib
+import math
+import secrets
+import threading
+import time
+import uuid
+
+REFRESH_TOKEN_BYTES = 32
+# A token rotated this recently is treated as a race between tabs, not theft
+REFRESH_REUSE_GRACE = datetime.timedelta(seconds=30)
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def issued_ms(payload):
+    """When an access token was issued, in milliseconds (iat only has whole seconds)."""
+    value = payload.get('issued_ms')
+    return int(value) if value is not None else int(payload.get('iat', 0)) * 1000
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings using double hashing of one blake2b digest."""
+
+    def __init__(self, capacity=10000, error_rate=0.001):
+        self.capacity = max(int(capacity), 1)
+        self.size = max(int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hash_count = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """Per-process view of token_revocations: a bloom filter plus exact confirmation in Postgres."""
+
+    def __init__(self, connect, sync_interval=5, rebuild_interval=600, capacity=10000, error_rate=0.001):
+        self.connect = connect
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.high_water = 0
+        self.synced_at = 0.0
+        self.rebuilt_at = 0.0
+        self._sync_lock = threading.Lock()
+
+    def add(self, jti=None, user_id=None):
+        """Add a revocation this process just committed, ahead of the next sync."""
+        if jti:
+            self.bloom.add(f"jti:{jti}")
+        if user_id:
+            self.bloom.add(f"user:{user_id}")
+
+    def sync(self, force=False):
+        """Pull new revocations; rebuild the filter from scratch to drop expired ones."""
+        now = time.monotonic()
+        if not force and now - self.synced_at < self.sync_interval:
+            return
+        # One thread syncs; the others keep using the current filter
+        if not self._sync_lock.acquire(blocking=force):
+            return
+        try:
+            rebuild = force or now - self.rebuilt_at >= self.rebuild_interval or self.bloom.count >= self.capacity
+            conn = self.connect()
+            cur = conn.cursor()
+            try:
+                if rebuild:
+                    cur.execute("DELETE FROM token_revocations WHERE expires_at <= NOW();")
+                    cur.execute(
+                        "DELETE FROM refresh_tokens WHERE expires_at <= NOW() - INTERVAL '1 day';"
+                    )
+                    conn.commit()
+                cur.execute(
+                    "SELECT id, jti, user_id FROM token_revocations "
+                    "WHERE id > %s AND expires_at > NOW() ORDER BY id;",
+                    (0 if rebuild else self.high_water,),
+                )
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+                conn.close()
+            if rebuild:
+                self.bloom = BloomFilter(max(self.capacity, len(rows) * 2), self.error_rate)
+                self.high_water = 0
+                self.rebuilt_at = now
+            for row_id, jti, user_id in rows:
+                self.add(jti=jti, user_id=None if jti else user_id)
+                self.high_water = max(self.high_water, row_id)
+            self.synced_at = now
+        finally:
+            self._sync_lock.release()
+
+    def is_revoked(self, payload):
+        """Whether a decoded access token has been revoked."""
+        try:
+            self.sync()
+        except Exception:
+            # Keep serving from the last filter; the next request retries the sync
+            self.synced_at = time.monotonic()
+        jti = payload.get('jti')
+        user_id = payload.get('sub')
+        if f"jti:{jti}" not in self.bloom and f"user:{user_id}" not in self.bloom:
+            return False
+        conn = self.connect()
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT EXISTS (
+                    SELECT 1 FROM token_revocations
+                    WHERE expires_at > NOW()
+                      AND (
+                        jti = %s
+                        OR (jti IS NULL AND user_id = %s AND revoked_at > to_timestamp(%s / 1000.0)::timestamp)
+                      )
+                );
+                """,
+                (jti, user_id, issued_ms(payload)),
+            )
+            return bool(cur.fetchone()[0])
+        finally:
+            cur.close()
+            conn.close()
+
+    def revoke_token(self, cur, jti, user_id, expires_at):
+        """Revoke one access token (by jti) until it expires anyway; expires_at is its exp claim."""
+        cur.execute(
+            "INSERT INTO token_revocations (jti, user_id, expires_at) VALUES (%s, %s, to_timestamp(%s)::timestamp);",
+            (jti, user_id, expires_at),
+        )
+
+    def revoke_user(self, cur, user_id, access_token_lifetime):
+        """Revoke every access token issued to a user so far."""
+        # Stamped with the API's clock, which also stamps issued_ms, so a token
+        # refreshed right after this is never mistaken for an older one
+        cur.execute(
+            "INSERT INTO token_revocations (user_id, revoked_at, expires_at) "
+            "VALUES (%s, to_timestamp(%s)::timestamp, NOW() + %s);",
+            (str(user_id), time.time(), access_token_lifetime),
+        )
+
+
+def issue_refresh_token(cur, user_id, lifetime, family_id=None):
+    """Create a refresh token; returns (token, row id). Only the hash is stored."""
+    token = secrets.token_urlsafe(REFRESH_TOKEN_BYTES)
+    token_id = str(uuid.uuid4())
+    cur.execute(
+        """
+        INSERT INTO refresh_tokens (id, user_id, family_id, token_hash, expires_at)
+        VALUES (%s, %s, %s, %s, NOW() + %s);
+        """,
+        (token_id, str(user_id), family_id or token_id, hash_token(token), lifetime),
+    )
+    return token, token_id
+
+
+def rotate_refresh_token(cur, token, lifetime):
+    """Spend a refresh token and issue its successor.
+
+    Returns (user_id, new_token), or None when the token is unknown, expired,
+    revoked or already used. Reusing a token outside the grace window revokes
+    its whole family, since either copy may be a stolen one.
+    """
+    cur.execute(
+        """
+        SELECT id, user_id, family_id, used_at, revoked_at, expires_at <= NOW() AS expired, NOW() AS now
+        FROM refresh_tokens WHERE token_hash = %s FOR UPDATE;
+        """,
+        (hash_token(token),),
+    )
+    row = cur.fetchone()
+    if not row:
+        return None
+    token_id, user_id, family_id, used_at, revoked_at, expired, now = row
+    if revoked_at or expired:
+        return None
+    if used_at:
+        if now - used_at > REFRESH_REUSE_GRACE:
+            revoke_refresh_family(cur, family_id)
+        return None
+    cur.execute("UPDATE refresh_tokens SET used_at = NOW() WHERE id = %s;", (token_id,))
+    new_token, _ = issue_refresh_token(cur, user_id, lifetime, family_id=family_id)
+    return user_id, new_token
+
+
+def revoke_refresh_family(cur, family_id):
+    cur.execute(
+        "UPDATE refresh_tokens SET revoked_at = NOW() WHERE family_id = %s AND revoked_at IS NULL;",
+        (family_id,),
+    )
+
+
+def revoke_refresh_token(cur, token):
+    """Revoke the family of a presented refresh token (logout)."""
+    cur.execute(
+        """
+        UPDATE refresh_tokens SET revoked_at = NOW()
+        WHERE revoked_at IS NULL
+          AND family_id = (SELECT family_id FROM refresh_tokens WHERE token_hash = %s);
+        """,
+        (hash_token(token),),
+    )
+
+
+def revoke_user_refresh_tokens(cur, user_id):
+    cur.execute(
+        "UPDATE refresh_tokens SET revoked_at = NOW() WHERE user_id = %s AND revoked_at IS NULL;",
+        (str(user_id),),
+    )
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Haversine Benchmark
+Compares the previous per-pair geopy great_circle loops with the vectorised
+haversine module for road segment lengths, nearest-node lookup and the
+1 m node snapping done while building the road graph.
+
+geopy is the reference implementation: every case checks that the new
+results agree with it before timing anything.
+
+Usage: python benchmarks/bench_haversine.py [--roads 2000] [--points 20] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+from geopy.distance import great_circle
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import haversine  # noqa: E402
+
+# Segment lengths may differ by float rounding only
+TOLERANCE_M = 1e-6
+
+
+def build_roads(count, points, seed=2025):
+    """Build random walks shaped like decoded road linestrings around Maubin."""
+    rng = random.Random(seed)
+    roads = []
+    for _ in range(count):
+        lon = 95.60 + rng.random() * 0.1
+        lat = 16.70 + rng.random() * 0.1
+        line = []
+        for _ in range(points):
+            line.append((lon, lat))
+            # Occasionally repeat a vertex within half a metre to exercise snapping
+            if rng.random() < 0.05:
+                line.append((lon + 2e-6, lat + 2e-6))
+            lon += (rng.random() - 0.5) * 0.001
+            lat += (rng.random() - 0.5) * 0.001
+        roads.append(line)
+    return roads
+
+
+def geopy_distance(point1, point2):
+    return great_circle((point1[1], point1[0]), (point2[1], point2[0])).meters
+
+
+def legacy_segment_lengths(roads):
+    return [[geopy_distance(line[i], line[i + 1]) for i in range(len(line) - 1)] for line in roads]
+
+
+def vectorised_segment_lengths(roads):
+    return haversine.segment_lengths_many(roads)
+
+
+def legacy_nearest(point, nodes):
+    nearest = None
+    min_distance = float('inf')
+    for node in nodes:
+        distance = geopy_distance(point, node)
+        if distance < min_distance:
+            min_distance = distance
+            nearest = node
+    return nearest
+
+
+def vectorised_nearest(point, nodes, node_coords):
+    return nodes[int(haversine.one_to_many(point, node_coords).argmin())]
+
+
+def legacy_snap(points, threshold=1):
+    nodes = {}
+    snapped_points = []
+    for coord in points:
+        snapped = coord
+        for existing in nodes:
+            if geopy_distance(coord, existing) < threshold:
+                snapped = existing
+                break
+        nodes.setdefault(snapped, [])
+        snapped_points.append(snapped)
+    return snapped_points
+
+
+def indexed_snap(points, threshold=1):
+    snap_index = haversine.SnapIndex(threshold)
+    return [snap_index.snap(coord) for coord in points]
+
+
+def check_agreement(roads, points, nodes, node_coords, queries):
+    legacy = legacy_segment_lengths(roads)
+    vectorised = vectorised_segment_lengths(roads)
+    worst = max(
+        (abs(a - b) for old, new in zip(legacy, vectorised) for a, b in zip(old, new)),
+        default=0.0
+    )
+    assert worst < TOLERANCE_M, f"segment lengths differ from geopy by {worst} m"
+    for point in queries:
+        assert legacy_nearest(point, nodes) == vectorised_nearest(point, nodes, node_coords), point
+    assert legacy_snap(points) == indexed_snap(points), "snapped nodes differ from the legacy loop"
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--roads', type=int, default=2000)
+    parser.add_argument('--points', type=int, default=20, help='vertices per road')
+    parser.add_argument('--snap-points', type=int, default=1000,
+                        help='vertices fed to the O(n^2) legacy snapping loop')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    roads = build_roads(args.roads, args.points)
+    points = [point for line in roads for point in line]
+    snap_points = points[:args.snap_points]
+    nodes = list(dict.fromkeys(points))
+    node_coords = haversine.as_lonlat_array(nodes)
+    rng = random.Random(7)
+    queries = [rng.choice(nodes) for _ in range(20)]
+
+    worst = check_agreement(roads, snap_points, nodes, node_coords, queries[:5])
+    print(f"{len(points)} vertices on {args.roads} roads; max difference from geopy {worst:.2e} m\n")
+
+    groups = [
+        ("segment lengths", [
+            ("geopy loop", lambda: legacy_segment_lengths(roads)),
+            ("haversine.segment_lengths_many", lambda: vectorised_segment_lengths(roads)),
+        ]),
+        (f"nearest node x{len(queries)}", [
+            ("geopy loop", lambda: [legacy_nearest(point, nodes) for point in queries]),
+            ("haversine.one_to_many", lambda: [vectorised_nearest(point, nodes, node_coords) for point in queries]),
+        ]),
+        (f"snap {len(snap_points)} vertices", [
+            ("geopy loop", lambda: legacy_snap(snap_points)),
+            ("haversine.SnapIndex", lambda: indexed_snap(snap_points)),
+        ]),
+    ]
+
+    for title, cases in groups:
+        print(f"{title}, best of {args.repeat} runs")
+        baseline = None
+        for label, fn in cases:
+            best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+            baseline = baseline or best
+            print(f"  {label:<45} {best * 1000:8.1f} ms  x{baseline / best:6.1f}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
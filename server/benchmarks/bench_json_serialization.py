@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+JSON Serialization Benchmark
+Compares the legacy dict-merge + stdlib encoder path with the slotted
+dataclass + FastJSONProvider path on a 10k-location payload.
+
+Usage: python benchmarks/bench_json_serialization.py [--rows 10000] [--repeat 5]
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import serialization  # noqa: E402
+from serialization import serialize_location_record  # noqa: E402
+
+
+def build_rows(count):
+    """Build rows shaped like the DictCursor results of get_all_locations()."""
+    city_id = uuid.uuid4()
+    user_id = uuid.uuid4()
+    rows = []
+    for index in range(count):
+        lon = 95.65 + (index % 100) * 0.0001
+        lat = 16.73 + (index // 100) * 0.0001
+        rows.append({
+            "id": uuid.uuid4(),
+            "city_id": city_id,
+            "user_id": user_id,
+            "name": {"mm": f"နေရာ {index}", "en": f"Location {index}"},
+            "address": {"mm": "မအူပင်မြို့", "en": "Maubin Township"},
+            "image_urls": [f"/uploads/{uuid.uuid4().hex}_photo.jpg"],
+            "description": {"mm": "ဖော်ပြချက်", "en": "A point of interest used for benchmarking."},
+            "location_type": "landmark",
+            "geometry": f"POINT({lon} {lat})",
+            "is_active": True,
+            "updated_at": datetime.datetime(2025, 10, 18, 12, 0, 0),
+        })
+    return rows
+
+
+def legacy_serialize_location_record(location):
+    """The previous serializer: per-field response dicts spread into a new dict."""
+    def build_name_response(name_obj):
+        if isinstance(name_obj, dict):
+            return {"name_mm": name_obj.get("mm"), "name_en": name_obj.get("en")}
+        return {"name_mm": None, "name_en": None}
+
+    def build_address_response(address_obj):
+        if isinstance(address_obj, dict):
+            return {"address_mm": address_obj.get("mm"), "address_en": address_obj.get("en")}
+        return {"address_mm": None, "address_en": address_obj if isinstance(address_obj, str) else None}
+
+    def build_description_response(description_obj):
+        if isinstance(description_obj, dict):
+            return {"description_mm": description_obj.get("mm"), "description_en": description_obj.get("en")}
+        return {"description_mm": None, "description_en": description_obj if isinstance(description_obj, str) else None}
+
+    return {
+        "id": str(location["id"]),
+        "city_id": str(location["city_id"]) if location["city_id"] is not None else None,
+        "user_id": str(location["user_id"]) if location["user_id"] is not None else None,
+        **build_name_response(location.get("name")),
+        **build_address_response(location.get("address")),
+        "image_urls": location["image_urls"],
+        **build_description_response(location.get("description")),
+        "location_type": location["location_type"],
+        "geometry": location["geometry"],
+        "is_active": location.get("is_active"),
+    }
+
+
+def run_legacy(rows):
+    payload = {"is_success": True, "data": [legacy_serialize_location_record(row) for row in rows]}
+    return json.dumps(payload).encode("utf-8")
+
+
+def run_dataclass_stdlib(rows):
+    payload = {"is_success": True, "data": [serialize_location_record(row) for row in rows]}
+    return json.dumps(payload, default=serialization.json_default, ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def run_dataclass_provider(rows):
+    payload = {"is_success": True, "data": [serialize_location_record(row) for row in rows]}
+    return serialization.dumps_bytes(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows)
+    encoder = "orjson" if serialization.orjson is not None else "stdlib (orjson not installed)"
+    cases = [
+        ("legacy dicts + json.dumps", run_legacy),
+        ("dataclasses + json.dumps", run_dataclass_stdlib),
+        (f"dataclasses + provider [{encoder}]", run_dataclass_provider),
+    ]
+
+    print(f"Serializing {args.rows} locations, best of {args.repeat} runs\n")
+    baseline = None
+    for label, fn in cases:
+        size = len(fn(rows))
+        best = min(timeit.repeat(lambda: fn(rows), number=1, repeat=args.repeat))
+        baseline = baseline or best
+        print(f"  {label:<45} {best * 1000:8.1f} ms  {size / 1024:8.0f} KiB  x{baseline / best:4.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Bulk Data Loader
+Loads seed and import data with COPY ... FROM STDIN instead of multi-row
+INSERT statements.
+
+Each table is read from <dir>/<table>.csv (or .csv.gz) with a header row.
+Files are streamed from disk in batches of whole CSV records, copied into a
+temporary staging table and then upserted on the primary key, so re-running
+a load is idempotent. Everything runs in one transaction.
+
+Geometry columns accept WKT or (E)WKB hex, which is what `export` writes.
+
+Usage:
+    python bulk_load.py load seed/              # load every <table>.csv found in seed/
+    python bulk_load.py load seed/ --tables roads,locations --on-conflict nothing
+    python bulk_load.py export seed/            # write the current tables as CSV
+"""
+import argparse
+import csv
+import gzip
+import io
+import os
+import sys
+import time
+
+import psycopg2
+from dotenv import load_dotenv
+
+# Parents before children so foreign keys resolve inside the transaction
+LOAD_ORDER = (
+    'users',
+    'cities',
+    'city_details',
+    'locations',
+    'roads',
+    'routes',
+    'user_route_history',
+    'collaborator_requests',
+)
+PRIMARY_KEYS = {'user_route_history': 'history_id'}
+# Never overwritten when an existing row is updated from an import
+PRESERVED_COLUMNS = ('created_at',)
+DEFAULT_BATCH_ROWS = 50_000
+
+
+def get_connection():
+    """Get database connection using environment variables"""
+    host = os.getenv('DB_HOST')
+    port = os.getenv('DB_PORT', '5432')
+    database = os.getenv('DB_NAME')
+    user = os.getenv('DB_USER')
+    password = os.getenv('DB_PASSWORD')
+    sslmode = os.getenv('DB_SSLMODE', 'require')
+
+    print(f"Connecting to: {host}:{port}/{database} as {user}")
+
+    return psycopg2.connect(
+        host=host,
+        port=port,
+        database=database,
+        user=user,
+        password=password,
+        sslmode=sslmode,
+        connect_timeout=10
+    )
+
+
+def quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_table_columns(cur, table):
+    cur.execute(
+        """
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = %s
+            ORDER BY ordinal_position;
+        """,
+        (table,)
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def create_staging_table(cur, table):
+    """Create an empty temporary copy of table that is dropped at commit."""
+    stage = f"stage_{table}"
+    cur.execute(
+        f"CREATE TEMP TABLE {quote_ident(stage)} "
+        f"(LIKE {quote_ident(table)} INCLUDING DEFAULTS) ON COMMIT DROP;"
+    )
+    return stage
+
+
+def iter_csv_batches(stream, batch_rows=DEFAULT_BATCH_ROWS):
+    """Yield (chunk, row_count) from a binary CSV stream, split on record boundaries.
+
+    A quoted field may span lines; doubled quotes keep the quote count even,
+    so tracking its parity per line is enough to find where records end.
+    """
+    buffer = []
+    rows = 0
+    in_quotes = False
+    for line in stream:
+        buffer.append(line)
+        if line.count(b'"') % 2:
+            in_quotes = not in_quotes
+        if not in_quotes:
+            rows += 1
+            if rows >= batch_rows:
+                yield b''.join(buffer), rows
+                buffer, rows = [], 0
+    if buffer:
+        yield b''.join(buffer), rows
+
+
+def encode_csv_field(value):
+    """Encode one value for COPY ... WITH (FORMAT csv); None becomes an unquoted NULL."""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def iter_record_batches(records, batch_rows=DEFAULT_BATCH_ROWS):
+    """Yield (chunk, row_count) CSV batches built from in-memory tuples."""
+    lines = []
+    for record in records:
+        lines.append(','.join(encode_csv_field(value) for value in record))
+        if len(lines) >= batch_rows:
+            yield ('\n'.join(lines) + '\n').encode('utf-8'), len(lines)
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8'), len(lines)
+
+
+def copy_batches(cur, stage, columns, batches, progress=None):
+    """COPY each CSV chunk into the staging table and return the total row count."""
+    column_sql = ', '.join(quote_ident(column) for column in columns)
+    copy_sql = f"COPY {quote_ident(stage)} ({column_sql}) FROM STDIN WITH (FORMAT csv)"
+    total = 0
+    for chunk, rows in batches:
+        cur.copy_expert(copy_sql, io.BytesIO(chunk))
+        total += rows
+        if progress:
+            progress(total)
+    return total
+
+
+def upsert_from_staging(cur, table, stage, columns, on_conflict='update'):
+    """Move staged rows into table; return (inserted, updated) counts."""
+    key = PRIMARY_KEYS.get(table, 'id')
+    column_sql = ', '.join(quote_ident(column) for column in columns)
+    if on_conflict == 'update':
+        assignments = ', '.join(
+            f"{quote_ident(column)} = EXCLUDED.{quote_ident(column)}"
+            for column in columns
+            if column != key and column not in PRESERVED_COLUMNS
+        )
+        conflict_sql = f"DO UPDATE SET {assignments}" if assignments else "DO NOTHING"
+    else:
+        conflict_sql = "DO NOTHING"
+    cur.execute(
+        f"""
+            WITH upserted AS (
+                INSERT INTO {quote_ident(table)} ({column_sql})
+                SELECT {column_sql} FROM {quote_ident(stage)}
+                ON CONFLICT ({quote_ident(key)}) {conflict_sql}
+                RETURNING (xmax = 0) AS inserted
+            )
+            SELECT
+                COUNT(*) FILTER (WHERE inserted),
+                COUNT(*) FILTER (WHERE NOT inserted)
+            FROM upserted;
+        """
+    )
+    inserted, updated = cur.fetchone()
+    return inserted, updated
+
+
+def open_table_file(directory, table):
+    for filename, opener in ((f"{table}.csv", open), (f"{table}.csv.gz", gzip.open)):
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            return path, opener
+    return None, None
+
+
+def load_table(cur, table, path, opener, batch_rows=DEFAULT_BATCH_ROWS, on_conflict='update'):
+    """Stream one CSV file into table through a staging table."""
+    table_columns = get_table_columns(cur, table)
+    if not table_columns:
+        raise ValueError(f"Unknown table: {table}")
+
+    with opener(path, 'rb') as stream:
+        header = next(csv.reader([stream.readline().decode('utf-8-sig')]), [])
+        unknown = [column for column in header if column not in table_columns]
+        if not header or unknown:
+            raise ValueError(f"{os.path.basename(path)}: unknown columns {unknown or '(empty header)'}")
+        if PRIMARY_KEYS.get(table, 'id') not in header:
+            raise ValueError(f"{os.path.basename(path)}: the primary key column is required for upserts")
+
+        started = time.perf_counter()
+
+        def report(rows):
+            elapsed = time.perf_counter() - started
+            print(f"\r  {table}: {rows:,} rows staged ({rows / max(elapsed, 1e-6):,.0f} rows/s)", end='', flush=True)
+
+        stage = create_staging_table(cur, table)
+        staged = copy_batches(cur, stage, header, iter_csv_batches(stream, batch_rows), progress=report)
+
+    print()
+    inserted, updated = upsert_from_staging(cur, table, stage, header, on_conflict=on_conflict)
+    elapsed = time.perf_counter() - started
+    print(f"✓ {table}: {staged:,} staged, {inserted:,} inserted, {updated:,} updated in {elapsed:.1f}s")
+    return staged, inserted, updated
+
+
+def load_directory(directory, tables=None, batch_rows=DEFAULT_BATCH_ROWS, on_conflict='update'):
+    tables = tables or LOAD_ORDER
+    unknown = [table for table in tables if table not in LOAD_ORDER]
+    if unknown:
+        print(f"✗ Unknown tables: {', '.join(unknown)}")
+        sys.exit(1)
+
+    files = []
+    for table in LOAD_ORDER:
+        if table not in tables:
+            continue
+        path, opener = open_table_file(directory, table)
+        if path:
+            files.append((table, path, opener))
+    if not files:
+        print(f"✗ No <table>.csv files found in {os.path.abspath(directory)}")
+        sys.exit(1)
+
+    conn = get_connection()
+    cur = conn.cursor()
+    started = time.perf_counter()
+    try:
+        for table, path, opener in files:
+            load_table(cur, table, path, opener, batch_rows=batch_rows, on_conflict=on_conflict)
+        conn.commit()
+        print(f"\n✓ Loaded {len(files)} table(s) in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        conn.rollback()
+        print(f"\n✗ Bulk load failed, nothing was written!")
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        cur.close()
+        conn.close()
+
+
+def export_directory(directory, tables=None, compress=False):
+    """Write each table as <table>.csv(.gz) in the layout `load` expects."""
+    os.makedirs(directory, exist_ok=True)
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        for table in tables or LOAD_ORDER:
+            key = PRIMARY_KEYS.get(table, 'id')
+            filename = f"{table}.csv.gz" if compress else f"{table}.csv"
+            path = os.path.join(directory, filename)
+            opener = gzip.open if compress else open
+            with opener(path, 'wb') as stream:
+                cur.copy_expert(
+                    f"COPY (SELECT * FROM {quote_ident(table)} ORDER BY {quote_ident(key)}) "
+                    "TO STDOUT WITH (FORMAT csv, HEADER true)",
+                    stream
+                )
+            print(f"✓ {table} -> {path}")
+        conn.rollback()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Bulk load or export table data as CSV using COPY")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    load_parser = subparsers.add_parser('load', help='load <table>.csv files from a directory')
+    load_parser.add_argument('directory')
+    load_parser.add_argument('--tables', help='comma-separated subset of tables to load')
+    load_parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS)
+    load_parser.add_argument('--on-conflict', choices=('update', 'nothing'), default='update')
+
+    export_parser = subparsers.add_parser('export', help='export tables to <table>.csv files')
+    export_parser.add_argument('directory')
+    export_parser.add_argument('--tables', help='comma-separated subset of tables to export')
+    export_parser.add_argument('--gzip', action='store_true', help='write .csv.gz files')
+
+    args = parser.parse_args()
+    tables = [table.strip() for table in args.tables.split(',')] if args.tables else None
+
+    if args.command == 'load':
+        load_directory(args.directory, tables=tables, batch_rows=args.batch_rows, on_conflict=args.on_conflict)
+    else:
+        export_directory(args.directory, tables=tables, compress=args.gzip)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Email Outbox Check
+Runs mailer.send_batch against an in-process SMTP sink on 127.0.0.1 and
+fails unless the outbox records each outcome correctly:
+
+    accepted messages       become 'sent', all over one SMTP connection
+    5xx recipient refusal   becomes 'failed' with last_error set
+    4xx recipient refusal   stays 'pending' with next_attempt_at pushed back
+
+The rows go into a temporary email_outbox that shadows the real table for
+this session, so queued production mail is never claimed or sent.
+
+Usage: python check_mailer.py
+"""
+import socketserver
+import sys
+import threading
+
+from dotenv import load_dotenv
+
+from mailer import SMTPSession, SMTPSettings, enqueue_email, send_batch
+from stats import get_connection
+
+# Recipients the sink refuses, and with which reply
+REFUSED_RECIPIENTS = {
+    'rejected@example.com': b'550 5.1.1 No such user',
+    'deferred@example.com': b'451 4.3.0 Try again later',
+}
+ACCEPTED_RECIPIENTS = ('first@example.com', 'second@example.com', 'third@example.com')
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: accepts every message, refuses REFUSED_RECIPIENTS."""
+
+    def reply(self, line):
+        self.wfile.write(line + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply(b'220 localhost check_mailer sink')
+        for raw in self.rfile:
+            command = raw.strip().decode('utf-8', 'replace')
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.reply(b'250-localhost')
+                self.reply(b'250 8BITMIME')
+            elif verb == 'RCPT':
+                address = command.partition(':')[2].strip().strip('<>').lower()
+                self.reply(REFUSED_RECIPIENTS.get(address, b'250 OK'))
+            elif verb == 'DATA':
+                self.reply(b'354 End data with <CR><LF>.<CR><LF>')
+                for line in self.rfile:
+                    if line.rstrip(b'\r\n') == b'.':
+                        break
+                self.server.messages += 1
+                self.reply(b'250 OK')
+            elif verb == 'QUIT':
+                self.reply(b'221 Bye')
+                return
+            elif verb in ('HELO', 'MAIL', 'RSET', 'NOOP'):
+                self.reply(b'250 OK')
+            else:
+                self.reply(b'502 Command not implemented')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPSinkHandler)
+        self.connections = 0
+        self.messages = 0
+
+
+def check_mailer(conn, sink):
+    """Send a batch through the sink; return a list of failure descriptions."""
+    cur = conn.cursor()
+    cur.execute(
+        "CREATE TEMP TABLE email_outbox (LIKE public.email_outbox INCLUDING DEFAULTS INCLUDING CONSTRAINTS);"
+    )
+    for to_email in ACCEPTED_RECIPIENTS + tuple(REFUSED_RECIPIENTS):
+        enqueue_email(cur, to_email, "check_mailer", "<p>check_mailer</p>", "check_mailer")
+    conn.commit()
+
+    settings = SMTPSettings('127.0.0.1', sink.server_address[1], from_email='noreply@localhost',
+                            starttls=False, auth=False, timeout=5)
+    session = SMTPSession(settings)
+    try:
+        sent, failed = send_batch(conn, session, batch_size=len(ACCEPTED_RECIPIENTS) + len(REFUSED_RECIPIENTS))
+    finally:
+        session.close()
+
+    cur.execute(
+        """
+            SELECT to_email, status, last_error, attempts, next_attempt_at > NOW() AS deferred
+            FROM email_outbox;
+        """
+    )
+    rows = {row[0]: row[1:] for row in cur.fetchall()}
+    conn.rollback()
+    cur.close()
+
+    checks = [
+        ("batch counts", (sent, failed) == (len(ACCEPTED_RECIPIENTS), len(REFUSED_RECIPIENTS)),
+         f"{sent} sent, {failed} failed"),
+        ("one SMTP connection", sink.connections == 1, f"{sink.connections} connection(s)"),
+        ("messages delivered", sink.messages == len(ACCEPTED_RECIPIENTS), f"{sink.messages} received"),
+    ]
+    for to_email in ACCEPTED_RECIPIENTS:
+        status, last_error, _, _ = rows[to_email]
+        checks.append((f"{to_email} sent", status == 'sent' and last_error is None, status))
+    status, last_error, _, _ = rows['rejected@example.com']
+    checks.append(("5xx marked failed", status == 'failed' and bool(last_error), f"{status}: {last_error}"))
+    status, last_error, attempts, deferred = rows['deferred@example.com']
+    checks.append(("4xx left pending, deferred", status == 'pending' and deferred and attempts == 1,
+                   f"{status}, attempts={attempts}, deferred={deferred}"))
+
+    failures = []
+    for label, ok, detail in checks:
+        print(f"{'✓' if ok else '✗'} {label:<30} {detail}")
+        if not ok:
+            failures.append(f"{label}: {detail}")
+    return failures
+
+
+def main():
+    load_dotenv()
+    sink = SMTPSink()
+    threading.Thread(target=sink.serve_forever, name='smtp-sink', daemon=True).start()
+    conn = get_connection()
+    try:
+        failures = check_mailer(conn, sink)
+    finally:
+        conn.close()
+        sink.shutdown()
+        sink.server_close()
+    if failures:
+        print(f"\n✗ {len(failures)} outbox check(s) failed")
+        sys.exit(1)
+    print("\n✓ Email outbox records sent, failed and deferred messages correctly")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Query Plan Regression Check
+EXPLAINs the API's hot queries and fails when one of them can no longer
+be answered from its expected index.
+
+Sequential scans are disabled for the session so the check does not depend
+on table size: on a small development database the planner would otherwise
+prefer a seq scan even when the index exists.
+
+Usage: python check_query_plans.py
+"""
+import sys
+import uuid
+
+from dotenv import load_dotenv
+
+from stats import get_connection
+
+SAMPLE_ID = str(uuid.uuid4())
+SAMPLE_BBOX = (95.5, 16.6, 95.8, 16.9)
+
+# (label, query, params, index the plan must use)
+HOT_QUERIES = (
+    (
+        "locations by city",
+        "SELECT id FROM locations WHERE city_id = %s",
+        (SAMPLE_ID,),
+        "idx_locations_city",
+    ),
+    (
+        "roads by city",
+        "SELECT id FROM roads WHERE city_id = %s",
+        (SAMPLE_ID,),
+        "idx_roads_city",
+    ),
+    (
+        "cities by owner, newest first",
+        "SELECT id FROM cities WHERE user_id = %s ORDER BY created_at DESC LIMIT 50",
+        (SAMPLE_ID,),
+        "idx_cities_user_created",
+    ),
+    (
+        "city details by owner, newest first",
+        "SELECT id FROM city_details WHERE user_id = %s ORDER BY created_at DESC LIMIT 50",
+        (SAMPLE_ID,),
+        "idx_city_details_user_created",
+    ),
+    (
+        "locations by owner, newest first",
+        "SELECT id FROM locations WHERE user_id = %s ORDER BY created_at DESC LIMIT 50",
+        (SAMPLE_ID,),
+        "idx_locations_user_created",
+    ),
+    (
+        "roads by owner, newest first",
+        "SELECT id FROM roads WHERE user_id = %s ORDER BY created_at DESC LIMIT 50",
+        (SAMPLE_ID,),
+        "idx_roads_user_created",
+    ),
+    (
+        "city detail by predefined title",
+        "SELECT * FROM city_details WHERE city_id = %s AND predefined_title = %s "
+        "ORDER BY created_at DESC LIMIT 1",
+        (SAMPLE_ID, 'general'),
+        "unique_city_detail_predefined_title",
+    ),
+    (
+        "city details by city, newest first",
+        "SELECT * FROM city_details WHERE city_id = %s ORDER BY created_at DESC",
+        (SAMPLE_ID,),
+        "idx_city_details_city_created",
+    ),
+    (
+        "route history page",
+        "SELECT history_id FROM user_route_history WHERE user_id = %s "
+        "ORDER BY accessed_at DESC NULLS LAST, history_id DESC LIMIT 50",
+        (SAMPLE_ID,),
+        "idx_history_user_accessed",
+    ),
+    (
+        "locations referencing an upload",
+        "SELECT id FROM locations WHERE image_url_paths(image_urls) @> ARRAY[%s]",
+        ('/uploads/00/00/' + '0' * 64 + '.jpg',),
+        "idx_locations_image_paths_gin",
+    ),
+    (
+        "due outbox emails",
+        "SELECT id FROM email_outbox WHERE status = 'pending' AND next_attempt_at <= NOW() "
+        "ORDER BY next_attempt_at LIMIT 20",
+        (),
+        "idx_email_outbox_due",
+    ),
+    (
+        "refresh token by hash",
+        "SELECT id FROM refresh_tokens WHERE token_hash = %s",
+        ('0' * 64,),
+        "refresh_tokens_token_hash_key",
+    ),
+    (
+        "user-wide token revocations",
+        "SELECT 1 FROM token_revocations WHERE jti IS NULL AND user_id = %s AND revoked_at > NOW() - INTERVAL '1 hour'",
+        (SAMPLE_ID,),
+        "idx_token_revocations_user",
+    ),
+    (
+        "active locations in viewport",
+        "SELECT id FROM locations WHERE is_active "
+        "AND geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)::geography",
+        SAMPLE_BBOX,
+        "idx_locations_active_geom",
+    ),
+    (
+        "active roads in viewport",
+        "SELECT id FROM roads WHERE is_active "
+        "AND geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)::geography",
+        SAMPLE_BBOX,
+        "idx_roads_active_geom",
+    ),
+)
+
+INDEX_NODE_TYPES = ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+
+
+def plan_index_names(plan):
+    """Yield the index name of every index-scan node in an EXPLAIN (FORMAT JSON) plan."""
+    if plan.get('Node Type') in INDEX_NODE_TYPES and plan.get('Index Name'):
+        yield plan['Index Name']
+    for child in plan.get('Plans', ()):
+        yield from plan_index_names(child)
+
+
+def check_query_plans(conn):
+    """Return a list of (label, expected index, indexes used) for every failing query."""
+    failures = []
+    cur = conn.cursor()
+    try:
+        cur.execute("SET enable_seqscan = off;")
+        for label, query, params, expected_index in HOT_QUERIES:
+            cur.execute(f"EXPLAIN (FORMAT JSON) {query}", params)
+            plan = cur.fetchone()[0][0]['Plan']
+            used = sorted(set(plan_index_names(plan)))
+            status = "✓" if expected_index in used else "✗"
+            print(f"{status} {label:<40} {', '.join(used) or 'no index'}")
+            if expected_index not in used:
+                failures.append((label, expected_index, used))
+    finally:
+        conn.rollback()
+        cur.close()
+    return failures
+
+
+def main():
+    load_dotenv()
+    conn = get_connection()
+    try:
+        failures = check_query_plans(conn)
+    finally:
+        conn.close()
+    if failures:
+        print(f"\n✗ {len(failures)} hot quer{'y' if len(failures) == 1 else 'ies'} lost their index:")
+        for label, expected_index, used in failures:
+            print(f"  - {label}: expected {expected_index}, got {', '.join(used) or 'no index'}")
+        sys.exit(1)
+    print(f"\n✓ All {len(HOT_QUERIES)} hot queries use their indexes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+GeoJSON / OSM Importer
+Imports roads and locations from a GeoJSON FeatureCollection or an OSM
+extract (.osm XML, optionally gzipped, or .osm.pbf when pyosmium is installed).
+
+OSM tags are mapped onto the schema enums: highway=* becomes a road_type,
+amenity/shop/tourism/leisure/... become a location_type, and name, name:my
+and name:en become the {mm, en} name object. GeoJSON properties may carry
+the same OSM tags or the API's own fields (road_type, location_type,
+name_mm, name_en, is_oneway).
+
+Rows are keyed by a UUID derived from the source id, so re-importing the
+same extract updates the existing roads and locations instead of duplicating
+them. Everything is written through COPY in a single transaction.
+
+Usage:
+    python geo_import.py maubin.osm.pbf --city-id <uuid> --user-id <uuid> [--active]
+"""
+import argparse
+import gzip
+import json
+import re
+import sys
+import time
+import uuid
+import xml.etree.ElementTree as ET
+
+from dotenv import load_dotenv
+
+from bulk_load import (
+    create_staging_table,
+    copy_batches,
+    get_connection,
+    iter_record_batches,
+    upsert_from_staging,
+)
+from haversine import segment_lengths_many
+
+try:
+    import osmium
+except ImportError:  # pragma: no cover - only needed for .osm.pbf
+    osmium = None
+
+IMPORT_NAMESPACE = uuid.UUID('5f1f6a5e-8c1b-4d0e-9a55-6d7a1e0b2c34')
+
+# Must match the CHECK constraints on roads.road_type and locations.location_type
+ROAD_TYPES = frozenset(('highway', 'local_road', 'residential_road', 'bridge', 'tunnel'))
+LOCATION_TYPES = frozenset((
+    'hospital', 'police_station', 'fire_station', 'post_office', 'government_office',
+    'embassy', 'bus_stop', 'train_station', 'airport', 'parking_lot', 'gas_station',
+    'harbor', 'restaurant', 'cafe', 'bar', 'cinema', 'stadium', 'sports_center', 'park',
+    'zoo', 'amusement_park', 'store', 'market', 'mall', 'supermarket', 'bank', 'hotel',
+    'pharmacy', 'beauty_salon', 'laundry', 'school', 'university', 'library', 'museum',
+    'pagoda', 'temple', 'church', 'mosque', 'apartment', 'residential_area', 'factory',
+    'warehouse', 'farm', 'cemetery', 'landmark', 'intersection', 'office', 'monastery',
+    'other',
+))
+
+ROAD_TYPE_BY_HIGHWAY = {
+    'motorway': 'highway',
+    'motorway_link': 'highway',
+    'trunk': 'highway',
+    'trunk_link': 'highway',
+    'primary': 'highway',
+    'primary_link': 'highway',
+    'secondary': 'local_road',
+    'secondary_link': 'local_road',
+    'tertiary': 'local_road',
+    'tertiary_link': 'local_road',
+    'unclassified': 'local_road',
+    'service': 'local_road',
+    'track': 'local_road',
+    'residential': 'residential_road',
+    'living_street': 'residential_road',
+}
+
+# Checked in order; the first matching (key, value) wins
+LOCATION_TYPE_BY_TAG = (
+    (('amenity', 'hospital'), 'hospital'),
+    (('amenity', 'clinic'), 'hospital'),
+    (('amenity', 'police'), 'police_station'),
+    (('amenity', 'fire_station'), 'fire_station'),
+    (('amenity', 'post_office'), 'post_office'),
+    (('amenity', 'townhall'), 'government_office'),
+    (('office', 'government'), 'government_office'),
+    (('amenity', 'embassy'), 'embassy'),
+    (('office', 'diplomatic'), 'embassy'),
+    (('amenity', 'bus_station'), 'bus_stop'),
+    (('highway', 'bus_stop'), 'bus_stop'),
+    (('railway', 'station'), 'train_station'),
+    (('aeroway', 'aerodrome'), 'airport'),
+    (('amenity', 'parking'), 'parking_lot'),
+    (('amenity', 'fuel'), 'gas_station'),
+    (('amenity', 'ferry_terminal'), 'harbor'),
+    (('harbour', 'yes'), 'harbor'),
+    (('amenity', 'restaurant'), 'restaurant'),
+    (('amenity', 'fast_food'), 'restaurant'),
+    (('amenity', 'food_court'), 'restaurant'),
+    (('amenity', 'cafe'), 'cafe'),
+    (('amenity', 'bar'), 'bar'),
+    (('amenity', 'pub'), 'bar'),
+    (('amenity', 'cinema'), 'cinema'),
+    (('leisure', 'stadium'), 'stadium'),
+    (('leisure', 'sports_centre'), 'sports_center'),
+    (('leisure', 'park'), 'park'),
+    (('tourism', 'zoo'), 'zoo'),
+    (('tourism', 'theme_park'), 'amusement_park'),
+    (('shop', 'supermarket'), 'supermarket'),
+    (('shop', 'mall'), 'mall'),
+    (('amenity', 'marketplace'), 'market'),
+    (('amenity', 'bank'), 'bank'),
+    (('tourism', 'hotel'), 'hotel'),
+    (('tourism', 'guest_house'), 'hotel'),
+    (('amenity', 'pharmacy'), 'pharmacy'),
+    (('shop', 'beauty'), 'beauty_salon'),
+    (('shop', 'hairdresser'), 'beauty_salon'),
+    (('shop', 'laundry'), 'laundry'),
+    (('amenity', 'school'), 'school'),
+    (('amenity', 'university'), 'university'),
+    (('amenity', 'college'), 'university'),
+    (('amenity', 'library'), 'library'),
+    (('tourism', 'museum'), 'museum'),
+    (('amenity', 'monastery'), 'monastery'),
+    (('building', 'monastery'), 'monastery'),
+    (('landuse', 'cemetery'), 'cemetery'),
+    (('amenity', 'grave_yard'), 'cemetery'),
+    (('man_made', 'works'), 'factory'),
+    (('building', 'warehouse'), 'warehouse'),
+    (('landuse', 'farmland'), 'farm'),
+    (('building', 'apartments'), 'apartment'),
+    (('office', '*'), 'office'),
+    (('shop', '*'), 'store'),
+    (('historic', '*'), 'landmark'),
+    (('tourism', 'attraction'), 'landmark'),
+)
+
+WORSHIP_TYPE_BY_RELIGION = {
+    'buddhist': 'pagoda',
+    'christian': 'church',
+    'muslim': 'mosque',
+    'hindu': 'temple',
+}
+
+MYANMAR_SCRIPT_RE = re.compile(r'[\u1000-\u109F\uAA60-\uAA7F]')
+TRUE_VALUES = ('yes', 'true', '1')
+
+ROAD_COLUMNS = ('id', 'city_id', 'user_id', 'name', 'geom', 'length_m', 'road_type', 'is_oneway', 'is_active')
+LOCATION_COLUMNS = ('id', 'city_id', 'user_id', 'name', 'geom', 'location_type', 'is_active')
+
+
+class SourceFeature:
+    """A road or location read from an extract, before mapping to table rows."""
+    __slots__ = ('kind', 'source_id', 'tags', 'coords')
+
+    def __init__(self, kind, source_id, tags, coords):
+        self.kind = kind
+        self.source_id = source_id
+        self.tags = tags
+        self.coords = coords
+
+
+# ===== Tag mapping =====
+
+def road_type_from_tags(tags):
+    """Map tags to a road_type; None when the feature is not an importable road."""
+    if tags.get('road_type'):
+        return tags['road_type'] if tags['road_type'] in ROAD_TYPES else None
+    road_type = ROAD_TYPE_BY_HIGHWAY.get(tags.get('highway'))
+    if road_type is None:
+        return None
+    if tags.get('bridge') in TRUE_VALUES or tags.get('bridge') == 'viaduct':
+        return 'bridge'
+    if tags.get('tunnel') in TRUE_VALUES:
+        return 'tunnel'
+    return road_type
+
+
+def location_type_from_tags(tags):
+    """Map tags to a location_type; None when the feature is not an importable location."""
+    if tags.get('location_type'):
+        return tags['location_type'] if tags['location_type'] in LOCATION_TYPES else None
+    if tags.get('amenity') == 'place_of_worship':
+        return WORSHIP_TYPE_BY_RELIGION.get(tags.get('religion'), 'temple')
+    for (key, value), location_type in LOCATION_TYPE_BY_TAG:
+        if key in tags and (value == '*' or tags[key] == value):
+            return location_type
+    return None
+
+
+def oneway_from_tags(tags):
+    """Return (is_oneway, reverse) for OSM oneway values, including oneway=-1."""
+    if 'is_oneway' in tags:
+        value = tags['is_oneway']
+        return (value if isinstance(value, bool) else str(value).lower() in TRUE_VALUES), False
+    value = str(tags.get('oneway', '')).lower()
+    if value == '-1':
+        return True, True
+    return value in TRUE_VALUES or tags.get('junction') == 'roundabout', False
+
+
+def localized_name_from_tags(tags):
+    """Build the {mm, en} name object from OSM name tags or API-style properties."""
+    name = tags.get('name')
+    if isinstance(name, dict):
+        return {key: value for key, value in name.items() if key in ('mm', 'en') and value}
+    result = {}
+    mm = tags.get('name_mm') or tags.get('name:my')
+    en = tags.get('name_en') or tags.get('name:en')
+    if isinstance(name, str) and name.strip():
+        if MYANMAR_SCRIPT_RE.search(name):
+            mm = mm or name
+        else:
+            en = en or name
+    if mm:
+        result['mm'] = mm.strip()
+    if en:
+        result['en'] = en.strip()
+    return result
+
+
+# ===== Readers =====
+
+def read_geojson(stream):
+    data = json.load(stream)
+    features = data.get('features', []) if data.get('type') == 'FeatureCollection' else [data]
+    for index, feature in enumerate(features):
+        geometry = feature.get('geometry') or {}
+        tags = dict(feature.get('properties') or {})
+        source = feature.get('id', tags.get('@id', tags.get('id', index)))
+        geometry_type = geometry.get('type')
+        coordinates = geometry.get('coordinates')
+        if geometry_type == 'Point':
+            yield SourceFeature('location', f"geojson/{source}", tags, [tuple(coordinates[:2])])
+        elif geometry_type == 'LineString':
+            yield SourceFeature('road', f"geojson/{source}", tags, [tuple(point[:2]) for point in coordinates])
+        elif geometry_type == 'MultiLineString':
+            for part, line in enumerate(coordinates):
+                yield SourceFeature('road', f"geojson/{source}/{part}", tags, [tuple(point[:2]) for point in line])
+        elif geometry_type == 'Polygon' and coordinates:
+            yield SourceFeature('location', f"geojson/{source}", tags, [ring_centroid(coordinates[0])])
+
+
+def read_osm_xml(stream):
+    """Stream an OSM XML extract; nodes must precede the ways that use them."""
+    node_coords = {}
+    for _, element in ET.iterparse(stream, events=('end',)):
+        if element.tag == 'node':
+            node_id = element.get('id')
+            coord = (float(element.get('lon')), float(element.get('lat')))
+            node_coords[node_id] = coord
+            tags = {tag.get('k'): tag.get('v') for tag in element.iter('tag')}
+            if tags:
+                yield SourceFeature('location', f"osm/node/{node_id}", tags, [coord])
+            element.clear()
+        elif element.tag == 'way':
+            tags = {tag.get('k'): tag.get('v') for tag in element.iter('tag')}
+            refs = [nd.get('ref') for nd in element.iter('nd')]
+            coords = [node_coords[ref] for ref in refs if ref in node_coords]
+            way_id = element.get('id')
+            if 'highway' in tags:
+                yield SourceFeature('road', f"osm/way/{way_id}", tags, coords)
+            elif tags and len(coords) >= 3 and refs[0] == refs[-1]:
+                yield SourceFeature('location', f"osm/way/{way_id}", tags, [ring_centroid(coords)])
+            element.clear()
+        elif element.tag == 'relation':
+            element.clear()
+
+
+def read_osm_pbf(path):
+    if osmium is None:
+        raise ValueError("Reading .osm.pbf extracts requires the osmium package (pip install osmium)")
+
+    features = []
+
+    class Handler(osmium.SimpleHandler):
+        def node(self, node):
+            if len(node.tags):
+                tags = {tag.k: tag.v for tag in node.tags}
+                features.append(SourceFeature('location', f"osm/node/{node.id}", tags,
+                                              [(node.location.lon, node.location.lat)]))
+
+        def way(self, way):
+            tags = {tag.k: tag.v for tag in way.tags}
+            if not tags:
+                return
+            coords = [(nd.lon, nd.lat) for nd in way.nodes if nd.location.valid()]
+            if 'highway' in tags:
+                features.append(SourceFeature('road', f"osm/way/{way.id}", tags, coords))
+            elif len(coords) >= 3 and way.is_closed():
+                features.append(SourceFeature('location', f"osm/way/{way.id}", tags, [ring_centroid(coords)]))
+
+    Handler().apply_file(path, locations=True)
+    return features
+
+
+def read_features(path):
+    """Read source features from a file path, choosing the reader by extension."""
+    lower = path.lower()
+    if lower.endswith('.pbf'):
+        return read_osm_pbf(path)
+    opener = gzip.open if lower.endswith('.gz') else open
+    base = lower[:-3] if lower.endswith('.gz') else lower
+    with opener(path, 'rb') as handle:
+        if base.endswith(('.geojson', '.json')):
+            return list(read_geojson(handle))
+        if base.endswith('.osm') or base.endswith('.xml'):
+            return list(read_osm_xml(handle))
+    raise ValueError("Unsupported file type; expected .geojson, .json, .osm, .osm.gz or .osm.pbf")
+
+
+def ring_centroid(ring):
+    """Average of a closed ring's vertices (closing vertex excluded)."""
+    points = ring[:-1] if len(ring) > 1 and tuple(ring[0]) == tuple(ring[-1]) else ring
+    return (sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+
+
+# ===== Row building =====
+
+def source_uuid(source_id):
+    return str(uuid.uuid5(IMPORT_NAMESPACE, source_id))
+
+
+def linestring_ewkt(coords):
+    return "SRID=4326;LINESTRING(" + ", ".join(f"{lon!r} {lat!r}" for lon, lat in coords) + ")"
+
+
+def point_ewkt(coord):
+    return f"SRID=4326;POINT({coord[0]!r} {coord[1]!r})"
+
+
+def pg_float_array(values):
+    return "{" + ",".join(repr(float(value)) for value in values) + "}"
+
+
+def build_import_rows(features, user_id=None, city_id=None, is_active=False):
+    """Map source features to road and location rows; return (roads, locations, skipped)."""
+    roads = []
+    road_lines = []
+    locations = []
+    skipped = 0
+    seen = set()
+
+    for feature in features:
+        if feature.source_id in seen:
+            continue
+        seen.add(feature.source_id)
+        tags = feature.tags
+        name = json.dumps(localized_name_from_tags(tags), ensure_ascii=False)
+
+        if feature.kind == 'road':
+            road_type = road_type_from_tags(tags)
+            coords = [coord for index, coord in enumerate(feature.coords)
+                      if index == 0 or coord != feature.coords[index - 1]]
+            if road_type is None or len(coords) < 2:
+                skipped += 1
+                continue
+            is_oneway, reverse = oneway_from_tags(tags)
+            if reverse:
+                coords.reverse()
+            road_lines.append(coords)
+            roads.append([source_uuid(feature.source_id), city_id, user_id, name,
+                          linestring_ewkt(coords), None, road_type, is_oneway, is_active])
+        else:
+            location_type = location_type_from_tags(tags)
+            if location_type is None or not feature.coords:
+                skipped += 1
+                continue
+            locations.append((source_uuid(feature.source_id), city_id, user_id, name,
+                              point_ewkt(feature.coords[0]), location_type, is_active))
+
+    # One vectorised pass over every road's coordinates
+    for road, lengths in zip(roads, segment_lengths_many(road_lines)):
+        road[5] = pg_float_array(lengths)
+
+    return [tuple(road) for road in roads], locations, skipped
+
+
+def import_rows(conn, roads, locations, on_conflict='update'):
+    """COPY both row sets through staging tables in one transaction and commit."""
+    summary = {}
+    cur = conn.cursor()
+    try:
+        for table, columns, rows in (('locations', LOCATION_COLUMNS, locations), ('roads', ROAD_COLUMNS, roads)):
+            if not rows:
+                summary[table] = {"inserted": 0, "updated": 0}
+                continue
+            stage = create_staging_table(cur, table)
+            copy_batches(cur, stage, columns, iter_record_batches(rows))
+            inserted, updated = upsert_from_staging(cur, table, stage, columns, on_conflict=on_conflict)
+            summary[table] = {"inserted": inserted, "updated": updated}
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return summary
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Import roads and locations from GeoJSON or OSM extracts")
+    parser.add_argument('path')
+    parser.add_argument('--city-id', help='city to attach every imported row to')
+    parser.add_argument('--user-id', help='owner recorded on the imported rows')
+    parser.add_argument('--active', action='store_true', help='publish imported rows immediately')
+    parser.add_argument('--on-conflict', choices=('update', 'nothing'), default='update')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        features = read_features(args.path)
+    except (OSError, ValueError, ET.ParseError, json.JSONDecodeError) as e:
+        print(f"✗ Could not read {args.path}: {e}")
+        sys.exit(1)
+    roads, locations, skipped = build_import_rows(features, args.user_id, args.city_id, args.active)
+    print(f"Read {len(features):,} features: {len(roads):,} roads, {len(locations):,} locations, {skipped:,} skipped")
+
+    conn = get_connection()
+    try:
+        summary = import_rows(conn, roads, locations, on_conflict=args.on_conflict)
+    except Exception as e:
+        print(f"\n✗ Import failed, nothing was written!")
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    for table, counts in summary.items():
+        print(f"✓ {table}: {counts['inserted']:,} inserted, {counts['updated']:,} updated")
+    print(f"\n✓ Imported in {time.perf_counter() - started:.1f}s")
+    print("Running API servers pick up the new roads on their next road graph rebuild.")
+
+
+if __name__ == '__main__':
+    main()
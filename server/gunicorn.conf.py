@@ -33,6 +33,8 @@ umask = 0
 user = None
 group = None
 tmp_upload_dir = None
+# /uploads responses are sent with os.sendfile (zero-copy), including byte ranges
+sendfile = True
 
 # SSL (if needed - uncomment and configure)
 # keyfile = '/path/to/keyfile'
@@ -54,6 +56,11 @@ def when_ready(server):
     """Called just after the server is started."""
     server.log.info(f"Server is ready. Listening on: {bind}")
 
+def worker_exit(server, worker):
+    """Called in the worker just after it exits; flush queued route history."""
+    import app
+    app.route_history_writer.stop()
+
 def on_exit(server):
     """Called just before exiting."""
     server.log.info("Shutting down Myanmar Explorer API server...")
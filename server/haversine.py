@@ -0,0 +1,128 @@
+"""
+Vectorised great-circle distances.
+
+Coordinates are (lon, lat) pairs in degrees, matching the rest of the API.
+The mean Earth radius is the one geopy's great_circle uses, so results agree
+with the previous per-segment geopy calls.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371009.0
+# One metre of great-circle arc, in degrees
+DEGREES_PER_METRE = math.degrees(1.0 / EARTH_RADIUS_M)
+
+
+def distance(point1, point2):
+    """Distance in metres between two (lon, lat) points.
+
+    Scalar math is faster than numpy for a single pair, so the hot loops that
+    compare one pair at a time use this instead of the array functions.
+    """
+    lon1, lat1 = math.radians(point1[0]), math.radians(point1[1])
+    lon2, lat2 = math.radians(point2[0]), math.radians(point2[1])
+    a = math.sin((lat2 - lat1) / 2.0) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_M * math.asin(math.sqrt(min(max(a, 0.0), 1.0)))
+
+
+def as_lonlat_array(coords):
+    """Return coords as a float64 array of shape (n, 2)."""
+    array = np.asarray(coords, dtype=np.float64)
+    return array.reshape(-1, 2)
+
+
+def pairwise(coords1, coords2):
+    """Distance between coords1[i] and coords2[i] for every i."""
+    a = np.radians(as_lonlat_array(coords1))
+    b = np.radians(as_lonlat_array(coords2))
+    if a.shape != b.shape:
+        raise ValueError("pairwise distances need two coordinate lists of the same length")
+    return _haversine(a[:, 0], a[:, 1], b[:, 0], b[:, 1])
+
+
+def one_to_many(point, coords):
+    """Distance from one (lon, lat) point to every point in coords."""
+    origin = np.radians(np.asarray(point, dtype=np.float64))
+    targets = np.radians(as_lonlat_array(coords))
+    return _haversine(origin[0], origin[1], targets[:, 0], targets[:, 1])
+
+
+def many_to_many(coords1, coords2):
+    """Distance matrix of shape (len(coords1), len(coords2))."""
+    a = np.radians(as_lonlat_array(coords1))
+    b = np.radians(as_lonlat_array(coords2))
+    return _haversine(a[:, 0, None], a[:, 1, None], b[None, :, 0], b[None, :, 1])
+
+
+def segment_lengths(coords):
+    """Length in metres of each consecutive segment of a single line."""
+    points = as_lonlat_array(coords)
+    if len(points) < 2:
+        return np.empty(0)
+    radians = np.radians(points)
+    return _haversine(radians[:-1, 0], radians[:-1, 1], radians[1:, 0], radians[1:, 1])
+
+
+def segment_lengths_many(lines):
+    """Segment lengths for many lines in one vectorised pass.
+
+    All coordinates are concatenated, every consecutive distance is computed
+    at once and the distances that would bridge two lines are dropped.
+    """
+    sizes = [len(line) for line in lines]
+    if not sizes or sum(sizes) < 2:
+        return [[] for _ in sizes]
+    points = np.radians(np.concatenate([as_lonlat_array(line) for line in lines if len(line)]))
+    distances = _haversine(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1])
+    results = []
+    offset = 0
+    for size in sizes:
+        if size < 2:
+            results.append([])
+        else:
+            results.append(distances[offset:offset + size - 1].tolist())
+        offset += size
+    return results
+
+
+def _haversine(lon1, lat1, lon2, lat2):
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class SnapIndex:
+    """Grid buckets for snapping points onto previously indexed points.
+
+    Replaces a scan over every known point with a look at the neighbouring
+    grid cells; a cell is threshold_m of latitude wide, and more longitude
+    cells are searched away from the equator where degrees of longitude shrink.
+    """
+
+    def __init__(self, threshold_m):
+        self.threshold_m = threshold_m
+        self.cell = max(threshold_m, 1e-3) * DEGREES_PER_METRE
+        self.cells = {}
+        self.count = 0
+
+    def snap(self, point):
+        """Return the earliest indexed point within the threshold, indexing point if there is none."""
+        cell_x = math.floor(point[0] / self.cell)
+        cell_y = math.floor(point[1] / self.cell)
+        lon_span = math.ceil(1.0 / max(math.cos(math.radians(point[1])), 1e-6))
+        best_order = None
+        best_point = None
+        for dx in range(-lon_span, lon_span + 1):
+            for dy in (-1, 0, 1):
+                for order, candidate in self.cells.get((cell_x + dx, cell_y + dy), ()):
+                    if best_order is not None and order > best_order:
+                        continue
+                    if distance(point, candidate) < self.threshold_m:
+                        best_order, best_point = order, candidate
+        if best_point is not None:
+            return best_point
+        self.cells.setdefault((cell_x, cell_y), []).append((self.count, point))
+        self.count += 1
+        return point
@@ -0,0 +1,189 @@
+"""
+Image Derivatives
+Resized and re-encoded copies of uploaded images for cards and detail pages.
+
+A derivative of uploads/<name> lives at uploads/.derived/<name>/<width>.<ext>
+("full" instead of a width keeps the original size). Derivatives are written
+atomically, never upscaled and saved without EXIF, XMP or ICC metadata.
+
+Pillow is optional: without it derivatives_enabled() is False and callers
+keep serving the original files.
+"""
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+DERIVED_DIR = '.derived'
+DERIVATIVE_WIDTHS = (160, 320, 640, 1280)
+# Generated in the background right after an upload; other sizes on first request
+PREFETCH_WIDTHS = (320, 640)
+PREFETCH_FORMATS = ('webp',)
+
+# format -> (Pillow format, file extension, save options)
+DERIVATIVE_FORMATS = {
+    'avif': ('AVIF', 'avif', {'quality': 55}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'png': ('PNG', 'png', {'optimize': True}),
+}
+# Preference order when the client sends fmt=auto
+AUTO_FORMATS = ('avif', 'webp')
+SOURCE_FORMATS = {'jpg': 'jpeg', 'jpeg': 'jpeg', 'png': 'png', 'gif': 'png'}
+
+
+def derivatives_enabled():
+    return Image is not None
+
+
+def format_available(fmt):
+    if Image is None or fmt not in DERIVATIVE_FORMATS:
+        return False
+    if fmt in ('avif', 'webp'):
+        return bool(features.check(fmt))
+    return True
+
+
+def source_format(filename):
+    """Return the derivative format matching an upload's own type, or None if unsupported."""
+    if filename.startswith('.') or '/.' in filename or '.' not in filename:
+        return None
+    return SOURCE_FORMATS.get(filename.rsplit('.', 1)[1].lower())
+
+
+def snap_width(requested):
+    """Round a requested width up to the nearest generated size so the cache stays small."""
+    if requested <= 0:
+        raise ValueError("w must be a positive integer")
+    for width in DERIVATIVE_WIDTHS:
+        if requested <= width:
+            return width
+    return DERIVATIVE_WIDTHS[-1]
+
+
+def negotiate_format(requested, accept_header, filename):
+    """Pick the output format for ?fmt=: auto follows the Accept header, none keeps the source type."""
+    fallback = source_format(filename)
+    if not requested:
+        return fallback
+    requested = requested.strip().lower()
+    if requested == 'jpg':
+        requested = 'jpeg'
+    if requested == 'auto':
+        accept = (accept_header or '').lower()
+        for fmt in AUTO_FORMATS:
+            if f"image/{fmt}" in accept and format_available(fmt):
+                return fmt
+        return fallback
+    if requested not in DERIVATIVE_FORMATS:
+        raise ValueError(f"fmt must be one of: auto, {', '.join(DERIVATIVE_FORMATS)}")
+    if not format_available(requested):
+        raise ValueError(f"{requested} output is not supported on this server")
+    return requested
+
+
+def verify_image(path):
+    """Raise ValueError unless Pillow can parse path as an image; a no-op without Pillow."""
+    if Image is None:
+        return
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except Exception as exc:
+        raise ValueError("Uploaded file is not a valid image") from exc
+
+
+def derivative_relpath(filename, width, fmt):
+    """Path of a derivative relative to the upload folder."""
+    extension = DERIVATIVE_FORMATS[fmt][1]
+    return os.path.join(DERIVED_DIR, filename, f"{width or 'full'}.{extension}")
+
+
+def render_derivative(source_path, dest_path, width, fmt):
+    """Resize source_path to at most width pixels wide and save it as fmt without metadata."""
+    pillow_format, _, options = DERIVATIVE_FORMATS[fmt]
+    with Image.open(source_path) as source:
+        image = ImageOps.exif_transpose(source)
+        if width and image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        if fmt == 'jpeg':
+            if has_alpha:
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image.convert('RGBA'), mask=image.convert('RGBA').getchannel('A'))
+                image = background
+            else:
+                image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        # Dropping info keeps Pillow from copying EXIF/ICC/XMP into the output
+        image.info = {}
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        tmp_path = f"{dest_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            image.save(tmp_path, format=pillow_format, **options)
+            os.replace(tmp_path, dest_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return dest_path
+
+
+class DerivativePool:
+    """Background worker pool that renders each derivative at most once at a time.
+
+    Pillow releases the GIL while decoding, resizing and encoding, so a few
+    threads keep resizing off the request path without extra processes.
+    """
+
+    def __init__(self, upload_folder, max_workers=2):
+        self.upload_folder = upload_folder
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-derivatives')
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def ensure(self, filename, width, fmt):
+        """Return a Future resolving to the derivative's relative path, rendering it if missing."""
+        relpath = derivative_relpath(filename, width, fmt)
+        dest_path = os.path.join(self.upload_folder, relpath)
+        if os.path.exists(dest_path):
+            done = Future()
+            done.set_result(relpath)
+            return done
+
+        with self._lock:
+            future = self._inflight.get(relpath)
+            if future is not None:
+                return future
+            source_path = os.path.join(self.upload_folder, filename)
+            future = self._executor.submit(self._render, source_path, dest_path, width, fmt, relpath)
+            self._inflight[relpath] = future
+        # Outside the lock: the callback runs immediately if the render already finished
+        future.add_done_callback(lambda _, key=relpath: self._forget(key))
+        return future
+
+    def prefetch(self, filename):
+        """Queue the common card and detail sizes for a freshly uploaded image."""
+        if not derivatives_enabled() or source_format(filename) is None:
+            return
+        for fmt in PREFETCH_FORMATS:
+            if format_available(fmt):
+                for width in PREFETCH_WIDTHS:
+                    self.ensure(filename, width, fmt)
+
+    def _render(self, source_path, dest_path, width, fmt, relpath):
+        render_derivative(source_path, dest_path, width, fmt)
+        return relpath
+
+    def _forget(self, relpath):
+        with self._lock:
+            self._inflight.pop(relpath, None)
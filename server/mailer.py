@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Email Outbox
+Notification emails are written to the email_outbox table in the same
+transaction as the change that triggers them (enqueue_email), so a request
+never waits on SMTP and a rolled-back change sends nothing.
+
+OutboxSender drains the table in a background thread: it claims due
+messages in batches with FOR UPDATE SKIP LOCKED (several API workers can
+run one each), sends them over a single authenticated SMTP session that is
+kept open between batches, and reschedules failures with exponential
+backoff until EMAIL_MAX_ATTEMPTS is reached.
+
+Usage:
+    python mailer.py drain     # send everything that is due, then exit
+    python mailer.py status    # count messages per status
+"""
+import email.utils
+import os
+import random
+import smtplib
+import sys
+import threading
+import time
+from email.message import EmailMessage
+
+import psycopg2.extras
+from dotenv import load_dotenv
+
+from stats import get_connection
+
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_POLL_SECONDS = 5.0
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+# How long a claimed batch stays hidden from other senders if this one dies mid-batch
+CLAIM_LEASE_SECONDS = 300
+
+CLAIM_SQL = """
+    WITH due AS (
+        SELECT id FROM email_outbox
+        WHERE status = 'pending' AND next_attempt_at <= NOW()
+        ORDER BY next_attempt_at
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE email_outbox o
+    SET attempts = o.attempts + 1,
+        next_attempt_at = NOW() + make_interval(secs => %(lease)s)
+    FROM due
+    WHERE o.id = due.id
+    RETURNING o.id, o.to_email, o.subject, o.body_html, o.body_text, o.attempts;
+"""
+
+
+def env_flag(name, default):
+    value = (os.environ.get(name) or '').strip().lower()
+    if not value:
+        return default
+    return value in ('1', 'true', 'yes', 'on')
+
+
+class SMTPSettings:
+    """SMTP_* settings; STARTTLS and login can be switched off for a local relay."""
+
+    def __init__(self, host, port, user=None, password=None, from_email=None, starttls=True, auth=True,
+                 timeout=30, max_messages=100):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.from_email = from_email or user
+        self.starttls = starttls
+        self.auth = auth
+        self.timeout = timeout
+        self.max_messages = max_messages
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            host=os.environ.get('SMTP_SERVER', 'smtp.gmail.com'),
+            port=int(os.environ.get('SMTP_PORT', '587')),
+            user=os.environ.get('SMTP_USER'),
+            password=os.environ.get('SMTP_PASSWORD'),
+            from_email=os.environ.get('FROM_EMAIL'),
+            starttls=env_flag('SMTP_STARTTLS', True),
+            auth=env_flag('SMTP_AUTH', True),
+            timeout=float(os.environ.get('SMTP_TIMEOUT', '30')),
+            max_messages=int(os.environ.get('SMTP_MAX_MESSAGES_PER_CONNECTION', '100')),
+        )
+
+    @property
+    def configured(self):
+        if self.auth:
+            return bool(self.user and self.password)
+        return bool(self.host and self.from_email)
+
+
+class SMTPSession:
+    """One SMTP connection reused across messages.
+
+    Reconnects when the server has dropped it, after max_messages (many
+    providers cap messages per connection) and after idle_seconds without use.
+    """
+
+    def __init__(self, settings, idle_seconds=60):
+        self.settings = settings
+        self.idle_seconds = idle_seconds
+        self._smtp = None
+        self._sent = 0
+        self._last_used = 0.0
+
+    def _connect(self):
+        settings = self.settings
+        smtp = smtplib.SMTP(settings.host, settings.port, timeout=settings.timeout)
+        try:
+            smtp.ehlo()
+            if settings.starttls:
+                smtp.starttls()
+                smtp.ehlo()
+            if settings.auth:
+                smtp.login(settings.user, settings.password)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        self._sent = 0
+
+    def _usable(self):
+        if self._smtp is None or self._sent >= self.settings.max_messages:
+            return False
+        if time.monotonic() - self._last_used > self.idle_seconds:
+            # Servers close idle connections; check before reusing an old one
+            try:
+                return self._smtp.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                return False
+        return True
+
+    def send(self, message):
+        if not self._usable():
+            self.close()
+            self._connect()
+        try:
+            self._smtp.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Dropped between the check and the send; one fresh attempt
+            self.close()
+            self._connect()
+            self._smtp.send_message(message)
+        self._sent += 1
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self._smtp is not None and time.monotonic() - self._last_used > self.idle_seconds:
+            self.close()
+
+    def close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            self._smtp.close()
+        self._smtp = None
+
+
+def enqueue_email(cur, to_email, subject, body_html, body_text=None):
+    """Queue an email inside the caller's transaction; it is sent only if that commits."""
+    cur.execute(
+        """
+            INSERT INTO email_outbox (to_email, subject, body_html, body_text)
+            VALUES (%s, %s, %s, %s);
+        """,
+        (to_email, subject, body_html, body_text),
+    )
+
+
+def enqueue_emails(cur, to_emails, subject, body_html, body_text=None):
+    """Queue one rendered email for many recipients in a single INSERT."""
+    psycopg2.extras.execute_values(
+        cur,
+        "INSERT INTO email_outbox (to_email, subject, body_html, body_text) VALUES %s;",
+        [(to_email, subject, body_html, body_text) for to_email in to_emails],
+        page_size=500,
+    )
+    return len(to_emails)
+
+
+def build_message(from_email, to_email, subject, body_html, body_text=None):
+    message = EmailMessage()
+    message['From'] = from_email
+    message['To'] = to_email
+    message['Subject'] = subject
+    message['Date'] = email.utils.formatdate(localtime=False)
+    message['Message-ID'] = email.utils.make_msgid()
+    if body_text:
+        message.set_content(body_text)
+        message.add_alternative(body_html, subtype='html')
+    else:
+        message.set_content(body_html, subtype='html')
+    return message
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter: ~30 s, 1 min, 2 min, ... capped at an hour."""
+    delay = min(RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def is_connection_failure(exc):
+    """Failures of the session itself rather than of one message; every later send would fail too."""
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, smtplib.SMTPAuthenticationError)):
+        return True
+    # smtplib's exceptions are OSErrors too; only plain socket errors count here
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+def is_permanent_failure(exc):
+    """5xx replies about a message (bad address, rejected content) will not succeed on a retry."""
+    if is_connection_failure(exc):
+        return False
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    return isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code >= 500
+
+
+def send_batch(conn, session, batch_size=DEFAULT_BATCH_SIZE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Claim up to batch_size due messages, send them and record the outcome.
+
+    Returns (sent, failed) counts for the batch; (0, 0) means nothing was due.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(CLAIM_SQL, {'limit': batch_size, 'lease': CLAIM_LEASE_SECONDS})
+        claimed = cur.fetchall()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        cur.close()
+        raise
+
+    sent_ids = []
+    failures = []
+    connection_error = None
+    for message_id, to_email, subject, body_html, body_text, attempts in claimed:
+        if connection_error is not None:
+            # The server is unreachable; don't spend a timeout on every message
+            failures.append((message_id, attempts, connection_error, False))
+            continue
+        message = build_message(session.settings.from_email, to_email, subject, body_html, body_text)
+        try:
+            session.send(message)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            if is_connection_failure(exc):
+                session.close()
+                connection_error = error
+            failures.append((message_id, attempts, error, is_permanent_failure(exc)))
+        else:
+            sent_ids.append(message_id)
+
+    try:
+        if sent_ids:
+            cur.execute(
+                "UPDATE email_outbox SET status = 'sent', sent_at = NOW(), last_error = NULL WHERE id = ANY(%s);",
+                (sent_ids,)
+            )
+        for message_id, attempts, error, permanent in failures:
+            give_up = permanent or attempts >= max_attempts
+            cur.execute(
+                """
+                    UPDATE email_outbox
+                    SET status = %s, last_error = %s, next_attempt_at = NOW() + make_interval(secs => %s)
+                    WHERE id = %s;
+                """,
+                ('failed' if give_up else 'pending', error, retry_delay(attempts), message_id)
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return len(sent_ids), len(failures)
+
+
+class OutboxSender:
+    """Background thread that drains email_outbox through one pooled SMTP session.
+
+    ensure_running() starts the thread lazily in the process that calls it, so
+    it works with gunicorn's preload_app (threads don't survive the fork).
+    wake() skips the poll interval after something was enqueued.
+    """
+
+    def __init__(self, connect, settings, logger, batch_size=DEFAULT_BATCH_SIZE,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, poll_seconds=DEFAULT_POLL_SECONDS):
+        self.connect = connect
+        self.settings = settings
+        self.logger = logger
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def ensure_running(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._pid = None
+
+    def _run(self):
+        if not self.settings.configured:
+            self.logger.warning("SMTP is not configured; queued emails stay in email_outbox")
+            return
+        session = SMTPSession(self.settings)
+        conn = None
+        while not self._stop.is_set():
+            busy = False
+            try:
+                if conn is None or conn.closed:
+                    conn = self.connect()
+                sent, failed = send_batch(conn, session, self.batch_size, self.max_attempts)
+                if sent or failed:
+                    self.logger.info(f"Email outbox: {sent} sent, {failed} failed")
+                # A full batch may mean more is due right away
+                busy = sent + failed >= self.batch_size
+            except Exception as exc:
+                self.logger.error(f"Email outbox sender error: {exc}")
+                if conn is not None:
+                    conn.close()
+                    conn = None
+            if not busy:
+                session.close_if_idle()
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+        session.close()
+        if conn is not None:
+            conn.close()
+
+
+def outbox_status(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT status, COUNT(*) FROM email_outbox GROUP BY status ORDER BY status;")
+        return dict(cur.fetchall())
+    finally:
+        conn.rollback()
+        cur.close()
+
+
+def main():
+    load_dotenv()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'drain'
+    if command not in ('drain', 'status'):
+        print("Usage: python mailer.py [drain|status]")
+        sys.exit(2)
+
+    conn = get_connection()
+    try:
+        if command == 'status':
+            for status, count in outbox_status(conn).items():
+                print(f"  {status:<8} {count}")
+            return
+        settings = SMTPSettings.from_env()
+        if not settings.configured:
+            print("✗ SMTP is not configured (SMTP_USER/SMTP_PASSWORD, or SMTP_AUTH=false and FROM_EMAIL)")
+            sys.exit(1)
+        session = SMTPSession(settings)
+        total_sent = total_failed = 0
+        try:
+            while True:
+                sent, failed = send_batch(conn, session, max_attempts=int(os.environ.get(
+                    'EMAIL_MAX_ATTEMPTS', str(DEFAULT_MAX_ATTEMPTS))))
+                total_sent += sent
+                total_failed += failed
+                if not sent and not failed:
+                    break
+        finally:
+            session.close()
+        print(f"✓ Sent {total_sent} email(s); {total_failed} failed and were rescheduled or given up")
+    except Exception as e:
+        print(f"✗ {command} failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
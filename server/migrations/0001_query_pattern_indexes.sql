@@ -0,0 +1,54 @@
+-- ============================================================
+-- 0001: Indexes that match the API's query patterns
+--
+-- Adds owner/city lookups, the route-history ordering and partial
+-- is_active indexes, and drops the boolean indexes the planner
+-- never picks. Built CONCURRENTLY so production tables stay
+-- writable; every statement must run outside a transaction.
+--
+-- Verify afterwards with: python check_query_plans.py
+-- ============================================================
+
+-- Foreign-key lookups (get_locations_by_city / get_roads_by_city)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_locations_city ON locations (city_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_roads_city ON roads (city_id);
+
+-- Owner-scoped, newest-first lists (collaborator dashboard and lists)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cities_user_created ON cities (user_id, created_at DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_city_details_user_created ON city_details (user_id, created_at DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_locations_user_created ON locations (user_id, created_at DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_roads_user_created ON roads (user_id, created_at DESC);
+
+-- City details by city, newest first; (city_id, predefined_title)
+-- lookups use the unique_city_detail_predefined_title constraint
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_city_details_city_created ON city_details (city_id, created_at DESC);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_city_details_city;
+
+-- Route history: WHERE user_id ORDER BY accessed_at DESC LIMIT 50
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_history_user_accessed
+    ON user_route_history (user_id, accessed_at DESC NULLS LAST, history_id DESC);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_history_user;
+
+-- Public map reads only ever look at active rows
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_locations_active_geom ON locations USING GIST (geom) WHERE is_active;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_roads_active_geom ON roads USING GIST (geom) WHERE is_active;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_locations_active_city ON locations (city_id) WHERE is_active;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_roads_active_city ON roads (city_id) WHERE is_active;
+
+-- Low-selectivity boolean indexes superseded by the partial ones
+DROP INDEX CONCURRENTLY IF EXISTS idx_cities_active;
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_city_details_active;
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_locations_active;
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_roads_active;
@@ -0,0 +1,126 @@
+-- ============================================================
+-- 0002: Materialized dashboard statistics
+--
+-- city_stats, collaborator_stats and route_daily_stats for databases
+-- created before the views were added to db_schema_final.sql.
+-- Refreshed by stats.py.
+-- ============================================================
+
+-- Per-city content statistics
+CREATE MATERIALIZED VIEW IF NOT EXISTS city_stats AS
+SELECT
+    c.id AS city_id,
+    COALESCE(l.location_count, 0) AS location_count,
+    COALESCE(l.active_location_count, 0) AS active_location_count,
+    COALESCE(l.location_count, 0) - COALESCE(l.active_location_count, 0) AS inactive_location_count,
+    COALESCE(l.location_type_counts, '{}'::jsonb) AS location_type_counts,
+    COALESCE(r.road_count, 0) AS road_count,
+    COALESCE(r.active_road_count, 0) AS active_road_count,
+    COALESCE(r.road_count, 0) - COALESCE(r.active_road_count, 0) AS inactive_road_count,
+    COALESCE(r.road_length_m, 0) AS road_length_m,
+    NOW() AS refreshed_at
+FROM cities c
+LEFT JOIN (
+    SELECT
+        city_id,
+        SUM(type_count)::BIGINT AS location_count,
+        SUM(active_count)::BIGINT AS active_location_count,
+        jsonb_object_agg(location_type, type_count) AS location_type_counts
+    FROM (
+        SELECT
+            city_id,
+            COALESCE(location_type, 'unknown') AS location_type,
+            COUNT(*) AS type_count,
+            COUNT(*) FILTER (WHERE is_active) AS active_count
+        FROM locations
+        WHERE city_id IS NOT NULL
+        GROUP BY city_id, COALESCE(location_type, 'unknown')
+    ) by_type
+    GROUP BY city_id
+) l ON l.city_id = c.id
+LEFT JOIN (
+    SELECT
+        city_id,
+        COUNT(*) AS road_count,
+        COUNT(*) FILTER (WHERE is_active) AS active_road_count,
+        SUM((SELECT SUM(segment) FROM unnest(length_m) AS segment)) AS road_length_m
+    FROM roads
+    WHERE city_id IS NOT NULL
+    GROUP BY city_id
+) r ON r.city_id = c.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_city_stats_city ON city_stats (city_id);
+
+-- Per-collaborator (and admin) content statistics
+CREATE MATERIALIZED VIEW IF NOT EXISTS collaborator_stats AS
+SELECT
+    u.id AS user_id,
+    COALESCE(c.city_count, 0) AS city_count,
+    COALESCE(d.city_detail_count, 0) AS city_detail_count,
+    COALESCE(l.location_count, 0) AS location_count,
+    COALESCE(l.active_location_count, 0) AS active_location_count,
+    COALESCE(l.location_count, 0) - COALESCE(l.active_location_count, 0) AS inactive_location_count,
+    COALESCE(l.location_type_counts, '{}'::jsonb) AS location_type_counts,
+    COALESCE(r.road_count, 0) AS road_count,
+    COALESCE(r.active_road_count, 0) AS active_road_count,
+    COALESCE(r.road_count, 0) - COALESCE(r.active_road_count, 0) AS inactive_road_count,
+    COALESCE(r.road_length_m, 0) AS road_length_m,
+    NOW() AS refreshed_at
+FROM users u
+LEFT JOIN (
+    SELECT user_id, COUNT(*) AS city_count
+    FROM cities
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id
+) c ON c.user_id = u.id
+LEFT JOIN (
+    SELECT user_id, COUNT(*) AS city_detail_count
+    FROM city_details
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id
+) d ON d.user_id = u.id
+LEFT JOIN (
+    SELECT
+        user_id,
+        SUM(type_count)::BIGINT AS location_count,
+        SUM(active_count)::BIGINT AS active_location_count,
+        jsonb_object_agg(location_type, type_count) AS location_type_counts
+    FROM (
+        SELECT
+            user_id,
+            COALESCE(location_type, 'unknown') AS location_type,
+            COUNT(*) AS type_count,
+            COUNT(*) FILTER (WHERE is_active) AS active_count
+        FROM locations
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id, COALESCE(location_type, 'unknown')
+    ) by_type
+    GROUP BY user_id
+) l ON l.user_id = u.id
+LEFT JOIN (
+    SELECT
+        user_id,
+        COUNT(*) AS road_count,
+        COUNT(*) FILTER (WHERE is_active) AS active_road_count,
+        SUM((SELECT SUM(segment) FROM unnest(length_m) AS segment)) AS road_length_m
+    FROM roads
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id
+) r ON r.user_id = u.id
+WHERE u.user_type IN ('admin', 'collaborator');
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_collaborator_stats_user ON collaborator_stats (user_id);
+
+-- Routes planned per day
+CREATE MATERIALIZED VIEW IF NOT EXISTS route_daily_stats AS
+SELECT
+    accessed_at::date AS day,
+    COUNT(*) AS route_count,
+    COUNT(DISTINCT user_id) AS user_count,
+    COALESCE(SUM(total_distance_m), 0) AS total_distance_m,
+    NOW() AS refreshed_at
+FROM user_route_history
+WHERE accessed_at IS NOT NULL
+GROUP BY accessed_at::date;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_route_daily_stats_day ON route_daily_stats (day);
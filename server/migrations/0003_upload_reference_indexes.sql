@@ -0,0 +1,22 @@
+-- ============================================================
+-- 0003: Upload reference indexes
+--
+-- Content-addressed uploads are garbage-collected when no
+-- image_urls entry points at them any more (see upload_store.py).
+-- image_url_paths() strips scheme and host so absolute seed URLs
+-- and relative /uploads/ URLs match the same path, and the GIN
+-- expression indexes make each reference check an index lookup.
+-- Built CONCURRENTLY; every statement runs outside a transaction.
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION image_url_paths(urls TEXT[]) RETURNS TEXT[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT COALESCE(array_agg(regexp_replace(url, '^[A-Za-z][A-Za-z0-9+.-]*://[^/]+', '')), '{}')
+    FROM unnest(urls) AS url
+$$;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cities_image_paths_gin ON cities USING GIN (image_url_paths(image_urls));
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_city_details_image_paths_gin ON city_details USING GIN (image_url_paths(image_urls));
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_locations_image_paths_gin ON locations USING GIN (image_url_paths(image_urls));
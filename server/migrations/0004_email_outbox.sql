@@ -0,0 +1,30 @@
+-- ============================================================
+-- 0004: Email outbox
+--
+-- Notification emails are inserted in the same transaction as the
+-- change that triggers them and delivered by the background sender
+-- in mailer.py, which reuses one SMTP session and retries with
+-- backoff instead of blocking the request.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    to_email VARCHAR(255) NOT NULL,
+    subject TEXT NOT NULL,
+    body_html TEXT NOT NULL,
+    body_text TEXT,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (
+        status IN ('pending', 'sent', 'failed')
+    ),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    sent_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (next_attempt_at) WHERE status = 'pending';
+
+COMMENT ON TABLE email_outbox IS 'Notification emails waiting for, or recorded after, delivery by mailer.py';
+
+COMMENT ON COLUMN email_outbox.next_attempt_at IS 'When a pending message is next due; pushed forward while a sender holds it and by retry backoff';
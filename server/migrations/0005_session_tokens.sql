@@ -0,0 +1,44 @@
+-- ============================================================
+-- 0005: Refresh tokens and access token revocations
+--
+-- Access tokens are short-lived JWTs carrying the user's role;
+-- sessions continue through single-use refresh tokens stored as
+-- SHA-256 hashes. token_revocations lists access tokens that must
+-- stop working before they expire, and is mirrored in each API
+-- worker as a bloom filter (see auth_tokens.py).
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4 (),
+    user_id UUID NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    family_id UUID NOT NULL,
+    token_hash CHAR(64) NOT NULL UNIQUE,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMP NOT NULL,
+    used_at TIMESTAMP,
+    revoked_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family ON refresh_tokens (family_id);
+
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user ON refresh_tokens (user_id) WHERE revoked_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_expires ON refresh_tokens (expires_at);
+
+CREATE TABLE IF NOT EXISTS token_revocations (
+    id BIGSERIAL PRIMARY KEY,
+    jti VARCHAR(64),
+    user_id UUID NOT NULL,
+    revoked_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_token_revocations_jti ON token_revocations (jti) WHERE jti IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_token_revocations_user ON token_revocations (user_id, revoked_at) WHERE jti IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_token_revocations_expires ON token_revocations (expires_at);
+
+COMMENT ON COLUMN refresh_tokens.family_id IS 'id of the first token of a login; a rotated token shares its predecessor''s family';
+
+COMMENT ON COLUMN token_revocations.jti IS 'One revoked access token; NULL revokes every token the user was issued before revoked_at';
@@ -0,0 +1,66 @@
+-- ============================================================
+-- 0006: Road type counts in city_stats
+--
+-- Adds road_type_counts so the admin dashboard summary can read
+-- its road type histogram from the view. A materialized view
+-- cannot gain a column in place, so city_stats is recreated and
+-- populated here.
+-- ============================================================
+
+DROP MATERIALIZED VIEW IF EXISTS city_stats;
+
+-- Per-city content statistics
+CREATE MATERIALIZED VIEW city_stats AS
+SELECT
+    c.id AS city_id,
+    COALESCE(l.location_count, 0) AS location_count,
+    COALESCE(l.active_location_count, 0) AS active_location_count,
+    COALESCE(l.location_count, 0) - COALESCE(l.active_location_count, 0) AS inactive_location_count,
+    COALESCE(l.location_type_counts, '{}'::jsonb) AS location_type_counts,
+    COALESCE(r.road_count, 0) AS road_count,
+    COALESCE(r.active_road_count, 0) AS active_road_count,
+    COALESCE(r.road_count, 0) - COALESCE(r.active_road_count, 0) AS inactive_road_count,
+    COALESCE(r.road_length_m, 0) AS road_length_m,
+    COALESCE(r.road_type_counts, '{}'::jsonb) AS road_type_counts,
+    NOW() AS refreshed_at
+FROM cities c
+LEFT JOIN (
+    SELECT
+        city_id,
+        SUM(type_count)::BIGINT AS location_count,
+        SUM(active_count)::BIGINT AS active_location_count,
+        jsonb_object_agg(location_type, type_count) AS location_type_counts
+    FROM (
+        SELECT
+            city_id,
+            COALESCE(location_type, 'unknown') AS location_type,
+            COUNT(*) AS type_count,
+            COUNT(*) FILTER (WHERE is_active) AS active_count
+        FROM locations
+        WHERE city_id IS NOT NULL
+        GROUP BY city_id, COALESCE(location_type, 'unknown')
+    ) by_type
+    GROUP BY city_id
+) l ON l.city_id = c.id
+LEFT JOIN (
+    SELECT
+        city_id,
+        SUM(type_count)::BIGINT AS road_count,
+        SUM(active_count)::BIGINT AS active_road_count,
+        SUM(type_length_m) AS road_length_m,
+        jsonb_object_agg(road_type, type_count) AS road_type_counts
+    FROM (
+        SELECT
+            city_id,
+            COALESCE(road_type, 'unknown') AS road_type,
+            COUNT(*) AS type_count,
+            COUNT(*) FILTER (WHERE is_active) AS active_count,
+            SUM((SELECT SUM(segment) FROM unnest(length_m) AS segment)) AS type_length_m
+        FROM roads
+        WHERE city_id IS NOT NULL
+        GROUP BY city_id, COALESCE(road_type, 'unknown')
+    ) by_type
+    GROUP BY city_id
+) r ON r.city_id = c.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_city_stats_city ON city_stats (city_id);
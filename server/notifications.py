@@ -0,0 +1,84 @@
+"""
+Notification Templates
+Email bodies live in templates/email as Jinja2 templates, one pair per
+notification and locale:
+
+    <name>.<locale>.html   HTML body, extends base.html, autoescaped
+    <name>.<locale>.txt    {% block subject %} and {% block body %} as plain text
+
+Every template is compiled once when NotificationTemplates is created, so a
+missing or broken template fails at startup instead of in a request, and
+rendering is just calling the compiled code. Values such as admin notes are
+escaped in the HTML part.
+"""
+import collections
+import os
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'email')
+LOCALES = ('en', 'mm')
+DEFAULT_LOCALE = 'en'
+NOTIFICATIONS = ('collaborator_approved', 'collaborator_revoked', 'city_announcement')
+LOCALE_ALIASES = {'my': 'mm', 'mm_mm': 'mm', 'my_mm': 'mm', 'en_us': 'en', 'en_gb': 'en'}
+
+RenderedEmail = collections.namedtuple('RenderedEmail', 'subject html text')
+
+
+def normalize_locale(value):
+    """Map a stored or requested language to a supported locale, defaulting to English."""
+    if not isinstance(value, str):
+        return DEFAULT_LOCALE
+    locale = value.strip().lower().replace('-', '_')
+    locale = LOCALE_ALIASES.get(locale, locale)
+    return locale if locale in LOCALES else DEFAULT_LOCALE
+
+
+def user_locale(preferences):
+    """Locale from users.preferences ({"language": "mm"}); English when unset."""
+    if isinstance(preferences, dict):
+        return normalize_locale(preferences.get('language') or preferences.get('locale'))
+    return DEFAULT_LOCALE
+
+
+def localized_text(value, locale):
+    """Pick the locale's text from an {"mm": ..., "en": ...} value, falling back to the other language."""
+    if isinstance(value, dict):
+        return value.get(locale) or next((value[other] for other in LOCALES if value.get(other)), '')
+    return value or ''
+
+
+class NotificationTemplates:
+    """Compiled notification templates keyed by (name, locale)."""
+
+    def __init__(self, template_dir=TEMPLATE_DIR):
+        self.env = Environment(
+            loader=FileSystemLoader(template_dir),
+            autoescape=select_autoescape(enabled_extensions=('html',), default_for_string=False),
+            undefined=StrictUndefined,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            # Templates ship with the code; never stat the files again after startup
+            auto_reload=False,
+            cache_size=-1,
+        )
+        self._templates = {}
+        for name in NOTIFICATIONS:
+            for locale in LOCALES:
+                self._templates[name, locale] = (
+                    self.env.get_template(f"{name}.{locale}.html"),
+                    self.env.get_template(f"{name}.{locale}.txt"),
+                )
+
+    def render(self, name, locale, **context):
+        """Render one notification as (subject, html, text)."""
+        locale = normalize_locale(locale)
+        try:
+            html_template, text_template = self._templates[name, locale]
+        except KeyError:
+            raise ValueError(f"Unknown notification: {name}") from None
+        context['locale'] = locale
+        text_context = text_template.new_context(context)
+        subject = ' '.join(''.join(text_template.blocks['subject'](text_context)).split())
+        text = ''.join(text_template.blocks['body'](text_context)).strip() + '\n'
+        return RenderedEmail(subject, html_template.render(context), text)
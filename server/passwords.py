@@ -0,0 +1,116 @@
+"""
+Password Hashing
+Passwords are hashed and verified in the API process instead of with
+pgcrypto's crypt() in Postgres, so a burst of logins costs API CPU rather
+than the shared database's.
+
+One algorithm is used for new hashes (PASSWORD_HASH_ALGORITHM: argon2id or
+bcrypt). Older hashes still verify and are replaced on the next successful
+login:
+
+    $2a$06$...           pgcrypto gen_salt('bf') from register / seed data
+    pbkdf2:... scrypt:...  werkzeug, written by the old collaborator update
+
+argon2-cffi and bcrypt release the GIL while hashing, so the work runs in a
+small thread pool. Only max_pending hashes may wait for it; past that,
+PasswordHasherBusy is raised and the API answers 503 instead of queueing
+without bound.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import argon2
+import bcrypt
+from werkzeug.security import check_password_hash
+
+ALGORITHMS = ('argon2id', 'bcrypt')
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+ARGON2_PREFIX = '$argon2'
+WERKZEUG_PREFIXES = ('pbkdf2:', 'scrypt:')
+# bcrypt only looks at the first 72 bytes of a password
+BCRYPT_MAX_BYTES = 72
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def bcrypt_rounds(stored_hash):
+    try:
+        return int(stored_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+class PasswordHasher:
+    """Hashes new passwords with the configured algorithm and verifies any supported hash."""
+
+    def __init__(self, algorithm='argon2id', bcrypt_rounds=12, argon2_time_cost=3,
+                 argon2_memory_cost=64 * 1024, argon2_parallelism=1, workers=2, max_pending=16,
+                 queue_timeout=2.0):
+        if algorithm not in ALGORITHMS:
+            raise RuntimeError(f"PASSWORD_HASH_ALGORITHM must be one of: {', '.join(ALGORITHMS)}")
+        self.algorithm = algorithm
+        self.bcrypt_rounds = bcrypt_rounds
+        self.argon2 = argon2.PasswordHasher(
+            time_cost=argon2_time_cost,
+            memory_cost=argon2_memory_cost,
+            parallelism=argon2_parallelism,
+            type=argon2.Type.ID,
+        )
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        # Verified when the email is unknown, so the response takes as long as a wrong password
+        self._dummy_hash = self.hash_now('not the password')
+
+    def hash_now(self, password):
+        """Hash in the calling thread."""
+        if self.algorithm == 'argon2id':
+            return self.argon2.hash(password)
+        secret = password.encode('utf-8')[:BCRYPT_MAX_BYTES]
+        return bcrypt.hashpw(secret, bcrypt.gensalt(self.bcrypt_rounds)).decode('ascii')
+
+    def verify_now(self, stored_hash, password):
+        """Return (matches, needs_rehash) in the calling thread."""
+        if not stored_hash:
+            return False, False
+        if stored_hash.startswith(ARGON2_PREFIX):
+            try:
+                self.argon2.verify(stored_hash, password)
+            except (argon2.exceptions.VerificationError, argon2.exceptions.InvalidHashError):
+                return False, False
+            return True, self.algorithm != 'argon2id' or self.argon2.check_needs_rehash(stored_hash)
+        if stored_hash.startswith(BCRYPT_PREFIXES):
+            try:
+                matches = bcrypt.checkpw(password.encode('utf-8')[:BCRYPT_MAX_BYTES], stored_hash.encode('ascii'))
+            except ValueError:
+                return False, False
+            rehash = self.algorithm != 'bcrypt' or bcrypt_rounds(stored_hash) < self.bcrypt_rounds
+            return matches, matches and rehash
+        if stored_hash.startswith(WERKZEUG_PREFIXES):
+            matches = check_password_hash(stored_hash, password)
+            return matches, matches
+        return False, False
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise PasswordHasherBusy("Too many sign-ins in progress, please retry shortly")
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        """Hash a new password on the bounded pool."""
+        return self._run(self.hash_now, password)
+
+    def verify(self, stored_hash, password):
+        """Verify on the bounded pool; a missing user still costs one verification."""
+        if not stored_hash:
+            self._run(self.verify_now, self._dummy_hash, password)
+            return False, False
+        return self._run(self.verify_now, stored_hash, password)
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Route History Writer
+Signed-in /routes requests used to open a second connection and insert into
+routes and user_route_history before responding. plan_route now generates
+both ids itself, hands the row to RouteHistoryWriter and responds; a
+background thread per worker writes whatever has queued every
+ROUTE_HISTORY_FLUSH_MS over one kept-open connection, with a single
+execute_values INSERT per table in one transaction.
+
+Nothing queued is dropped on a clean shutdown: stop() (gunicorn's
+worker_exit hook, or atexit) flushes the queue, and rows that cannot be
+written then (database unreachable) are appended to a JSON-lines spool file
+in ROUTE_HISTORY_SPOOL_DIR, as are rows arriving while the queue is full.
+Spool files left by exited processes are replayed when a writer starts, or
+with the command below. Inserts use ON CONFLICT DO NOTHING, so a replay
+never duplicates rows. A worker killed outright loses at most one flush
+interval.
+
+/routes/history calls wait_for_user() first, so a user always sees the
+routes they just planned.
+
+Usage:
+    python route_history.py replay    # write spooled rows to the database
+"""
+import atexit
+import collections
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+import psycopg2
+import psycopg2.extras
+from dotenv import load_dotenv
+
+from stats import get_connection
+
+DEFAULT_FLUSH_MS = 200
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_MAX_QUEUE = 20000
+RETRY_MAX_SECONDS = 30
+SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spool', 'route_history')
+
+ROUTES_SQL = """
+    INSERT INTO routes (id, user_id, start_loc, end_loc, total_distance_m, estimated_time_s, geom, created_at)
+    VALUES %s
+    ON CONFLICT (id) DO NOTHING
+"""
+ROUTES_TEMPLATE = (
+    "(%(route_id)s, %(user_id)s, ST_GeogFromText(%(start_loc)s), ST_GeogFromText(%(end_loc)s), "
+    "%(total_distance_m)s, %(estimated_time_s)s, ST_GeogFromText(%(geom)s), "
+    "to_timestamp(%(created_at)s)::timestamp)"
+)
+HISTORY_SQL = """
+    INSERT INTO user_route_history
+        (history_id, user_id, route_id, accessed_at, start_name, end_name, total_distance_m, duration_min)
+    VALUES %s
+    ON CONFLICT (history_id) DO NOTHING
+"""
+HISTORY_TEMPLATE = (
+    "(%(history_id)s, %(user_id)s, %(route_id)s, to_timestamp(%(created_at)s)::timestamp, "
+    "%(start_name)s, %(end_name)s, %(total_distance_m)s, %(duration_min)s)"
+)
+
+
+def route_row(route_id, history_id, user_id, start_point, end_point, path_coords,
+              start_name, end_name, total_distance, estimated_time):
+    """Build a queued row (JSON-serialisable, so it can be spooled as is).
+
+    Points and path_coords are (lon, lat); do not swap them when writing WKT.
+    """
+    (start_lon, start_lat), (end_lon, end_lat) = start_point, end_point
+    wkt_coords = ", ".join(f"{lon} {lat}" for lon, lat in path_coords)
+    return {
+        'route_id': str(route_id),
+        'history_id': str(history_id),
+        'user_id': str(user_id),
+        'start_loc': f"SRID=4326;POINT({start_lon} {start_lat})",
+        'end_loc': f"SRID=4326;POINT({end_lon} {end_lat})",
+        'geom': f"SRID=4326;LINESTRING({wkt_coords})",
+        'start_name': start_name,
+        'end_name': end_name,
+        'total_distance_m': total_distance,
+        'estimated_time_s': estimated_time,
+        'duration_min': estimated_time / 60,
+        'created_at': time.time(),
+    }
+
+
+def insert_rows(conn, rows, page_size=DEFAULT_BATCH_SIZE):
+    """Insert queued rows into routes and user_route_history in the current transaction."""
+    cur = conn.cursor()
+    try:
+        psycopg2.extras.execute_values(cur, ROUTES_SQL, rows, template=ROUTES_TEMPLATE, page_size=page_size)
+        history = [
+            dict(
+                row,
+                start_name=psycopg2.extras.Json(row['start_name']) if row['start_name'] is not None else None,
+                end_name=psycopg2.extras.Json(row['end_name']) if row['end_name'] is not None else None,
+            )
+            for row in rows
+        ]
+        psycopg2.extras.execute_values(cur, HISTORY_SQL, history, template=HISTORY_TEMPLATE, page_size=page_size)
+    finally:
+        cur.close()
+
+
+def is_connection_error(exc):
+    return isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+
+def read_boot_id():
+    try:
+        with open('/proc/sys/kernel/random/boot_id', encoding='ascii') as handle:
+            return handle.read().strip().replace('-', '')[:12]
+    except OSError:
+        return None
+
+
+BOOT_ID = read_boot_id()
+
+
+def process_identity(pid):
+    """Boot id and start time of a running process, or None if it isn't running.
+
+    PIDs are reused (a restarted container hands out the same small numbers),
+    so spool files are owned by this identity rather than by the PID alone.
+    """
+    try:
+        with open(f'/proc/{pid}/stat', encoding='ascii', errors='replace') as handle:
+            start_ticks = handle.read().rsplit(')', 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+    return f"{BOOT_ID}s{start_ticks}"
+
+
+def spool_file_name():
+    return f"route_history-{os.getpid()}-{process_identity(os.getpid()) or 'unknown'}-{int(time.time())}.jsonl"
+
+
+def spool_owner_alive(path):
+    """Whether the process that wrote a spool file (route_history-<pid>-<identity>-...) is still running."""
+    parts = os.path.basename(path)[:-len('.jsonl')].split('-')
+    try:
+        pid = int(parts[1])
+    except (IndexError, ValueError):
+        return False
+    identity = parts[2] if len(parts) > 3 else None
+    if identity and identity != 'unknown' and BOOT_ID:
+        return process_identity(pid) == identity
+    # No /proc (or a file from before identities were recorded): fall back to the PID
+    if pid == os.getpid():
+        return identity == 'unknown'
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def replay_spool(conn, spool_dir=SPOOL_DIR, batch_size=DEFAULT_BATCH_SIZE):
+    """Write the rows of every spool file left by an exited process; returns rows replayed."""
+    replayed = 0
+    for path in sorted(glob.glob(os.path.join(spool_dir, 'route_history-*.jsonl'))):
+        if spool_owner_alive(path):
+            continue
+        claimed = path + '.replaying'
+        try:
+            # Several workers may start at once; the rename decides who replays the file
+            os.rename(path, claimed)
+        except OSError:
+            continue
+        try:
+            with open(claimed, encoding='utf-8') as handle:
+                rows = [json.loads(line) for line in handle if line.strip()]
+            for start in range(0, len(rows), batch_size):
+                insert_rows(conn, rows[start:start + batch_size], batch_size)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            os.rename(claimed, path)
+            raise
+        os.remove(claimed)
+        replayed += len(rows)
+    return replayed
+
+
+class RouteHistoryWriter:
+    """Write-behind queue for route history, flushed by a background thread.
+
+    ensure_running() starts the thread lazily in the process that calls it, so
+    it works with gunicorn's preload_app (threads don't survive the fork).
+    """
+
+    def __init__(self, connect, logger, spool_dir=SPOOL_DIR, flush_ms=DEFAULT_FLUSH_MS,
+                 batch_size=DEFAULT_BATCH_SIZE, max_queue=DEFAULT_MAX_QUEUE):
+        self.connect = connect
+        self.logger = logger
+        self.spool_dir = spool_dir
+        self.flush_seconds = flush_ms / 1000
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self._rows = collections.deque()
+        # Rows per user that are queued or being written, for wait_for_user()
+        self._pending = collections.Counter()
+        self._cond = threading.Condition()
+        self._flush_now = False
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._atexit_registered = False
+
+    def ensure_running(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            with self._cond:
+                # Rows inherited from the parent belong to the parent
+                self._rows.clear()
+                self._pending.clear()
+                self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='route-history', daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+    def submit(self, row):
+        """Queue a row from route_row(); spooled to disk when the queue is full."""
+        with self._cond:
+            if len(self._rows) < self.max_queue and not self._stopping:
+                self._rows.append(row)
+                self._pending[row['user_id']] += 1
+                # Wake the thread to start a flush interval, or to write a full batch now
+                if len(self._rows) == 1 or len(self._rows) >= self.batch_size:
+                    self._cond.notify_all()
+                return
+        self._spool([row])
+
+    def wait_for_user(self, user_id, timeout=2.0):
+        """Flush now if the user has rows queued and wait for them; False on timeout."""
+        user_id = str(user_id)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if not self._pending.get(user_id):
+                return True
+            self._flush_now = True
+            self._cond.notify_all()
+            while self._pending.get(user_id):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stop(self, timeout=15):
+        """Flush the queue and stop; whatever cannot be written is spooled."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        with self._cond:
+            leftover = list(self._rows)
+            self._rows.clear()
+        if leftover:
+            self._spool(leftover)
+        self._pid = None
+
+    def _done(self, rows):
+        with self._cond:
+            for row in rows:
+                self._pending[row['user_id']] -= 1
+                if self._pending[row['user_id']] <= 0:
+                    del self._pending[row['user_id']]
+            self._cond.notify_all()
+
+    def _spool(self, rows):
+        path = os.path.join(self.spool_dir, spool_file_name())
+        try:
+            with self._spool_lock:
+                os.makedirs(self.spool_dir, exist_ok=True)
+                with open(path, 'a', encoding='utf-8') as handle:
+                    for row in rows:
+                        handle.write(json.dumps(row) + '\n')
+                    handle.flush()
+                    os.fsync(handle.fileno())
+            self.logger.warning(f"Route history: spooled {len(rows)} rows to {path}")
+        except OSError as exc:
+            self.logger.error(f"Route history: lost {len(rows)} rows, spool failed: {exc}")
+        self._done(rows)
+
+    def _next_batch(self):
+        """Wait for rows, give the batch up to one flush interval to fill, then take it."""
+        with self._cond:
+            while not self._rows and not self._stopping:
+                self._cond.wait()
+            deadline = time.monotonic() + self.flush_seconds
+            while len(self._rows) < self.batch_size and not (self._stopping or self._flush_now):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            self._flush_now = False
+            return [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+
+    def _write_one_by_one(self, conn, rows):
+        """Isolate rows the database rejects (e.g. a user deleted meanwhile) from the rest."""
+        for row in rows:
+            try:
+                insert_rows(conn, [row])
+                conn.commit()
+            except psycopg2.Error as exc:
+                conn.rollback()
+                if is_connection_error(exc):
+                    raise
+                self.logger.error(f"Route history: dropped route {row['route_id']}: {exc}")
+
+    def _run(self):
+        conn = None
+        try:
+            conn = self.connect()
+            replayed = replay_spool(conn, self.spool_dir, self.batch_size)
+            if replayed:
+                self.logger.info(f"Route history: replayed {replayed} spooled rows")
+        except Exception as exc:
+            self.logger.error(f"Route history: spool replay failed: {exc}")
+            if conn is not None:
+                conn.close()
+                conn = None
+
+        failures = 0
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                break
+            try:
+                if conn is None or conn.closed:
+                    conn = self.connect()
+                try:
+                    insert_rows(conn, batch, self.batch_size)
+                    conn.commit()
+                except psycopg2.Error as exc:
+                    conn.rollback()
+                    if is_connection_error(exc):
+                        raise
+                    self._write_one_by_one(conn, batch)
+                self._done(batch)
+                failures = 0
+            except Exception as exc:
+                self.logger.error(f"Route history: write failed, will retry: {exc}")
+                if conn is not None:
+                    conn.close()
+                    conn = None
+                with self._cond:
+                    if self._stopping:
+                        self._rows.extendleft(reversed(batch))
+                        break
+                    self._rows.extendleft(reversed(batch))
+                    failures += 1
+                    self._cond.wait(min(2 ** failures, RETRY_MAX_SECONDS))
+        if conn is not None:
+            conn.close()
+
+
+def main():
+    load_dotenv()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'replay'
+    if command != 'replay':
+        print("Usage: python route_history.py replay")
+        sys.exit(2)
+
+    conn = get_connection()
+    try:
+        spool_dir = os.environ.get('ROUTE_HISTORY_SPOOL_DIR') or SPOOL_DIR
+        replayed = replay_spool(conn, spool_dir)
+        print(f"✓ Replayed {replayed} spooled route history rows from {spool_dir}")
+    except Exception as exc:
+        print(f"✗ Replay failed: {exc}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
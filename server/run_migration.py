@@ -1,16 +1,43 @@
 #!/usr/bin/env python3
 """
-Database Migration Script
-Runs db_schema_fixed.sql against the configured database
+Database Migration Runner
+Applies the numbered SQL files in migrations/ in order and records each one
+in the schema_migrations table.
+
+db_schema_final.sql is the baseline: an empty database is created from it
+and every migration that exists at that point is marked as applied, so the
+file must be kept in sync with the migrations. A database that predates
+schema_migrations is baselined without re-running anything.
+
+Each migration runs in a single transaction. Files that use CONCURRENTLY
+(or start with "-- migrate: no-transaction") are run statement by statement
+in autocommit mode instead, because PostgreSQL refuses to build or drop an
+index concurrently inside a transaction.
+
+Usage:
+    python run_migration.py            # apply pending migrations
+    python run_migration.py status     # list applied and pending migrations
 """
+import hashlib
 import os
+import re
 import sys
+import time
 import psycopg2
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+MIGRATIONS_DIR = os.path.join(SERVER_DIR, 'migrations')
+BASELINE_FILE = os.path.join(SERVER_DIR, '..', 'db_schema_final.sql')
+BASELINE_VERSION = '0000'
+MIGRATION_FILE_RE = re.compile(r'^(\d{4})_([a-z0-9_]+)\.sql$')
+NO_TRANSACTION_RE = re.compile(r'^\s*--\s*migrate:\s*no-transaction\b|\bCONCURRENTLY\b', re.IGNORECASE | re.MULTILINE)
+# Arbitrary key shared by every runner so only one applies migrations at a time
+ADVISORY_LOCK_KEY = 4_726_031
+
 def get_connection():
     """Get database connection using environment variables"""
     host = os.environ.get('DB_HOST', '').strip()
@@ -18,64 +45,287 @@ def get_connection():
     user = os.environ.get('DB_USER', '').strip()
     password = os.environ.get('DB_PASSWORD', '').strip()
     port = os.environ.get('DB_PORT', '5432').strip()
-    
+    sslmode = os.environ.get('DB_SSLMODE', 'require').strip()
+
     print(f"Connecting to: {host}:{port}/{database} as {user}")
-    
+
     return psycopg2.connect(
         host=host,
         database=database,
         user=user,
         password=password,
         port=int(port),
-        sslmode='require',
+        sslmode=sslmode,
         connect_timeout=10
     )
 
-def run_migration():
-    """Run the migration SQL file"""
-    # Read the SQL file
-    sql_file_path = os.path.join(os.path.dirname(__file__), '..', 'db_schema_final.sql')
-    
-    if not os.path.exists(sql_file_path):
-        print(f"ERROR: SQL file not found at {sql_file_path}")
-        sys.exit(1)
-    
-    print(f"Reading migration file: {sql_file_path}")
-    with open(sql_file_path, 'r', encoding='utf-8') as f:
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, 'r', encoding='utf-8') as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode('utf-8')).hexdigest()
+
+    @property
+    def transactional(self):
+        return not NO_TRANSACTION_RE.search(strip_sql_comments(self.sql, keep_directives=True))
+
+    def __repr__(self):
+        return f"{self.version}_{self.name}"
+
+def discover_migrations(directory=MIGRATIONS_DIR):
+    """Return the migrations in directory ordered by version."""
+    migrations = []
+    seen = {}
+    for filename in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        match = MIGRATION_FILE_RE.match(filename)
+        if not match:
+            continue
+        version, name = match.groups()
+        if version in seen:
+            raise ValueError(f"Duplicate migration version {version}: {seen[version]} and {filename}")
+        seen[version] = filename
+        migrations.append(Migration(version, name, os.path.join(directory, filename)))
+    return migrations
+
+def strip_sql_comments(sql, keep_directives=False):
+    """Remove -- and /* */ comments outside string literals (directive lines optionally kept)."""
+    return ''.join(
+        text for kind, text in tokenize_sql(sql)
+        if kind != 'comment' or (keep_directives and re.match(r'--\s*migrate:', text))
+    )
+
+def split_sql_statements(sql):
+    """Split a script on top-level semicolons, skipping comments and empty statements."""
+    statements = []
+    buffer = []
+    for kind, text in tokenize_sql(sql):
+        if kind == 'semicolon':
+            statements.append(''.join(buffer).strip())
+            buffer = []
+        elif kind == 'code':
+            buffer.append(text)
+    statements.append(''.join(buffer).strip())
+    return [statement for statement in statements if statement]
+
+def tokenize_sql(sql):
+    """Yield ('code' | 'comment' | 'semicolon', text) chunks of sql.
+
+    Quoted identifiers, string literals and dollar-quoted bodies stay inside
+    'code' chunks, so semicolons and comment markers within them are ignored.
+    """
+    i = 0
+    start = 0
+    length = len(sql)
+    while i < length:
+        ch = sql[i]
+        if sql.startswith('--', i) or sql.startswith('/*', i):
+            if sql.startswith('--', i):
+                end = sql.find('\n', i)
+                end = length if end == -1 else end
+            else:
+                end = sql.find('*/', i + 2)
+                end = length if end == -1 else end + 2
+            yield 'code', sql[start:i]
+            yield 'comment', sql[i:end]
+            i = start = end
+        elif ch == ';':
+            yield 'code', sql[start:i]
+            yield 'semicolon', ch
+            i = start = i + 1
+        elif ch in ("'", '"'):
+            end = i + 1
+            while end < length:
+                if sql[end] == ch:
+                    if end + 1 < length and sql[end + 1] == ch:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            i = end + 1
+        elif ch == '$' and (tag := re.match(r'\$[A-Za-z_]*\$', sql[i:])):
+            end = sql.find(tag.group(0), i + len(tag.group(0)))
+            i = length if end == -1 else end + len(tag.group(0))
+        else:
+            i += 1
+    yield 'code', sql[start:]
+
+def ensure_migrations_table(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version VARCHAR(16) PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                checksum CHAR(64),
+                applied_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                execution_ms INTEGER
+            );
+        """)
+        conn.commit()
+    finally:
+        cur.close()
+
+def get_applied_migrations(conn):
+    """Return {version: (name, checksum)} for every recorded migration."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT version, name, checksum FROM schema_migrations ORDER BY version;")
+        return {version: (name, checksum) for version, name, checksum in cur.fetchall()}
+    finally:
+        cur.close()
+
+def record_migration(cur, version, name, checksum, execution_ms):
+    cur.execute(
+        """
+            INSERT INTO schema_migrations (version, name, checksum, execution_ms)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (version) DO NOTHING;
+        """,
+        (version, name, checksum, execution_ms)
+    )
+
+def database_has_schema(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT to_regclass('public.users') IS NOT NULL;")
+        return cur.fetchone()[0]
+    finally:
+        cur.close()
+
+def apply_baseline(conn, migrations):
+    """Create an empty database from db_schema_final.sql and mark current migrations applied."""
+    with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
         sql_content = f.read()
-    
-    # Connect and execute
+    print(f"Applying baseline {os.path.basename(BASELINE_FILE)}...")
+    started = time.perf_counter()
+    cur = conn.cursor()
+    try:
+        cur.execute(sql_content)
+        execution_ms = int((time.perf_counter() - started) * 1000)
+        record_migration(cur, BASELINE_VERSION, 'baseline', None, execution_ms)
+        for migration in migrations:
+            record_migration(cur, migration.version, migration.name, migration.checksum, 0)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    print(f"✓ Baseline applied in {execution_ms} ms; {len(migrations)} migration(s) already included")
+
+def mark_baseline(conn):
+    """Record an existing, untracked database as being at the baseline."""
+    cur = conn.cursor()
+    try:
+        record_migration(cur, BASELINE_VERSION, 'baseline', None, 0)
+        conn.commit()
+    finally:
+        cur.close()
+    print("✓ Existing schema recorded as baseline")
+
+def apply_migration(conn, migration):
+    started = time.perf_counter()
+    cur = conn.cursor()
+    try:
+        if migration.transactional:
+            cur.execute(migration.sql)
+        else:
+            conn.commit()
+            conn.autocommit = True
+            try:
+                for statement in split_sql_statements(migration.sql):
+                    cur.execute(statement)
+            finally:
+                conn.autocommit = False
+        execution_ms = int((time.perf_counter() - started) * 1000)
+        record_migration(cur, migration.version, migration.name, migration.checksum, execution_ms)
+        conn.commit()
+        return execution_ms
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+def warn_on_changed_migrations(migrations, applied):
+    for migration in migrations:
+        recorded = applied.get(migration.version)
+        if recorded and recorded[1] and recorded[1] != migration.checksum:
+            print(f"! {migration} was edited after it was applied; add a new migration instead")
+
+def run_migration():
+    """Apply every pending migration"""
+    migrations = discover_migrations()
+
     print("Connecting to database...")
     conn = get_connection()
     cur = conn.cursor()
-    
     try:
-        print("Executing migration...")
-        cur.execute(sql_content)
+        cur.execute("SELECT pg_advisory_lock(%s);", (ADVISORY_LOCK_KEY,))
         conn.commit()
-        print("✓ Migration completed successfully!")
-        
-        # Verify tables were created
-        print("\nVerifying tables...")
-        cur.execute("""
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            ORDER BY table_name;
-        """)
-        tables = cur.fetchall()
-        print(f"✓ Found {len(tables)} tables:")
-        for table in tables:
-            print(f"  - {table[0]}")
-            
+        ensure_migrations_table(conn)
+        applied = get_applied_migrations(conn)
+
+        if BASELINE_VERSION not in applied:
+            if database_has_schema(conn):
+                mark_baseline(conn)
+            else:
+                apply_baseline(conn, migrations)
+            applied = get_applied_migrations(conn)
+
+        warn_on_changed_migrations(migrations, applied)
+        pending = [migration for migration in migrations if migration.version not in applied]
+        if not pending:
+            print("✓ Database is up to date")
+            return
+
+        for migration in pending:
+            mode = "transaction" if migration.transactional else "autocommit"
+            print(f"Applying {migration} ({mode})...")
+            execution_ms = apply_migration(conn, migration)
+            print(f"✓ {migration} applied in {execution_ms} ms")
+        print(f"\n✓ Applied {len(pending)} migration(s)")
+
     except Exception as e:
         conn.rollback()
         print(f"\n✗ Migration failed!")
         print(f"Error: {e}")
         sys.exit(1)
     finally:
+        try:
+            cur.execute("SELECT pg_advisory_unlock(%s);", (ADVISORY_LOCK_KEY,))
+            conn.commit()
+        except psycopg2.Error:
+            pass
         cur.close()
         conn.close()
 
+def show_status():
+    """Print applied and pending migrations"""
+    migrations = discover_migrations()
+    conn = get_connection()
+    try:
+        ensure_migrations_table(conn)
+        applied = get_applied_migrations(conn)
+    finally:
+        conn.close()
+
+    baseline = "applied" if BASELINE_VERSION in applied else "pending"
+    print(f"  {BASELINE_VERSION}_baseline{'':<32} {baseline}")
+    for migration in migrations:
+        state = "applied" if migration.version in applied else "pending"
+        print(f"  {str(migration):<41} {state}")
+    warn_on_changed_migrations(migrations, applied)
+
 if __name__ == '__main__':
-    run_migration()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'up'
+    if command == 'status':
+        show_status()
+    elif command == 'up':
+        run_migration()
+    else:
+        print(__doc__)
+        sys.exit(2)
@@ -0,0 +1,261 @@
+"""
+Response serialization for the Myanmar Explorer API.
+
+Database rows are turned into slotted dataclasses and encoded by a Flask JSON
+provider that uses orjson when it is installed and the stdlib encoder otherwise.
+"""
+import dataclasses
+import datetime
+import json
+import uuid
+from dataclasses import dataclass
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+
+def json_default(value):
+    """Encode the non-JSON types returned by psycopg2 and the payload dataclasses."""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if dataclasses.is_dataclass(value):
+        return {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj):
+    """Serialize obj to UTF-8 JSON bytes with the fastest available encoder."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson with a stdlib fallback.
+
+    UUID, datetime, Decimal and dataclass values are handled natively, so
+    handlers can return rows and payload objects without pre-converting them.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        kwargs.setdefault("default", json_default)
+        kwargs.setdefault("ensure_ascii", False)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+
+def ensure_mapping(record):
+    """Return a mapping with .get() for serialization helpers."""
+    if record is None:
+        return {}
+    if isinstance(record, dict) or hasattr(record, "get"):
+        return record
+    if hasattr(record, "keys"):
+        return {key: record[key] for key in record.keys()}
+    try:
+        return dict(record)
+    except Exception:
+        return {}
+
+
+def localized_pair(value, plain_text_as_en=True):
+    """Return (mm, en) from a multilingual JSONB value; bare strings count as English."""
+    if isinstance(value, dict):
+        return value.get("mm"), value.get("en")
+    if plain_text_as_en and isinstance(value, str):
+        return None, value
+    return None, None
+
+
+def optional_str(value):
+    return str(value) if value is not None else None
+
+
+def isoformat_or_none(value):
+    return value.isoformat() if value else None
+
+
+@dataclass(slots=True)
+class CityPayload:
+    id: str
+    user_id: str | None
+    name_mm: str | None
+    name_en: str | None
+    address_mm: str | None
+    address_en: str | None
+    image_urls: list | None
+    description_mm: str | None
+    description_en: str | None
+    geometry: object
+    is_active: bool | None
+
+
+@dataclass(slots=True)
+class LocationPayload:
+    id: str
+    city_id: str | None
+    user_id: str | None
+    name_mm: str | None
+    name_en: str | None
+    address_mm: str | None
+    address_en: str | None
+    image_urls: list | None
+    description_mm: str | None
+    description_en: str | None
+    location_type: str | None
+    geometry: object
+    is_active: bool | None
+
+
+@dataclass(slots=True)
+class RoadPayload:
+    id: str
+    city_id: str | None
+    user_id: str | None
+    name_mm: str | None
+    name_en: str | None
+    road_type: str | None
+    is_oneway: bool | None
+    length_m: list | None
+    geometry: object
+    is_active: bool | None
+
+
+@dataclass(slots=True)
+class CityDetailPayload:
+    id: str
+    city_id: str | None
+    user_id: str | None
+    predefined_title: str | None
+    subtitle_mm: str | None
+    subtitle_en: str | None
+    body_mm: str | None
+    body_en: str | None
+    image_urls: list | None
+    created_at: str | None
+    updated_at: str | None
+
+
+@dataclass(slots=True)
+class UserPayload:
+    id: str
+    username: str
+    email: str
+    user_type: str | None
+    is_admin: bool | None
+    created_at: str | None
+    last_login: str | None
+
+
+def serialize_city_record(city):
+    city = ensure_mapping(city)
+    name_mm, name_en = localized_pair(city.get("name"), plain_text_as_en=False)
+    address_mm, address_en = localized_pair(city.get("address"))
+    description_mm, description_en = localized_pair(city.get("description"))
+    return CityPayload(
+        str(city["id"]),
+        optional_str(city["user_id"]),
+        name_mm,
+        name_en,
+        address_mm,
+        address_en,
+        city["image_urls"],
+        description_mm,
+        description_en,
+        city["geometry"],
+        city.get("is_active"),
+    )
+
+
+def serialize_location_record(location):
+    location = ensure_mapping(location)
+    name_mm, name_en = localized_pair(location.get("name"), plain_text_as_en=False)
+    address_mm, address_en = localized_pair(location.get("address"))
+    description_mm, description_en = localized_pair(location.get("description"))
+    return LocationPayload(
+        str(location["id"]),
+        optional_str(location["city_id"]),
+        optional_str(location["user_id"]),
+        name_mm,
+        name_en,
+        address_mm,
+        address_en,
+        location["image_urls"],
+        description_mm,
+        description_en,
+        location["location_type"],
+        location["geometry"],
+        location.get("is_active"),
+    )
+
+
+def serialize_road_record(road):
+    road = ensure_mapping(road)
+    name_mm, name_en = localized_pair(road.get("name"), plain_text_as_en=False)
+    return RoadPayload(
+        str(road["id"]),
+        optional_str(road["city_id"]),
+        optional_str(road["user_id"]),
+        name_mm,
+        name_en,
+        road["road_type"],
+        road["is_oneway"],
+        road["length_m"],
+        road["geometry"],
+        road.get("is_active"),
+    )
+
+
+def serialize_city_detail_record(detail):
+    """Serialize city_detail record for JSON response."""
+    detail = ensure_mapping(detail)
+    subtitle_mm, subtitle_en = localized_pair(detail.get("subtitle"), plain_text_as_en=False)
+    body_mm, body_en = localized_pair(detail.get("body"), plain_text_as_en=False)
+    return CityDetailPayload(
+        str(detail["id"]),
+        optional_str(detail["city_id"]),
+        optional_str(detail["user_id"]),
+        detail.get("predefined_title"),
+        subtitle_mm,
+        subtitle_en,
+        body_mm,
+        body_en,
+        detail["image_urls"],
+        isoformat_or_none(detail.get("created_at")),
+        isoformat_or_none(detail.get("updated_at")),
+    )
+
+
+def serialize_user_record(user):
+    return UserPayload(
+        str(user["id"]),
+        user["username"],
+        user["email"],
+        user.get("user_type"),
+        user.get("is_admin"),
+        isoformat_or_none(user.get("created_at")),
+        isoformat_or_none(user.get("last_login")),
+    )
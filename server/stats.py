@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Dashboard Statistics Refresh
+Refreshes the city_stats, collaborator_stats and route_daily_stats
+materialized views defined in db_schema_final.sql.
+
+Run it on a schedule, e.g. every five minutes from cron:
+    */5 * * * * cd /path/to/server && python stats.py
+"""
+import os
+import sys
+import time
+
+import psycopg2
+from dotenv import load_dotenv
+
+STATS_VIEWS = ('city_stats', 'collaborator_stats', 'route_daily_stats')
+
+
+def refresh_stats_views(conn, concurrently=True):
+    """Refresh every statistics view and return {view: seconds taken}.
+
+    CONCURRENTLY keeps the views readable during the refresh; it relies on
+    the unique index each view is created with.
+    """
+    mode = "CONCURRENTLY " if concurrently else ""
+    timings = {}
+    cur = conn.cursor()
+    try:
+        for view in STATS_VIEWS:
+            started = time.perf_counter()
+            cur.execute(f"REFRESH MATERIALIZED VIEW {mode}{view};")
+            conn.commit()
+            timings[view] = time.perf_counter() - started
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return timings
+
+
+def get_connection():
+    """Get database connection using environment variables"""
+    port = os.environ.get('DB_PORT', '5432').strip()
+    return psycopg2.connect(
+        host=os.environ.get('DB_HOST', '').strip(),
+        database=os.environ.get('DB_NAME', '').strip(),
+        user=os.environ.get('DB_USER', '').strip(),
+        password=os.environ.get('DB_PASSWORD', '').strip(),
+        port=int(port) if port else None,
+        sslmode=os.environ.get('DB_SSLMODE', 'require').strip(),
+        connect_timeout=10,
+    )
+
+
+def main():
+    load_dotenv()
+    conn = get_connection()
+    try:
+        timings = refresh_stats_views(conn, concurrently='--blocking' not in sys.argv[1:])
+    except Exception as e:
+        print(f"✗ Statistics refresh failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+    for view, seconds in timings.items():
+        print(f"✓ {view} refreshed in {seconds * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+"""
+Upload Storage Backends
+Where content-addressed uploads live, selected with STORAGE_BACKEND:
+
+    local  server/uploads, served by the API at /uploads/ (default)
+    s3     an S3-compatible bucket (AWS S3, MinIO, Cloudflare R2, ...),
+           served from the bucket or a CDN in front of it
+
+Both backends hand out presigned PUT URLs so browsers can send image bytes
+straight to storage. S3 verifies the signed Content-Type, Content-Length and
+x-amz-checksum-sha256 itself; the local backend signs URLs for the API's own
+PUT /uploads/direct/<key> stand-in, which checks the same things.
+
+boto3 is only needed for the s3 backend.
+"""
+import base64
+import collections
+import hashlib
+import hmac
+import os
+import re
+import shutil
+import time
+from urllib.parse import urlencode, urlparse
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+
+StoredObject = collections.namedtuple('StoredObject', 'size mtime_ns')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DERIVED_DIR = '.derived'
+# Mirrors image_url_paths() in the schema
+URL_ORIGIN_RE = re.compile(r'^[A-Za-z][A-Za-z0-9+.-]*://[^/]+')
+
+
+def is_safe_key(key):
+    return bool(key) and not any(segment in ('', '.', '..') or segment.startswith('.') for segment in key.split('/'))
+
+
+class LocalStorage:
+    """Uploads in a local directory, served by the API under url_prefix."""
+
+    name = 'local'
+
+    def __init__(self, root, url_prefix='/uploads/', signing_key=None):
+        self.root = os.path.abspath(root)
+        self.url_prefix = url_prefix
+        self.signing_key = signing_key.encode('utf-8') if isinstance(signing_key, str) else signing_key
+
+    def local_path(self, key):
+        return os.path.join(self.root, key)
+
+    def public_url(self, key):
+        return self.url_prefix + key
+
+    def url_path(self, key):
+        return self.url_prefix + key
+
+    def key_from_url(self, url):
+        """Return the key of a local upload URL (relative or absolute), else None."""
+        if not isinstance(url, str):
+            return None
+        path = URL_ORIGIN_RE.sub('', url.strip()).split('?', 1)[0]
+        if not path.startswith(self.url_prefix):
+            return None
+        key = path[len(self.url_prefix):]
+        return key if is_safe_key(key) else None
+
+    def stat(self, key):
+        try:
+            result = os.stat(self.local_path(key))
+        except FileNotFoundError:
+            return None
+        return StoredObject(result.st_size, result.st_mtime_ns)
+
+    def put_file(self, src_path, key, content_type):
+        """Move a finished local file into storage under key."""
+        final_path = self.local_path(key)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.chmod(src_path, 0o644)
+        os.replace(src_path, final_path)
+
+    def touch(self, key):
+        os.utime(self.local_path(key))
+
+    def delete(self, key):
+        """Delete an upload and its derivatives, pruning emptied shard directories."""
+        path = self.local_path(key)
+        if os.path.exists(path):
+            os.remove(path)
+        derived_root = os.path.join(self.root, DERIVED_DIR)
+        derived_path = os.path.join(derived_root, key)
+        shutil.rmtree(derived_path, ignore_errors=True)
+        self._prune_empty_dirs(os.path.dirname(path), self.root)
+        self._prune_empty_dirs(os.path.dirname(derived_path), derived_root)
+
+    @staticmethod
+    def _prune_empty_dirs(parent, stop):
+        while parent != stop and os.path.isdir(parent) and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+
+    def iter_keys(self):
+        """Yield every stored key, skipping temp and derivative directories."""
+        for root, dirs, files in os.walk(self.root):
+            dirs[:] = [name for name in dirs if not name.startswith('.')]
+            for name in files:
+                if not name.startswith('.'):
+                    yield os.path.relpath(os.path.join(root, name), self.root).replace(os.sep, '/')
+
+    def _signature(self, key, content_type, content_length, checksum_sha256, expires):
+        message = '\n'.join(('PUT', key, content_type, str(content_length), checksum_sha256, str(expires)))
+        return hmac.new(self.signing_key, message.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def presign_put(self, key, content_type, content_length, checksum_sha256, expires_in):
+        """Sign a PUT to the API's /uploads/direct/<key> stand-in."""
+        if not self.signing_key:
+            raise RuntimeError("Direct uploads need STORAGE_SIGNING_KEY (or JWT_SECRET) to be set")
+        expires = int(time.time()) + expires_in
+        query = urlencode({
+            'expires': expires,
+            'signature': self._signature(key, content_type, content_length, checksum_sha256, expires),
+        })
+        return {
+            'method': 'PUT',
+            'url': f"{self.url_prefix}direct/{key}?{query}",
+            'headers': {'Content-Type': content_type, 'x-amz-checksum-sha256': checksum_sha256},
+        }
+
+    def verify_put(self, key, content_type, content_length, checksum_sha256, expires, signature):
+        """Check a stand-in PUT against the signature presign_put() issued."""
+        if not self.signing_key or not signature:
+            return False
+        try:
+            expires = int(expires)
+        except (TypeError, ValueError):
+            return False
+        if expires < time.time():
+            return False
+        expected = self._signature(key, content_type, content_length, checksum_sha256, expires)
+        return hmac.compare_digest(expected, signature)
+
+
+class S3Storage:
+    """Uploads in an S3-compatible bucket, served from public_url (the bucket or a CDN)."""
+
+    name = 's3'
+
+    def __init__(self, bucket, endpoint_url=None, region=None, public_url=None, prefix='',
+                 access_key_id=None, secret_access_key=None):
+        if boto3 is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs the boto3 package (pip install boto3)")
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            config=BotoConfig(
+                signature_version='s3v4',
+                # MinIO and most stand-ins only understand path-style bucket URLs
+                s3={'addressing_style': 'path' if endpoint_url else 'auto'},
+            ),
+        )
+        if public_url:
+            base = public_url.rstrip('/')
+        elif endpoint_url:
+            base = f"{endpoint_url.rstrip('/')}/{bucket}"
+        else:
+            base = f"https://{bucket}.s3.{region or 'us-east-1'}.amazonaws.com"
+        self.public_base = f"{base}/{self.prefix}"
+
+    def local_path(self, key):
+        return None
+
+    def public_url(self, key):
+        return self.public_base + key
+
+    def url_path(self, key):
+        return urlparse(self.public_url(key)).path
+
+    def key_from_url(self, url):
+        if not isinstance(url, str):
+            return None
+        path = URL_ORIGIN_RE.sub('', url.strip()).split('?', 1)[0]
+        base_path = urlparse(self.public_base).path
+        if not path.startswith(base_path):
+            return None
+        key = path[len(base_path):]
+        return key if is_safe_key(key) else None
+
+    def _object_key(self, key):
+        return self.prefix + key
+
+    def stat(self, key):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as exc:
+            if exc.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return StoredObject(head['ContentLength'], int(head['LastModified'].timestamp() * 1_000_000_000))
+
+    def put_file(self, src_path, key, content_type):
+        """Upload a finished local file under key and delete the local copy."""
+        self.client.upload_file(
+            src_path,
+            self.bucket,
+            self._object_key(key),
+            ExtraArgs={'ContentType': content_type, 'CacheControl': IMMUTABLE_CACHE_CONTROL},
+        )
+        os.remove(src_path)
+
+    def touch(self, key):
+        """Refresh LastModified with an in-place copy so garbage collection sees the reuse."""
+        object_key = self._object_key(key)
+        head = self.client.head_object(Bucket=self.bucket, Key=object_key)
+        self.client.copy_object(
+            Bucket=self.bucket,
+            Key=object_key,
+            CopySource={'Bucket': self.bucket, 'Key': object_key},
+            MetadataDirective='REPLACE',
+            ContentType=head.get('ContentType', 'application/octet-stream'),
+            CacheControl=head.get('CacheControl', IMMUTABLE_CACHE_CONTROL),
+        )
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def iter_keys(self):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get('Contents', ()):
+                key = item['Key'][len(self.prefix):]
+                if is_safe_key(key):
+                    yield key
+
+    def presign_put(self, key, content_type, content_length, checksum_sha256, expires_in):
+        """Presign a PUT whose type, length and SHA-256 the bucket enforces."""
+        url = self.client.generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': self.bucket,
+                'Key': self._object_key(key),
+                'ContentType': content_type,
+                'ContentLength': content_length,
+                'ChecksumSHA256': checksum_sha256,
+                'CacheControl': IMMUTABLE_CACHE_CONTROL,
+            },
+            ExpiresIn=expires_in,
+        )
+        return {
+            'method': 'PUT',
+            'url': url,
+            'headers': {
+                'Content-Type': content_type,
+                'x-amz-checksum-sha256': checksum_sha256,
+                'Cache-Control': IMMUTABLE_CACHE_CONTROL,
+            },
+        }
+
+
+def sha256_hex_to_base64(hex_digest):
+    """S3 expects x-amz-checksum-sha256 as base64, clients usually compute hex."""
+    return base64.b64encode(bytes.fromhex(hex_digest)).decode('ascii')
+
+
+def from_env(upload_folder, signing_key=None):
+    """Build the storage backend configured by STORAGE_BACKEND and the S3_* variables."""
+    backend = (os.environ.get('STORAGE_BACKEND') or 'local').strip().lower()
+    if backend == 'local':
+        return LocalStorage(upload_folder, signing_key=os.environ.get('STORAGE_SIGNING_KEY') or signing_key)
+    if backend == 's3':
+        bucket = (os.environ.get('S3_BUCKET') or '').strip()
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs S3_BUCKET")
+        return S3Storage(
+            bucket,
+            endpoint_url=os.environ.get('S3_ENDPOINT_URL') or None,
+            region=os.environ.get('S3_REGION') or None,
+            public_url=os.environ.get('S3_PUBLIC_URL') or None,
+            prefix=os.environ.get('S3_PREFIX') or '',
+            access_key_id=os.environ.get('S3_ACCESS_KEY_ID') or None,
+            secret_access_key=os.environ.get('S3_SECRET_ACCESS_KEY') or None,
+        )
+    raise RuntimeError("STORAGE_BACKEND must be 'local' or 's3'")
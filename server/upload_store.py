@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Upload Storage
+Uploads are stored once per distinct content under the key ab/cd/<sha256>.<ext>
+in the configured storage backend (see storage.py), so the same photo
+uploaded twice shares one object and one URL.
+
+Nothing keeps a separate counter: a file's references are the image_urls
+entries of cities, city_details and locations whose path is its URL, counted
+through the GIN indexes on image_url_paths(image_urls). When a row is
+deleted its images are released and unreferenced files are removed together
+with their derivatives. Files touched within the grace period are kept,
+because an upload is saved before the row that references it is committed.
+
+Usage:
+    python upload_store.py gc [--dry-run]        # remove unreferenced uploads
+    python upload_store.py migrate [--dry-run]   # move legacy and local files into the configured storage
+"""
+import argparse
+import collections
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import time
+
+from dotenv import load_dotenv
+
+from stats import get_connection
+from storage import LocalStorage, from_env as storage_from_env
+
+UPLOAD_URL_PREFIX = '/uploads/'
+HASH_CHUNK_SIZE = 1024 * 1024
+INCOMING_DIR = '.incoming'
+DEFAULT_GRACE_SECONDS = 600
+REFERENCE_TABLES = ('cities', 'city_details', 'locations')
+CONTENT_ADDRESS_RE = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+$')
+DERIVATIVE_ADDRESS_RE = re.compile(r'^\.derived/([0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+)/[^/]+$')
+EXTENSION_ALIASES = {'jpeg': 'jpg'}
+# Leading bytes of every accepted image type -> stored extension
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+CONTENT_TYPES = {'jpg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif'}
+
+# Images released when a row is deleted, including rows removed by ON DELETE CASCADE
+OWNED_IMAGE_URLS_SQL = {
+    'cities': """
+        SELECT unnest(image_urls) FROM cities WHERE id = %(id)s
+        UNION ALL
+        SELECT unnest(image_urls) FROM city_details WHERE city_id = %(id)s
+    """,
+    'city_details': "SELECT unnest(image_urls) FROM city_details WHERE id = %(id)s",
+    'locations': "SELECT unnest(image_urls) FROM locations WHERE id = %(id)s",
+}
+
+
+StoredUpload = collections.namedtuple('StoredUpload', 'relpath created mtime_ns')
+
+
+def format_size(size):
+    for unit in ('bytes', 'KB', 'MB'):
+        if size < 1024 or unit == 'MB':
+            return f"{size:g} {unit}"
+        size = round(size / 1024, 1)
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class IncomingFile:
+    """Writable temp file in uploads/.incoming that hashes and counts bytes as they arrive.
+
+    Used as the multipart stream for uploaded files, so the body is written to
+    disk once, hashed on the way and rejected as soon as it passes max_bytes.
+    promote() then hands it to the storage backend under its content address.
+    """
+
+    def __init__(self, upload_folder, max_bytes=None):
+        incoming = os.path.join(upload_folder, INCOMING_DIR)
+        os.makedirs(incoming, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=incoming, delete=False)
+        self.path = self._file.name
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.promoted = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise UploadTooLarge(f"Each file must be at most {format_size(self.max_bytes)}")
+        self.sha256.update(data)
+        return self._file.write(data)
+
+    def head(self, length=32):
+        """Return the first bytes written, leaving the position unchanged."""
+        position = self._file.tell()
+        self._file.seek(0)
+        data = self._file.read(length)
+        self._file.seek(position)
+        return data
+
+    def discard(self):
+        """Close and delete the temp file unless it was promoted."""
+        self._file.close()
+        if not self.promoted and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+def sniff_image_extension(head):
+    """Return the stored extension for an image's leading bytes, or None if it is not one we accept."""
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+
+def spool_stream(upload_folder, stream, max_bytes=None):
+    """Copy any readable stream into an IncomingFile."""
+    incoming = IncomingFile(upload_folder, max_bytes=max_bytes)
+    try:
+        while True:
+            chunk = stream.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            incoming.write(chunk)
+        incoming.flush()
+    except Exception:
+        incoming.discard()
+        raise
+    return incoming
+
+
+def promote(storage, incoming, extension):
+    """Store a finished IncomingFile under its content address and return a StoredUpload.
+
+    If the content already exists the temp copy is dropped and the existing
+    object touched, which both protects it from a concurrent garbage
+    collection and tells discard_new_uploads() that someone else now uses it.
+    """
+    key = content_address(incoming.sha256.hexdigest(), extension)
+    incoming.close()
+    if storage.stat(key) is not None:
+        storage.touch(key)
+        incoming.discard()
+        created = False
+    else:
+        storage.put_file(incoming.path, key, CONTENT_TYPES.get(extension, 'application/octet-stream'))
+        incoming.promoted = True
+        created = True
+    return StoredUpload(key, created, storage.stat(key).mtime_ns)
+
+
+def discard_new_uploads(storage, stored_uploads):
+    """Remove objects a failed request created, unless another upload has reused them since.
+
+    A reuse refreshes the modification time, so an unchanged one means the
+    object is still only this request's and no row can reference it.
+    """
+    removed = []
+    for stored in stored_uploads:
+        if not stored.created:
+            continue
+        current = storage.stat(stored.relpath)
+        if current is None or current.mtime_ns != stored.mtime_ns:
+            continue
+        storage.delete(stored.relpath)
+        removed.append(stored.relpath)
+    return removed
+
+
+def normalize_extension(filename):
+    extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'bin'
+    return EXTENSION_ALIASES.get(extension, extension)
+
+
+def content_address(digest, extension):
+    """Relative path for a SHA-256 hex digest, sharded two levels deep."""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{extension}"
+
+
+def content_digest(relpath):
+    """Return the SHA-256 of a content-addressed upload or of a derivative's source, else None."""
+    match = DERIVATIVE_ADDRESS_RE.match(relpath)
+    if match:
+        relpath = match.group(1)
+    if not CONTENT_ADDRESS_RE.match(relpath):
+        return None
+    return relpath.rsplit('/', 1)[1].split('.', 1)[0]
+
+
+def store_stream(storage, upload_folder, stream, extension):
+    """Stream a file into content-addressed storage, staging it in upload_folder; return its key."""
+    return promote(storage, spool_stream(upload_folder, stream), extension).relpath
+
+
+def owned_image_urls(cur, table, row_id):
+    """Image URLs that deleting the given row will drop; run before the DELETE."""
+    cur.execute(OWNED_IMAGE_URLS_SQL[table], {'id': str(row_id)})
+    return [row[0] for row in cur.fetchall() if row[0]]
+
+
+def image_reference_counts(cur, storage, keys):
+    """Return {key: number of image_urls entries across all tables that point at its URL}."""
+    if not keys:
+        return {}
+    counts = " + ".join(
+        f"(SELECT COUNT(*) FROM {table} WHERE image_url_paths(image_urls) @> ARRAY[p.path])"
+        for table in REFERENCE_TABLES
+    )
+    cur.execute(
+        f"SELECT p.key, {counts} FROM unnest(%s::text[], %s::text[]) AS p(key, path);",
+        (list(keys), [storage.url_path(key) for key in keys])
+    )
+    return {key: int(count) for key, count in cur.fetchall()}
+
+
+def collect_garbage(conn, storage, keys, grace_seconds=DEFAULT_GRACE_SECONDS, dry_run=False):
+    """Remove the given uploads that nothing references any more; return the removed keys."""
+    candidates = []
+    cutoff_ns = (time.time() - grace_seconds) * 1_000_000_000
+    for key in set(keys):
+        stored = storage.stat(key)
+        if stored is not None and stored.mtime_ns < cutoff_ns:
+            candidates.append(key)
+
+    cur = conn.cursor()
+    try:
+        counts = image_reference_counts(cur, storage, candidates)
+    finally:
+        conn.rollback()
+        cur.close()
+
+    removed = [key for key in sorted(candidates) if counts.get(key) == 0]
+    if not dry_run:
+        for key in removed:
+            storage.delete(key)
+    return removed
+
+
+def release_image_urls(conn, storage, urls, grace_seconds=DEFAULT_GRACE_SECONDS):
+    """Garbage-collect the stored uploads among urls after the rows using them were deleted."""
+    keys = [key for key in map(storage.key_from_url, urls) if key]
+    return collect_garbage(conn, storage, keys, grace_seconds=grace_seconds)
+
+
+def migrate_legacy_uploads(conn, storage, upload_folder, dry_run=False):
+    """Move local uploads to their content address in storage and rewrite image_urls to match.
+
+    Covers flat <uuid>_<name> files and, once STORAGE_BACKEND points at a
+    bucket, content-addressed files still on local disk. Relative new URLs
+    keep the old scheme and host, so absolute seed URLs stay absolute.
+    Local files are removed only after the rewrite is committed.
+    """
+    local = LocalStorage(upload_folder, url_prefix=UPLOAD_URL_PREFIX)
+    moves = {}
+    for relpath in list(local.iter_keys()):
+        if CONTENT_ADDRESS_RE.match(relpath) and storage.public_url(relpath) == local.public_url(relpath):
+            continue
+        with open(local.local_path(relpath), 'rb') as stream:
+            if dry_run:
+                digest = hashlib.file_digest(stream, 'sha256').hexdigest()
+                moves[relpath] = content_address(digest, normalize_extension(relpath))
+            else:
+                moves[relpath] = store_stream(storage, upload_folder, stream, normalize_extension(relpath))
+
+    cur = conn.cursor()
+    rewritten = 0
+    try:
+        for old_relpath, new_key in moves.items():
+            new_url = storage.public_url(new_key)
+            if new_url.startswith('/'):
+                replacement = "left(url, length(url) - length(%(old)s)) || %(new)s"
+            else:
+                replacement = "%(new)s"
+            for table in REFERENCE_TABLES:
+                cur.execute(
+                    f"""
+                        UPDATE {table} SET image_urls = ARRAY(
+                            SELECT CASE
+                                WHEN regexp_replace(url, '^[A-Za-z][A-Za-z0-9+.-]*://[^/]+', '') = %(old)s
+                                THEN {replacement}
+                                ELSE url
+                            END
+                            FROM unnest(image_urls) WITH ORDINALITY AS u(url, ord)
+                            ORDER BY ord
+                        )
+                        WHERE image_url_paths(image_urls) @> ARRAY[%(old)s];
+                    """,
+                    {'old': local.url_path(old_relpath), 'new': new_url}
+                )
+                rewritten += cur.rowcount
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    if not dry_run:
+        for old_relpath in moves:
+            local.delete(old_relpath)
+    return moves, rewritten
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Garbage-collect or migrate content-addressed uploads")
+    parser.add_argument('command', choices=('gc', 'migrate'))
+    parser.add_argument('--uploads', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads'))
+    parser.add_argument('--grace-seconds', type=int, default=DEFAULT_GRACE_SECONDS,
+                        help='keep files modified more recently than this (gc only)')
+    parser.add_argument('--dry-run', action='store_true', help='report without changing anything')
+    args = parser.parse_args()
+
+    storage = storage_from_env(args.uploads)
+    conn = get_connection()
+    try:
+        if args.command == 'gc':
+            removed = collect_garbage(conn, storage, list(storage.iter_keys()),
+                                      grace_seconds=args.grace_seconds, dry_run=args.dry_run)
+            for relpath in removed:
+                print(f"  - {relpath}")
+            verb = "Would remove" if args.dry_run else "Removed"
+            print(f"✓ {verb} {len(removed)} unreferenced upload(s)")
+        else:
+            moves, rewritten = migrate_legacy_uploads(conn, storage, args.uploads, dry_run=args.dry_run)
+            for old_relpath, new_relpath in sorted(moves.items()):
+                print(f"  {old_relpath} -> {new_relpath}")
+            distinct = len(set(moves.values()))
+            verb = "Would migrate" if args.dry_run else "Migrated"
+            print(f"✓ {verb} {len(moves)} file(s) into {distinct} content address(es) in {storage.name} storage; "
+                  f"{rewritten} row(s) rewritten")
+    except Exception as e:
+        print(f"✗ {args.command} failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()